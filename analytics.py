@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Usage statistics across all logbooks without GUI
+
+Loads all logbooks of the LaserLogger settings file in parallel processes
+and writes tables (CSV) of
+
+    hours_by_<period>.csv  operating hours per laser and period
+    concurrency.csv        hours during which 0, 1, 2, ... lasers were running
+    heatmap.csv            utilization (%) per laser by weekday and hour of day
+
+For example
+
+    python3 analytics.py --period month --since 2020-01-01
+
+Sessions are split exactly at the period boundaries (a session running over
+midnight at the end of a month counts for both months). Sessions without stop
+time are counted as running until now, archived entries (see archive.py) are
+included. All statistics are vectorized: the time covered by the sessions of
+a laser up to any number of points in time is obtained from the sorted start
+and stop times and their cumulative sums, the concurrency from one sorted
+sweep over all starts and stops."""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import report
+
+# pandas frequencies of the periods
+PERIODS = {
+    'day': 'D',
+    'week': 'W-MON',
+    'month': 'MS',
+    'year': 'YS',
+}
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+def LoadSessions(job):
+    """Load start and stop times of a logbook (runs in a worker process)
+
+    :param job: tuple of name and filename
+    :return: tuple of name, starts, stops (datetime64 arrays of the
+             sessions with start time) and error (None on success)
+    """
+    name, filename = job
+    try:
+        schema, store = report.LoadLogbook(filename)
+        starts = store.Column(schema.Column('Time\nStart')).copy()
+        stops = store.Column(schema.Column('Time\nStop')).copy()
+    except Exception as e:
+        return name, None, None, "{}: {}".format(type(e).__name__, e)
+
+    valid = ~np.isnat(starts)
+    return name, starts[valid], stops[valid], None
+
+def Clip(starts, stops, since, until):
+    """Limit sessions to [since, until) and drop the empty ones, sessions
+    without stop time run until 'until'"""
+    stops = np.where(np.isnat(stops), until, stops)
+    starts = np.maximum(starts, since)
+    stops = np.minimum(stops, until)
+    valid = stops > starts
+    return starts[valid], stops[valid]
+
+def Coverage(starts, stops, times):
+    """Return the time (in s) covered by the sessions before each of the
+    given times (all datetime64[ns]), in O((n + m) log n)
+
+    The covered time before t is the sum of t - start over all sessions
+    started before t minus the sum of t - stop over all sessions stopped
+    before t, both are obtained from sorted arrays and cumulative sums."""
+    if len(starts) == 0:
+        return np.zeros(len(times))
+
+    # seconds relative to the first start (sums of ns would overflow)
+    origin = starts.min()
+    s = np.sort((starts - origin) / np.timedelta64(1, 's'))
+    e = np.sort((stops - origin) / np.timedelta64(1, 's'))
+    t = (times - origin) / np.timedelta64(1, 's')
+
+    ssum = np.concatenate([[0.0], np.cumsum(s)])
+    esum = np.concatenate([[0.0], np.cumsum(e)])
+    ns = np.searchsorted(s, t, side='left')
+    ne = np.searchsorted(e, t, side='left')
+    return (ns * t - ssum[ns]) - (ne * t - esum[ne])
+
+def HoursByPeriod(sessions, since, until, period):
+    """Return DataFrame of the operating hours per period (rows) and laser
+    (columns) with a Total column"""
+    # the first and last period may be partial
+    edges = pd.date_range(pd.Timestamp(since).normalize(), until, freq=PERIODS[period])
+    edges = edges[(edges > since) & (edges < until)].union([pd.Timestamp(since), pd.Timestamp(until)])
+    times = edges.values
+
+    table = pd.DataFrame(index=edges[:-1])
+    table.index.name = period
+    for name, (starts, stops) in sessions.items():
+        table[name] = np.diff(Coverage(starts, stops, times)) / 3600
+    table['Total'] = table.sum(axis=1)
+    return table
+
+def Concurrency(sessions):
+    """Return Series of the hours during which a given number of lasers was
+    running (sorted sweep over all starts and stops)"""
+    if sum(len(starts) for starts, stops in sessions.values()) == 0:
+        return pd.Series(dtype=float, name='hours')
+    starts = np.concatenate([starts for starts, stops in sessions.values()])
+    stops = np.concatenate([stops for starts, stops in sessions.values()])
+
+    times = np.concatenate([starts, stops])
+    deltas = np.concatenate([np.ones(len(starts), dtype=np.int64), -np.ones(len(stops), dtype=np.int64)])
+    # at equal times stops come first, so back-to-back sessions do not overlap
+    order = np.lexsort((deltas, times))
+    times, levels = times[order], np.cumsum(deltas[order])
+
+    durations = np.diff(times) / np.timedelta64(1, 'h')
+    hours = np.bincount(levels[:-1], weights=durations)
+    series = pd.Series(hours, name='hours')
+    series.index.name = 'running lasers'
+    return series
+
+def Heatmap(sessions, since, until):
+    """Return DataFrame of the utilization (in %) of each laser and of all
+    lasers together by weekday (rows, per laser) and hour of the day"""
+    edges = pd.date_range(pd.Timestamp(since).floor('h'), pd.Timestamp(until).ceil('h'), freq='h')
+    slots = edges[:-1].dayofweek.values * 24 + edges[:-1].hour.values
+    # hours of each slot within [since, until)
+    bins = np.minimum(edges.values[1:], until) - np.maximum(edges.values[:-1], since)
+    available = np.bincount(slots, weights=bins / np.timedelta64(1, 'h'), minlength=7*24)
+
+    rows = []
+    total = np.zeros(7*24)
+    for name, (starts, stops) in list(sessions.items()) + [("All lasers", (None, None))]:
+        if starts is None:
+            used = total / max(len(sessions), 1)
+        else:
+            used = np.bincount(slots, weights=np.diff(Coverage(starts, stops, edges.values)) / 3600,
+                               minlength=7*24)
+            total += used
+        with np.errstate(invalid='ignore', divide='ignore'):
+            utilization = np.where(available > 0, 100 * used / available, np.nan).reshape(7, 24)
+        for day, values in enumerate(utilization):
+            rows.append([name, WEEKDAYS[day]] + values.round(1).tolist())
+
+    return pd.DataFrame(rows, columns=['laser', 'weekday'] + ["{:02d}".format(hour) for hour in range(24)])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--settings', default="laserlogger_settings.json", help="LaserLogger settings file")
+    parser.add_argument('--outdir', default="analytics", help="output directory (default %(default)s)")
+    parser.add_argument('--period', choices=list(PERIODS), default='month', help="period of the hour totals")
+    parser.add_argument('--since', help="only time at or after this date (default first session)")
+    parser.add_argument('--until', help="only time before this date (default now)")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="number of worker processes")
+    args = parser.parse_args()
+
+    with open(args.settings) as f:
+        settings = json.load(f)
+    jobs = [(book['name'], book['filename']) for book in settings['logbooks']]
+
+    t0 = time.perf_counter()
+    if args.jobs > 1 and len(jobs) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(args.jobs, len(jobs))) as pool:
+            results = list(pool.map(LoadSessions, jobs))
+    else:
+        results = [LoadSessions(job) for job in jobs]
+    loaded = time.perf_counter() - t0
+
+    failed = 0
+    for name, starts, stops, error in results:
+        if error is not None:
+            failed += 1
+            print("{:<25} FAILED ({})".format(name, error))
+    results = [result for result in results if result[3] is None]
+    if not results:
+        raise SystemExit(1)
+
+    until = pd.Timestamp.now().floor('s') if args.until is None else pd.Timestamp(args.until)
+    if args.since is not None:
+        since = pd.Timestamp(args.since)
+    else:
+        firsts = [starts.min() for name, starts, stops, error in results if len(starts)]
+        since = pd.Timestamp(min(firsts)) if firsts else until
+    since, until = since.to_datetime64(), until.to_datetime64()
+
+    sessions = {name: Clip(starts, stops, since, until) for name, starts, stops, error in results}
+
+    os.makedirs(args.outdir, exist_ok=True)
+    hours = HoursByPeriod(sessions, since, until, args.period)
+    hours.round(2).to_csv(os.path.join(args.outdir, "hours_by_{}.csv".format(args.period)))
+    concurrency = Concurrency(sessions)
+    concurrency.round(2).to_csv(os.path.join(args.outdir, "concurrency.csv"))
+    Heatmap(sessions, since, until).to_csv(os.path.join(args.outdir, "heatmap.csv"), index=False)
+
+    # summary per year on the console
+    years = hours.groupby(hours.index.year).sum()
+    years.index.name = 'year'
+    print(years.round(1).to_string())
+    if len(concurrency):
+        print("Most lasers running at once: {}, {:.1f} h with more than one".format(
+            len(concurrency) - 1, concurrency.iloc[2:].sum()))
+    print("{} logbooks loaded in {:.2f} s, analyzed in {:.2f} s, tables written to {}".format(
+        len(results), loaded, time.perf_counter() - t0 - loaded, args.outdir))
+
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Detection of unusual values in numeric logbook columns
+
+Each column keeps an exponentially weighted moving average (EWMA) of its
+values and of their absolute deviations from it. A new value is flagged if
+it deviates by more than ANOMALY_THRESHOLD estimated standard deviations.
+Values are clipped to that band before they enter the averages, so that a
+single outlier does not distort the statistics (robust EWMA).
+
+Updating is O(1) per value. As old values only contribute with weights
+decaying exponentially, the detector is initialized from the most recent
+values of a column instead of from the whole history."""
+
+import numpy as np
+
+# number of entries the moving averages effectively extend over
+ANOMALY_SPAN = 100
+# deviation (in standard deviations) above which values are flagged
+ANOMALY_THRESHOLD = 4.0
+# minimum number of values before anything is flagged
+ANOMALY_MIN_HISTORY = 10
+# number of most recent values used for initialization (older values have
+# weights below 1e-8 with the default span)
+ANOMALY_WARMUP = 10 * ANOMALY_SPAN
+
+# ratio of standard deviation to mean absolute deviation (normal distribution)
+MAD_TO_STD = np.sqrt(np.pi / 2)
+
+class DriftDetector(object):
+    """Robust EWMA statistics of a single column"""
+
+    def __init__(self, values=(), span=ANOMALY_SPAN, threshold=ANOMALY_THRESHOLD, resolution=0.0):
+        """Initialization
+
+        :param values: chronologically ordered history (NaN for empty cells)
+        :param resolution: smallest meaningful difference of the values
+                           (e.g. of rounded readings), lower bound of the
+                           estimated standard deviation
+        """
+        self.alpha = 2 / (span + 1)
+        self.threshold = threshold
+        self.resolution = resolution
+        self.mean = np.nan
+        self.dev = 0.0
+        # total weight of the deviations (to correct the bias of the start value)
+        self.weight = 0.0
+        self.count = 0
+
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self.count = max(len(values) - ANOMALY_WARMUP, 0)
+        for value in values[-ANOMALY_WARMUP:]:
+            self.Add(value)
+
+    def Std(self):
+        """Estimated standard deviation of the values"""
+        if self.weight == 0:
+            return self.resolution
+        return max(MAD_TO_STD * self.dev / self.weight, self.resolution)
+
+    def Deviation(self, value):
+        """Return the deviation of a value in estimated standard deviations
+        (NaN if there is not enough history yet)"""
+        if self.count < ANOMALY_MIN_HISTORY or np.isnan(value):
+            return np.nan
+        std = self.Std()
+        if std == 0:
+            return 0.0 if value == self.mean else np.inf
+        return (value - self.mean) / std
+
+    def IsAnomaly(self, value):
+        return abs(self.Deviation(value)) > self.threshold
+
+    def State(self):
+        """Return the state of the statistics (see SetState())"""
+        return (self.mean, self.dev, self.weight, self.count)
+
+    def SetState(self, state):
+        """Return to an earlier state, e.g. to undo Add()"""
+        self.mean, self.dev, self.weight, self.count = state
+
+    def Add(self, value):
+        """Account for a new value"""
+        if np.isnan(value):
+            return
+
+        if np.isnan(self.mean):
+            self.mean = value
+        else:
+            band = self.threshold * self.Std()
+            if self.count >= ANOMALY_MIN_HISTORY and band > 0:
+                value = min(max(value, self.mean - band), self.mean + band)
+            delta = value - self.mean
+            self.mean += self.alpha * delta
+            self.dev += self.alpha * (abs(delta) - self.dev)
+            self.weight += self.alpha * (1 - self.weight)
+        self.count += 1
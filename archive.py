@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Archive of old logbook entries in year-partitioned Parquet files
+
+Entries older than a cutoff can be moved out of the live logbook (see
+logbook.Logbook.Archive), which keeps loading, drawing and saving the
+logbook fast. They are kept next to the logbook file in one Parquet file per
+year of the start time:
+
+    logfiles/logfile_583nm.csv.archive/year=2019/entries.parquet
+    logfiles/logfile_583nm.csv.archive/year=2020/entries.parquet
+
+Every file is sorted by start time and written in row groups, and it carries
+the column labels and the autoinfo line as metadata, so an archive is a
+complete logbook of its own. Reading a time range only touches the year
+directories within the range and skips the row groups outside of it by
+their statistics (predicate pushdown); reading some columns only decodes
+those. Needs pyarrow, which is only imported once an archive is used."""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import columnschema
+
+# directory of the archive of a logbook: filename + suffix
+ARCHIVE_SUFFIX = '.archive'
+# name of the Parquet file within each year directory
+ARCHIVE_FILE = 'entries.parquet'
+# entries per row group (the unit skipped when reading a time range)
+ARCHIVE_ROW_GROUP_ROWS = 4096
+# default age (in days) of the entries that are archived
+ARCHIVE_KEEP_DAYS = 365
+# key of the logbook header in the Parquet metadata
+ARCHIVE_META_KEY = b'laserlogger'
+
+def ArchivePath(filename):
+    """Return the archive directory of a logbook (SQLite tables given as
+    'file.sqlite#table' get 'file.sqlite.table.archive')"""
+    return filename.replace('#', '.') + ARCHIVE_SUFFIX
+
+class Archive(object):
+    """Archived entries of one logbook"""
+
+    def __init__(self, directory):
+        """Initialization (nothing is read before it is needed)"""
+        self.directory = directory
+
+    def _Partition(self, year):
+        return os.path.join(self.directory, "year={}".format(year), ARCHIVE_FILE)
+
+    def Years(self):
+        """Return sorted list of the archived years (empty if there is no
+        archive)"""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        years = []
+        for name in names:
+            key, sep, year = name.partition('=')
+            if key == 'year' and year.isdigit() and os.path.isfile(self._Partition(year)):
+                years.append(int(year))
+        return sorted(years)
+
+    def Write(self, autoinfoline, data):
+        """Add entries to the archive
+
+        Each year file that receives entries is rewritten (to a temporary
+        file that replaces the old one), the others are not touched.
+
+        :param autoinfoline: autoinfo line of the logbook (DataFrame)
+        :param data: entries as DataFrame, entries without start time are
+                     not archived
+        :return: number of given entries (entries that are archived
+                 already are not stored twice)
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        labels = autoinfoline.columns.to_list()
+        schema = columnschema.ColumnSchema(labels, autoinfoline.iloc[0].to_list())
+        fields = []
+        for label, dtype in zip(labels, schema.dtypes):
+            if dtype.kind == 'M':
+                fields.append(pa.field(label, pa.timestamp('ns')))
+            elif dtype.kind == 'f':
+                fields.append(pa.field(label, pa.float64()))
+            else:
+                fields.append(pa.field(label, pa.string()))
+        header = {'labels': labels,
+                  'autoinfo': [None if pd.isnull(value) else str(value) for value in autoinfoline.iloc[0]]}
+        arrowschema = pa.schema(fields, metadata={ARCHIVE_META_KEY: json.dumps(header).encode('utf-8')})
+
+        data = data[labels].copy()
+        for label, dtype in zip(labels, schema.dtypes):
+            if dtype.kind == 'f':
+                # integer columns are kept as (nullable) floats like in the store
+                data[label] = pd.to_numeric(data[label], errors='coerce').astype(np.float64)
+        starts = pd.to_datetime(data['Time\nStart'])
+        data = data[starts.notna()]
+
+        for year, part in data.groupby(starts[starts.notna()].dt.year):
+            path = self._Partition(year)
+            if os.path.isfile(path):
+                part = pd.concat([pd.read_parquet(path), part], ignore_index=True)
+                # entries archived before but still in the logbook (e.g. if
+                # it could not be saved) are only kept once
+                for label, dtype in zip(labels, schema.dtypes):
+                    if dtype.kind not in 'Mf':
+                        part[label] = part[label].astype(object).where(part[label].notna(), None)
+                part = part.drop_duplicates()
+            part = part.sort_values('Time\nStart', kind='stable')
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            table = pa.Table.from_pandas(part, schema=arrowschema, preserve_index=False)
+            pq.write_table(table, path + '.tmp', row_group_size=ARCHIVE_ROW_GROUP_ROWS)
+            os.replace(path + '.tmp', path)
+
+        return len(data)
+
+    def Read(self, since=None, until=None, columns=None):
+        """Return archived entries started within [since, until) in
+        chronological order
+
+        Only the years within the range are opened and only row groups
+        that may contain matching start times are decoded.
+
+        :param since, until: anything understood by pd.Timestamp
+        :param columns: list of column labels (default all)
+        :return: DataFrame (empty without columns if nothing is archived)
+        """
+        years = self.Years()
+        if since is not None:
+            since = pd.Timestamp(since)
+            years = [year for year in years if year >= since.year]
+        if until is not None:
+            until = pd.Timestamp(until)
+            years = [year for year in years if year <= until.year]
+        if not years:
+            return pd.DataFrame(columns=columns)
+
+        filters = [('year', 'in', years)]
+        if since is not None:
+            filters.append(('Time\nStart', '>=', since))
+        if until is not None:
+            filters.append(('Time\nStart', '<', until))
+        data = pd.read_parquet(self.directory, engine='pyarrow', columns=columns, filters=filters)
+        if 'year' in data.columns and (columns is None or 'year' not in columns):
+            data = data.drop(columns='year')
+        if columns is None or 'Time\nStart' in columns:
+            data = data.sort_values('Time\nStart', kind='stable')
+        return data.reset_index(drop=True)
+
+    def Load(self):
+        """Read the complete archive like a logbook storage backend
+
+        :return: tuple of autoinfo line and data (both as DataFrames)
+        :raises FileNotFoundError: if there is no archive
+        """
+        import pyarrow.parquet as pq
+
+        years = self.Years()
+        if not years:
+            raise FileNotFoundError("No archive '{}'".format(self.directory))
+        metadata = pq.read_schema(self._Partition(years[-1])).metadata
+        header = json.loads(metadata[ARCHIVE_META_KEY].decode('utf-8'))
+        autoinfoline = pd.DataFrame([[np.nan if autoinfo is None else autoinfo for autoinfo in header['autoinfo']]],
+                                    columns=header['labels'])
+        return autoinfoline, self.Read(columns=header['labels'])
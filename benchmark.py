@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Benchmarks of the logbook table on synthetic logbooks
+
+Drives the hot methods of LoggerTable (GetValue, IsEmptyCell, GetAttr and
+FloatRenderer.Draw) through a simulated scroll of the grid viewport and
+times loading and saving of logbooks. No window is opened and drawing goes
+to a mocked device context, but wxPython still needs a display connection,
+so on a headless Linux box run e.g.
+
+    xvfb-run -a python3 benchmark.py --rows 1000 100000
+"""
+
+import argparse
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import wx
+
+import columnschema
+import logstorage
+import loggertable
+
+def GenerateLogbook(filename, rows, floatcols=12, commentcols=1, nandensity=0.1, seed=0):
+    """Write a synthetic CSV logbook
+
+    :param rows: number of entries
+    :param floatcols: number of numeric columns (cycling through all units)
+    :param commentcols: number of comment columns
+    :param nandensity: fraction of empty numeric and comment cells
+    """
+    rng = np.random.default_rng(seed)
+
+    start = np.datetime64('2015-01-01T08:00') + np.cumsum(rng.integers(1, 48, rows)).astype('timedelta64[h]')
+    stop = start + rng.integers(10, 600, rows).astype('timedelta64[m]')
+    data = {'Time\nStart': start, 'Time\nStop': stop}
+
+    units = [unit for unit, precision, editprecision in columnschema.UNITS]
+    for col in range(floatcols):
+        unit = units[col % len(units)]
+        values = rng.normal(100, 10, rows)
+        values[rng.random(rows) < nandensity] = np.nan
+        data['G{}\nValue {}\n{}'.format(col // 3, col, unit)] = values
+
+    for col in range(commentcols):
+        comments = np.array(["entry {}".format(i) for i in range(rows)], dtype=object)
+        comments[rng.random(rows) < nandensity] = None
+        data['Comment' if col == 0 else 'Comment {}'.format(col)] = comments
+
+    data = pd.DataFrame(data)
+    autoinfoline = pd.DataFrame([[np.nan] * len(data.columns)], columns=data.columns)
+    logstorage.WriteCSV(filename, autoinfoline, data)
+
+class MockDC(object):
+    """Device context that only records what would be drawn"""
+
+    def __init__(self):
+        self.Brush = None
+        self.Pen = None
+        self.Font = None
+        self.TextForeground = None
+        self.BackgroundMode = None
+        self.calls = 0
+
+    def DrawRectangle(self, rect):
+        self.calls += 1
+
+    def DrawText(self, s, x, y):
+        self.calls += 1
+
+    def GetTextExtent(self, s):
+        return (7 * len(s), 15)
+
+    def DestroyClippingRegion(self):
+        pass
+
+class MockGrid(object):
+    """The parts of wx.grid.Grid used by the renderers"""
+
+    def __init__(self, table):
+        self.Table = table
+        self.SelectionBackground = wx.Colour('#3399FF')
+
+class Timings(object):
+    """Collects call durations (in ns) per method name"""
+
+    def __init__(self):
+        self.samples = {}
+
+    def Add(self, name, duration):
+        self.samples.setdefault(name, []).append(duration)
+
+    def Report(self, title):
+        print(title)
+        print("  {:<20} {:>10} {:>10} {:>10} {:>10} {:>10}".format(
+            "method", "calls", "p50 (us)", "p90 (us)", "p99 (us)", "max (us)"))
+        for name, samples in self.samples.items():
+            samples = np.array(samples) / 1000
+            p50, p90, p99 = np.percentile(samples, [50, 90, 99])
+            print("  {:<20} {:>10} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.2f}".format(
+                name, len(samples), p50, p90, p99, samples.max()))
+
+def ScrollViewport(table, timings, viewportrows=30, scrolls=50):
+    """Render all visible cells for a number of viewport positions spread
+    evenly over the whole table"""
+    grid = MockGrid(table)
+    dc = MockDC()
+    rect = wx.Rect(0, 0, 80, 20)
+    clock = time.perf_counter_ns
+
+    rows = table.GetNumberRows()
+    cols = table.GetNumberCols()
+    for top in np.linspace(0, max(rows - viewportrows, 0), scrolls).astype(int):
+        for row in range(top, min(top + viewportrows, rows)):
+            for col in range(cols):
+                t0 = clock()
+                attr = table.GetAttr(row, col, 0)
+                t1 = clock()
+                table.IsEmptyCell(row, col)
+                t2 = clock()
+                table.GetValue(row, col)
+                t3 = clock()
+                timings.Add("GetAttr", t1 - t0)
+                timings.Add("IsEmptyCell", t2 - t1)
+                timings.Add("GetValue", t3 - t2)
+
+                renderer = table.renderers[col]
+                if isinstance(renderer, loggertable.FloatRenderer):
+                    t0 = clock()
+                    renderer.Draw(grid, attr, dc, rect, row, col, False)
+                    timings.Add("FloatRenderer.Draw", clock() - t0)
+
+                # the grid releases the attribute after use
+                attr.DecRef()
+
+def Benchmark(rows, args):
+    """Run load, scroll and save benchmarks for a logbook of the given size"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "logbook.csv")
+        GenerateLogbook(filename, rows, args.float_cols, args.comment_cols, args.nan_density, args.seed)
+
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        table = loggertable.LoggerTable(None, filename)
+        loadtime = time.perf_counter() - t0
+        loadmemory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        timings = Timings()
+        t0 = time.perf_counter()
+        ScrollViewport(table, timings, args.viewport_rows, args.scrolls)
+        # the second pass is served from the caches
+        ScrollViewport(table, timings, args.viewport_rows, args.scrolls)
+        scrolltime = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        table.Save()
+        savetime = time.perf_counter() - t0
+
+        timings.Report("{} rows x {} columns:".format(rows, table.GetNumberCols()))
+        print("  load {:.3f} s (peak {:.1f} MB), two scroll passes {:.3f} s, save {:.3f} s".format(
+            loadtime, loadmemory / 1e6, scrolltime, savetime))
+        extents = loggertable.FloatRenderer.extents
+        print("  text extent cache: {} hits, {} misses".format(extents.hits, extents.misses))
+        print("  max. resident memory {:.1f} MB".format(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3))
+        print()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 10000, 100000],
+                        help="logbook sizes to benchmark")
+    parser.add_argument('--float-cols', type=int, default=12, help="number of numeric columns")
+    parser.add_argument('--comment-cols', type=int, default=1, help="number of comment columns")
+    parser.add_argument('--nan-density', type=float, default=0.1, help="fraction of empty cells")
+    parser.add_argument('--viewport-rows', type=int, default=30, help="visible rows of the grid")
+    parser.add_argument('--scrolls', type=int, default=50, help="number of viewport positions")
+    parser.add_argument('--seed', type=int, default=0, help="random seed for the synthetic data")
+    args = parser.parse_args()
+
+    app = wx.App(False)
+    for rows in args.rows:
+        Benchmark(rows, args)
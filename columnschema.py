@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Column definitions of LaserLogger logbooks
+
+The kind, unit and display format of a logbook column are derived from
+keywords in its label (see README). This module evaluates these keywords
+once per logbook, so that the rest of the program can simply look up the
+properties by column number."""
+
+import numpy as np
+
+# column kinds
+KIND_TIME = 0
+KIND_COMMENT = 1
+KIND_FLOAT = 2
+
+# Recognized unit keywords in order of precedence together with the number
+# of digits after the comma for display and for the cell editor. To support
+# a new unit just add it here.
+UNITS = [
+    ("(THz)", 7, 7),
+    ("(MHz)", 3, 3),
+    ("Temp", 3, 3),
+    ("(kΩ)", 3, 3),
+    ("(mA)", 2, 2),
+    ("(A)", 2, 2),
+    ("(mV)", 0, 1),
+    ("(V)", 3, 3),
+    ("(mW)", 1, 1),
+    ("(nm)", 3, 3),
+    ("Isotope", 0, 0),
+]
+
+# display and editor precision of columns without recognized unit
+DEFAULT_PRECISION = (1, 3)
+
+# units that are written as integers if all values are integral
+INTEGER_UNITS = ["Isotope"]
+
+def ColumnKind(label):
+    """Return the kind of column (time, comment or float) from its label"""
+    if "Time" in label:
+        return KIND_TIME
+    if "Comment" in label:
+        return KIND_COMMENT
+    return KIND_FLOAT
+
+def ColumnUnit(label):
+    """Return the unit keyword of a float column (or None if unknown)"""
+    for unit, precision, editprecision in UNITS:
+        if unit in label:
+            return unit
+    return None
+
+def ParseAutoinfo(autoinfo):
+    """Parse the autofill information of a column
+
+    :param autoinfo: string like 'toptica://ip:port/uri' or 'mqtt://topic'
+    :return: dictionary with 'type', 'uri' (and 'ip', 'port')
+    :raises ValueError: if the autofill information is invalid
+    """
+    parts = autoinfo.split('://')
+    if len(parts) != 2:
+        raise ValueError("invalid autofill information '{}'".format(autoinfo))
+
+    typeinfo = parts[0]
+    if typeinfo == "toptica":
+        # Toptica laser -> separate ip:port/uri format
+        ip, rest = parts[1].split(":", 1)
+        port, uri = rest.split("/", 1)
+        return {
+                "type": typeinfo,
+                "ip": ip,
+                "port": int(port),
+                "uri": uri
+            }
+
+    return {
+            "type": typeinfo,
+            "uri": parts[1]
+        }
+
+class ColumnSchema(object):
+    """Properties of all columns of a logbook, indexed by column number"""
+
+    def __init__(self, labels, autoinfos=None):
+        """Initialization
+
+        :param labels: list of column labels
+        :param autoinfos: list of autofill information strings (or None)
+        """
+        self.labels = list(labels)
+        self.kinds = []
+        self.units = []
+        self.precisions = []
+        self.editprecisions = []
+        self.dtypes = []
+        self.sources = []
+
+        if autoinfos is None:
+            autoinfos = [None] * len(self.labels)
+
+        for label, autoinfo in zip(self.labels, autoinfos):
+            kind = ColumnKind(label)
+            unit = None
+            precision, editprecision = None, None
+
+            if kind == KIND_TIME:
+                dtype = np.dtype('datetime64[ns]')
+            elif kind == KIND_COMMENT:
+                dtype = np.dtype('object')
+            else:
+                dtype = np.dtype('float64')
+                unit = ColumnUnit(label)
+                precision, editprecision = DEFAULT_PRECISION
+                for name, p, ep in UNITS:
+                    if name == unit:
+                        precision, editprecision = p, ep
+
+            try:
+                source = ParseAutoinfo(autoinfo)
+            except ValueError:
+                # invalid information
+                print("Error: Cannot parse {} of {}".format(autoinfo, label))
+                source = None
+            except:
+                # no information (empty cell)
+                source = None
+
+            self.kinds.append(kind)
+            self.units.append(unit)
+            self.precisions.append(precision)
+            self.editprecisions.append(editprecision)
+            self.dtypes.append(dtype)
+            self.sources.append(source)
+
+        # float columns that are written as integers if possible
+        self.integers = [label for label, unit in zip(self.labels, self.units) if unit in INTEGER_UNITS]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def Column(self, label):
+        """Return column number of a label"""
+        return self.labels.index(label)
+
+    def Format(self, col):
+        """Return %-format string for a float column"""
+        return '%.{}f'.format(self.precisions[col])
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Summary statistics of numeric logbook columns"""
+
+import numpy as np
+
+# number of most recent values used for the trend
+TREND_ENTRIES = 20
+# percentiles shown in the summary
+PERCENTILES = (5, 50, 95)
+
+NS_PER_DAY = 86400 * 10**9
+
+def Summary(values, times, trendentries=TREND_ENTRIES):
+    """Calculate the statistics of a column (vectorized)
+
+    :param values: chronologically ordered float array (NaN for empty cells)
+    :param times: start times of the entries (datetime64 array)
+    :return: dictionary with count, mean, std, min, max, percentiles (list)
+             and trend (change per day of the last values, NaN if unknown)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    data = values[valid]
+
+    if len(data) == 0:
+        nan = float('nan')
+        return {'count': 0, 'mean': nan, 'std': nan, 'min': nan, 'max': nan,
+                'percentiles': [nan] * len(PERCENTILES), 'trend': nan}
+
+    # linear fit of the most recent values over their start time
+    trend = float('nan')
+    times = np.asarray(times, dtype='datetime64[ns]')[valid][-trendentries:]
+    recent = data[-trendentries:]
+    known = ~np.isnat(times)
+    if known.sum() >= 2:
+        days = (times[known] - times[known][0]).astype(np.int64) / NS_PER_DAY
+        if days.max() > 0:
+            trend = float(np.polyfit(days, recent[known], 1)[0])
+
+    return {
+        'count': len(data),
+        'mean': float(data.mean()),
+        'std': float(data.std(ddof=1)) if len(data) > 1 else float('nan'),
+        'min': float(data.min()),
+        'max': float(data.max()),
+        'percentiles': np.percentile(data, PERCENTILES).tolist(),
+        'trend': trend,
+    }
+
+class ColumnStats(object):
+    """Statistics per column, calculated on first request and kept until
+    the column changes"""
+
+    def __init__(self):
+        # column -> summary dictionary
+        self.cache = {}
+
+    def Get(self, col, values, times):
+        """Return the (cached) statistics of a column, see Summary()"""
+        summary = self.cache.get(col)
+        if summary is None:
+            summary = Summary(values, times)
+            self.cache[col] = summary
+        return summary
+
+    def Invalidate(self, col=None):
+        """Forget the statistics of one column (or of all columns)"""
+        if col is None:
+            self.cache.clear()
+        else:
+            self.cache.pop(col, None)
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Column oriented in-memory storage of logbook entries"""
+
+import numpy as np
+import pandas as pd
+
+# capacity of an empty store
+MIN_CAPACITY = 16
+
+class ColumnStore(object):
+    """Logbook entries stored as one growable numpy array per column
+
+    The entries are kept in chronological order (oldest first), so adding a
+    new entry is an append at the end of every column array. Arrays are
+    allocated with spare capacity that is doubled whenever it runs out,
+    which makes appending amortized O(1) independent of the logbook size.
+    Every entry carries a unique integer key that does not change when
+    other entries are inserted or deleted."""
+
+    def __init__(self, data, schema):
+        """Initialization
+
+        :param data: DataFrame in chronological order, its index is used as
+                     row keys
+        :param schema: columnschema.ColumnSchema of the data
+        """
+        self.labels = schema.labels
+        # float columns to be written as integers if all values are integral
+        self.integers = schema.integers
+
+        # data type and 'empty' value of each column
+        self.dtypes = schema.dtypes
+        self.empty = []
+        for dtype in self.dtypes:
+            if dtype.kind == 'M':
+                self.empty.append(np.datetime64('NaT'))
+            elif dtype.kind == 'f':
+                self.empty.append(np.nan)
+            else:
+                self.empty.append(None)
+
+        self.size = len(data)
+        self.capacity = max(MIN_CAPACITY, 2*self.size)
+
+        self.arrays = []
+        for label, dtype, empty in zip(self.labels, self.dtypes, self.empty):
+            array = np.full(self.capacity, empty, dtype=dtype)
+            if dtype.kind == 'M':
+                array[:self.size] = pd.to_datetime(data[label]).to_numpy(dtype=dtype)
+            elif dtype.kind == 'f':
+                array[:self.size] = pd.to_numeric(data[label], errors='coerce').to_numpy(dtype=dtype)
+            else:
+                array[:self.size] = data[label].to_numpy(dtype=dtype)
+            self.arrays.append(array)
+
+        self.keys = np.full(self.capacity, -1, dtype=np.int64)
+        self.keys[:self.size] = data.index.to_numpy(dtype=np.int64)
+        self.nextkey = int(self.keys[:self.size].max()) + 1 if self.size else 0
+        self._CheckKeyOrder()
+
+    def __len__(self):
+        return self.size
+
+    ### Access
+
+    def Column(self, col):
+        """Return view on a column in chronological order"""
+        return self.arrays[col][:self.size]
+
+    def ReversedColumn(self, col):
+        """Return view on a column with the newest entry first"""
+        return self.arrays[col][:self.size][::-1]
+
+    def Keys(self):
+        """Return view on the row keys in chronological order"""
+        return self.keys[:self.size]
+
+    def _CheckKeyOrder(self):
+        """Check whether keys are ascending (they usually are, as new keys
+        are increasing and new entries are usually appended)"""
+        keys = self.Keys()
+        self.sortedkeys = bool(np.all(keys[1:] > keys[:-1]))
+        self.keyorder = None
+
+    def Positions(self, keys):
+        """Return chronological positions of the given row keys"""
+        allkeys = self.Keys()
+        if self.sortedkeys:
+            return np.searchsorted(allkeys, keys)
+
+        # cache sort order of keys until the next structural change
+        if self.keyorder is None:
+            self.keyorder = np.argsort(allkeys)
+        return self.keyorder[np.searchsorted(allkeys[self.keyorder], keys)]
+
+    def ToDataFrame(self):
+        """Return a copy of the data as DataFrame in chronological order"""
+        data = pd.DataFrame({label: self.Column(col).copy() for col, label in enumerate(self.labels)},
+                            index=self.Keys().copy())
+        for label in self.integers:
+            values = data[label].dropna()
+            if (values % 1 == 0).all():
+                data[label] = data[label].astype('Int64')
+        return data
+
+    ### Modification
+
+    def _Reserve(self, size):
+        """Make sure there is room for at least size entries"""
+        if size <= self.capacity:
+            return
+
+        capacity = self.capacity
+        while capacity < size:
+            capacity *= 2
+
+        for col, (dtype, empty) in enumerate(zip(self.dtypes, self.empty)):
+            array = np.full(capacity, empty, dtype=dtype)
+            array[:self.size] = self.arrays[col][:self.size]
+            self.arrays[col] = array
+        keys = np.full(capacity, -1, dtype=np.int64)
+        keys[:self.size] = self.keys[:self.size]
+        self.keys = keys
+
+        self.capacity = capacity
+
+    def Append(self, numRows=1):
+        """Append empty entries (amortized O(1) per entry)
+
+        :return: position of the first new entry
+        """
+        return self.Insert(self.size, numRows)
+
+    def Insert(self, pos, numRows=1):
+        """Insert empty entries at chronological position pos
+
+        :return: position of the first new entry
+        """
+        self._Reserve(self.size + numRows)
+
+        if pos < self.size:
+            # move later entries out of the way
+            for array in self.arrays:
+                array[pos+numRows:self.size+numRows] = array[pos:self.size]
+            self.keys[pos+numRows:self.size+numRows] = self.keys[pos:self.size]
+            # new keys are the largest ones
+            self.sortedkeys = False
+        self.keyorder = None
+
+        for array, empty in zip(self.arrays, self.empty):
+            array[pos:pos+numRows] = empty
+        self.keys[pos:pos+numRows] = np.arange(self.nextkey, self.nextkey+numRows)
+        self.nextkey += numRows
+
+        self.size += numRows
+
+        return pos
+
+    def Delete(self, mask):
+        """Delete all entries for which the boolean mask (in chronological
+        order) is True, compacting all columns in a single pass"""
+        keep = ~np.asarray(mask, dtype=bool)
+        size = int(keep.sum())
+
+        for array, empty in zip(self.arrays, self.empty):
+            array[:size] = array[:self.size][keep]
+            # release references to deleted objects
+            array[size:self.size] = empty
+        self.keys[:size] = self.keys[:self.size][keep]
+        self.keys[size:self.size] = -1
+
+        self.size = size
+        self.keyorder = None
+
+    def Restore(self, positions, keys, values=None):
+        """Insert entries with given keys (and values) again, e.g. to revert
+        a deletion
+
+        :param positions: ascending positions of the entries after insertion
+        :param keys: row keys of the entries
+        :param values: list with one array of values per column (or None
+                       for empty entries)
+        """
+        positions = np.asarray(positions)
+        numRows = len(positions)
+        if numRows == 0:
+            return
+
+        if positions[-1] - positions[0] == numRows - 1:
+            # adjacent entries (the usual case) -> only move later entries
+            self.Insert(int(positions[0]), numRows)
+            target = slice(int(positions[0]), int(positions[0]) + numRows)
+        else:
+            # scattered entries -> merge old and restored entries
+            self._Reserve(self.size + numRows)
+            restored = np.zeros(self.size + numRows, dtype=bool)
+            restored[positions] = True
+            for array in self.arrays:
+                array[:self.size + numRows][~restored] = array[:self.size].copy()
+            self.keys[:self.size + numRows][~restored] = self.keys[:self.size].copy()
+            self.size += numRows
+            target = positions
+
+        self.keys[target] = keys
+        self.nextkey = max(self.nextkey, int(np.max(keys)) + 1)
+        for col, (array, empty) in enumerate(zip(self.arrays, self.empty)):
+            array[target] = empty if values is None else values[col]
+
+        self._CheckKeyOrder()
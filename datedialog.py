@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Dialog to navigate a logbook by date"""
+
+import wx
+import pandas as pd
+
+# same format as in the grid
+DATE_FORMAT = "%Y/%m/%d %H:%M"
+
+class DateDialog(wx.Dialog):
+    """Ask for a date (or date range) and what to do with it
+
+    ShowModal() returns ID_GOTO, ID_RANGE, ID_RUNNING or wx.ID_CANCEL."""
+
+    ID_GOTO = wx.NewIdRef(count=1)
+    ID_RANGE = wx.NewIdRef(count=1)
+    ID_RUNNING = wx.NewIdRef(count=1)
+
+    def __init__(self, parent, name):
+        """Initialization
+
+        :param name: name of the logbook
+        """
+        wx.Dialog.__init__(self, parent, wx.ID_ANY, "Go to date in \"{}\"".format(name))
+
+        now = pd.Timestamp.now()
+        self.start = wx.TextCtrl(self, wx.ID_ANY, now.normalize().strftime(DATE_FORMAT))
+        self.stop = wx.TextCtrl(self, wx.ID_ANY, "")
+        self.stop.SetHint("one day later")
+
+        grid = wx.FlexGridSizer(2, 2, 5, 5)
+        grid.Add(wx.StaticText(self, wx.ID_ANY, "From:"), 0, wx.ALIGN_CENTER_VERTICAL)
+        grid.Add(self.start, 1, wx.EXPAND)
+        grid.Add(wx.StaticText(self, wx.ID_ANY, "To:"), 0, wx.ALIGN_CENTER_VERTICAL)
+        grid.Add(self.stop, 1, wx.EXPAND)
+        grid.AddGrowableCol(1)
+
+        buttons = wx.BoxSizer(wx.HORIZONTAL)
+        for id, label, tooltip in [
+                (self.ID_GOTO, "Go to", "Go to the first entry started at or after \"From\""),
+                (self.ID_RANGE, "Select range", "Select all entries started between \"From\" and \"To\""),
+                (self.ID_RUNNING, "Select running", "Select all sessions running at \"From\""),
+                (wx.ID_CANCEL, "Cancel", "")]:
+            button = wx.Button(self, id, label)
+            button.SetToolTip(tooltip)
+            buttons.Add(button, 0, wx.ALL, 5)
+            if id != wx.ID_CANCEL:
+                button.Bind(wx.EVT_BUTTON, self.OnButton)
+        self.FindWindow(self.ID_GOTO).SetDefault()
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(wx.StaticText(self, wx.ID_ANY, "Dates as YYYY/MM/DD [HH:MM]"), 0, wx.ALL, 10)
+        sizer.Add(grid, 0, wx.EXPAND|wx.LEFT|wx.RIGHT, 10)
+        sizer.Add(buttons, 0, wx.ALIGN_RIGHT|wx.ALL, 5)
+        self.SetSizerAndFit(sizer)
+
+    def OnButton(self, event):
+        """Check the dates before closing the dialog"""
+        if self.GetStart() is None or (event.GetId() == self.ID_RANGE and self.GetStop() is None):
+            wx.MessageBox("Please enter dates as YYYY/MM/DD or YYYY/MM/DD HH:MM.",
+                          "Invalid date", wx.OK|wx.ICON_ERROR, self)
+            return
+        self.EndModal(event.GetId())
+
+    def _Parse(self, s):
+        """Convert string into timestamp (None if invalid)"""
+        try:
+            time = pd.Timestamp(s.strip())
+        except ValueError:
+            return None
+        return None if pd.isnull(time) else time
+
+    def GetStart(self):
+        """Entered start time (None if invalid)"""
+        return self._Parse(self.start.GetValue())
+
+    def GetStop(self):
+        """Entered stop time, one day after the start time if left empty
+        (None if invalid)"""
+        if not self.stop.GetValue().strip():
+            start = self.GetStart()
+            return None if start is None else start + pd.Timedelta(days=1)
+        return self._Parse(self.stop.GetValue())
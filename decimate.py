@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Reduction of long data series to about the number of points that can
+be displayed, see PlotFrame
+
+Both methods expect x to be sorted and y to contain no NaN."""
+
+import numpy as np
+
+def MinMax(x, y, npoints):
+    """Keep the minimum and maximum of each of npoints/2 consecutive
+    buckets (in their original order), so that the envelope of the data
+    and all spikes are preserved (vectorized)"""
+    n = len(x)
+    if n <= npoints:
+        return x, y
+
+    size = int(np.ceil(n / max(npoints // 2, 1)))
+    buckets = int(np.ceil(n / size))
+    # pad the last bucket, NaN is ignored by nanargmin/nanargmax
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+
+    base = np.arange(buckets) * size
+    idx = np.stack([base + np.nanargmin(padded, axis=1), base + np.nanargmax(padded, axis=1)], axis=1)
+    idx = np.unique(idx)
+    return x[idx], y[idx]
+
+def LTTB(x, y, npoints):
+    """Largest-Triangle-Three-Buckets: keep first and last point and from
+    each of npoints-2 buckets the point spanning the largest triangle with
+    the point kept from the previous bucket and the mean of the next
+    bucket (visually closest to the full line)"""
+    n = len(x)
+    if n <= npoints or npoints < 3:
+        return x, y
+
+    # work on floats (e.g. for datetimes)
+    xf = np.asarray(x, dtype=np.float64)
+    edges = np.linspace(1, n - 1, npoints - 1).astype(np.int64)
+
+    idx = np.empty(npoints, dtype=np.int64)
+    idx[0] = 0
+    idx[-1] = n - 1
+    last = 0
+    for bucket in range(npoints - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            nextx = xf[stop:edges[bucket + 2]].mean()
+            nexty = y[stop:edges[bucket + 2]].mean()
+        else:
+            nextx, nexty = xf[-1], y[-1]
+
+        areas = np.abs((xf[last] - nextx) * (y[start:stop] - y[last])
+                       - (xf[last] - xf[start:stop]) * (nexty - y[last]))
+        last = start + int(np.argmax(areas))
+        idx[bucket + 1] = last
+
+    return x[idx], y[idx]
+
+METHODS = {
+    'minmax': MinMax,
+    'lttb': LTTB,
+}
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Local HTTP/JSON API on the logbooks (optional)
+
+Serves the in-memory logbooks of the GUI (or of the daemon, see loggerd.py)
+to other programs, e.g. dashboards, so they never have to read logbook
+files while they are written. Requests are handled in background threads
+that only hold the lock of a logbook (see logbook.Logbook.Snapshot) while
+copying the requested entries. Enabled by an 'http' section of the settings:
+
+    "http": {"enabled": true, "host": "localhost", "port": 8090}
+
+GET requests (logbook names URL encoded, case insensitive):
+
+    /logbooks                         status of all logbooks
+    /logbooks/<name>                  status of a logbook incl. latest entry
+    /logbooks/<name>/latest           latest entry
+    /logbooks/<name>/entries          entries, oldest first (streamed)
+    /logbooks/<name>/hours            operating hours and sessions (incl. archive)
+    /metrics                          metrics in Prometheus text format
+
+entries and hours take the optional parameters since and until (entries
+started within [since, until), e.g. ?since=2024-05-01&until=2024-06-01),
+entries also columns (words the label words start with as in the search,
+may be repeated). Every reply carries an ETag that only changes with the
+logbook, so clients polling with If-None-Match get 304 Not Modified cheaply."""
+
+import http.server
+import json
+import threading
+import urllib.parse
+import uuid
+
+import numpy as np
+import pandas as pd
+
+import columnschema
+import metrics
+import searchindex
+
+# default address of the server (only reachable from the local computer)
+HTTP_HOST = 'localhost'
+HTTP_PORT = 8090
+# number of entries encoded and sent at once by streamed replies
+HTTP_CHUNK_ENTRIES = 1000
+
+def ColumnValues(kind, values):
+    """Convert a column array into a list of JSON compatible values (empty
+    cells become None, times ISO 8601 strings)"""
+    if kind == columnschema.KIND_TIME:
+        strings = np.datetime_as_string(values, unit='s').astype(object)
+        strings[np.isnat(values)] = None
+        return strings.tolist()
+    if kind == columnschema.KIND_COMMENT:
+        return [value if isinstance(value, str) else None for value in values]
+    objects = values.astype(object)
+    objects[np.isnan(values)] = None
+    return objects.tolist()
+
+def Entries(book, cols, columns):
+    """Convert column arrays into a list of entries (dictionaries by column
+    label)"""
+    labels = [book.column_labels[col].replace('\n', ' ') for col in cols]
+    values = [ColumnValues(book.column_kinds[col], column) for col, column in zip(cols, columns)]
+    return [dict(zip(labels, entry)) for entry in zip(*values)]
+
+def Version(book, version=None):
+    """Return the version of a logbook for ETags, unique also if the
+    logbook was loaded again (versions start at 0 for every instance)
+
+    :param version: version as returned by Snapshot() (default current)
+    """
+    return "{}.{}".format(book.instance, book.version if version is None else version)
+
+def Status(name, book):
+    """Return version (see Version()) and status of a logbook as
+    dictionary"""
+    status = book.Status()
+    latest = Entries(book, range(len(book.column_labels)), status['latest'])
+    return Version(book, status['version']), {
+        'name': name,
+        'entries': status['entries'],
+        'hours': status['hours'],
+        'sessions': status['sessions'],
+        'running': status['running'],
+        'latest': latest[0] if latest else None,
+    }
+
+class ApiError(Exception):
+    """Error reply with HTTP status code"""
+
+    def __init__(self, code, message):
+        Exception.__init__(self, message)
+        self.code = code
+
+class NotModified(Exception):
+    """Reply 304 was sent already"""
+
+class ApiHandler(http.server.BaseHTTPRequestHandler):
+    """Answers the GET requests of the API"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        # the GUI has no console to log to
+        pass
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        parts = [urllib.parse.unquote(part) for part in url.path.strip('/').split('/')]
+        query = urllib.parse.parse_qs(url.query)
+        try:
+            if parts == ['metrics']:
+                self._SendText(metrics.ToPrometheus(), 'text/plain; version=0.0.4; charset=utf-8')
+                return
+
+            if parts[0] != 'logbooks' or len(parts) > 3:
+                raise ApiError(404, "unknown path {}".format(url.path))
+
+            if len(parts) == 1:
+                books = self.server.Books()
+                self._CheckETag([Version(book) for name, book in books])
+                statuses = [Status(name, book) for name, book in books]
+                self._SendJSON([status for version, status in statuses],
+                               [version for version, status in statuses])
+                return
+
+            name, book = self._Find(parts[1])
+            action = parts[2] if len(parts) == 3 else 'status'
+            if action not in ('status', 'latest', 'entries', 'hours'):
+                raise ApiError(404, "unknown path {}".format(url.path))
+            self._CheckETag([Version(book)])
+            if action == 'status':
+                version, status = Status(name, book)
+                self._SendJSON(status, [version])
+            elif action == 'latest':
+                version, status = Status(name, book)
+                self._SendJSON(status['latest'], [version])
+            elif action == 'entries':
+                self._SendEntries(book, query)
+            else:
+                self._SendHours(book, query)
+        except NotModified:
+            pass
+        except ApiError as e:
+            self._SendJSON({'error': str(e)}, code=e.code)
+        except (ValueError, TypeError, OverflowError) as e:
+            self._SendJSON({'error': str(e)}, code=400)
+        except (ImportError, OSError) as e:
+            # e.g. the archive cannot be read
+            self._SendJSON({'error': "{}: {}".format(type(e).__name__, e)}, code=500)
+
+    def _Find(self, name):
+        """Return name and logbook by (case insensitive) name"""
+        for bookname, book in self.server.Books():
+            if bookname.lower() == name.lower():
+                return bookname, book
+        raise ApiError(404, "no logbook '{}'".format(name))
+
+    def _ETag(self, versions):
+        # versions are only valid within one run, hence the server token
+        return '"{}-{}"'.format(self.server.token, '-'.join(str(version) for version in versions))
+
+    def _CheckETag(self, versions):
+        """Answer 304 Not Modified if the client has the current versions
+        of the logbooks"""
+        etag = self._ETag(versions)
+        matches = [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]
+        if etag in matches or '*' in matches:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            raise NotModified()
+
+    def _SendJSON(self, data, versions=None, code=200):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if versions is not None:
+            self.send_header('ETag', self._ETag(versions))
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _SendText(self, text, contenttype):
+        body = text.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', contenttype)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _SendChunk(self, data):
+        self.wfile.write("{:X}\r\n".format(len(data)).encode('ascii') + data + b"\r\n")
+
+    def _SendEntries(self, book, query):
+        """Stream the entries of a date range as JSON array"""
+        cols = range(len(book.column_labels))
+        if 'columns' in query:
+            # the start time is always included
+            cols = {book.startcol}
+            for pattern in query['columns']:
+                cols.update(searchindex.MatchingColumns(book.column_labels, pattern.lower().replace('.', ' ').split()))
+            cols = sorted(cols)
+        version, columns = book.Snapshot(query.get('since', [None])[0], query.get('until', [None])[0], cols=cols)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('ETag', self._ETag([Version(book, version)]))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
+        # encoded in parts, so the reply starts at once and memory stays
+        # bounded for large ranges
+        self._SendChunk(b"[")
+        for first in range(0, len(columns[0]) if columns else 0, HTTP_CHUNK_ENTRIES):
+            entries = Entries(book, cols, [column[first:first+HTTP_CHUNK_ENTRIES] for column in columns])
+            text = ",\n".join(json.dumps(entry, ensure_ascii=False) for entry in entries)
+            self._SendChunk(((",\n" if first else "\n") + text).encode('utf-8'))
+        self._SendChunk(b"\n]\n")
+        self._SendChunk(b"")
+
+    def _SendHours(self, book, query):
+        """Send the operating hours within a date range including the
+        archive (like the status), sessions are clipped to the range"""
+        since = query.get('since', [None])[0]
+        until = query.get('until', [None])[0]
+        # (only the archived years within the range are read)
+        archived = book.archive.Read(since, until, ['Time\nStart', 'Time\nStop'])
+        version, (starts, stops) = book.Snapshot(since, until, cols=[book.startcol, book.stopcol])
+        starts = np.concatenate([archived['Time\nStart'].to_numpy(dtype=starts.dtype), starts])
+        stops = np.concatenate([archived['Time\nStop'].to_numpy(dtype=stops.dtype), stops])
+        complete = ~np.isnat(starts) & ~np.isnat(stops)
+        starts, stops = starts[complete], stops[complete]
+        if until is not None:
+            stops = np.minimum(stops, pd.Timestamp(until).to_datetime64())
+        hours = np.maximum(stops - starts, np.timedelta64(0, 'ns')).sum() / np.timedelta64(1, 'h')
+        self._SendJSON({'since': since, 'until': until, 'hours': float(hours), 'sessions': int(complete.sum())},
+                       [Version(book, version)])
+
+class ApiServer(http.server.ThreadingHTTPServer):
+    """HTTP server answering in background threads"""
+
+    daemon_threads = True
+
+    def __init__(self, books, host=HTTP_HOST, port=HTTP_PORT):
+        """Initialization
+
+        :param books: function returning a list of (name, logbook.Logbook)
+                      of all loaded logbooks
+        """
+        self.Books = books
+        self.token = uuid.uuid4().hex[:8]
+        http.server.ThreadingHTTPServer.__init__(self, (host, port), ApiHandler)
+
+def Start(books, settings):
+    """Start the server in a background thread if enabled by the 'http'
+    section of the settings
+
+    :return: ApiServer (call shutdown() to stop it) or None
+    :raises OSError: if the port is not available
+    """
+    prefs = settings.get('http', {})
+    if not prefs.get('enabled', False):
+        return None
+
+    server = ApiServer(books, prefs.get('host', HTTP_HOST), prefs.get('port', HTTP_PORT))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
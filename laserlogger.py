@@ -2,13 +2,34 @@
 #
 # (c) Florian Schaefer, April 2021
 
+# profiling has to start before the (heavy) imports
+import sys
+import startupprofile
+if '--profile-startup' in sys.argv:
+    startupprofile.Enable()
+import metrics
+if '--metrics' in sys.argv:
+    metrics.Enable()
+
+# commands without GUI (see loggerd.py), the options above may come first
+if __name__ == "__main__":
+    commandline = [arg for arg in sys.argv[1:] if arg not in ('--profile-startup', '--metrics')]
+    if commandline and not commandline[0].startswith('-'):
+        import loggerd
+        sys.exit(loggerd.main(sys.argv[1:]))
+
 import wx
 import json
-import datetime
-import time
+import os
 import loggertable
+import logstorage
+from logbook import FileChangedError
 from laserloggerGUI import LaserLoggerFrame
 import ntptime
+import statsdialog
+import datedialog
+import searchdialog
+import httpapi
 
 # Fix fuzzy fonts on windows
 # https://stackoverflow.com/questions/50884283/how-to-fix-blurry-text-in-wxpython-controls-on-windows
@@ -18,11 +39,16 @@ try:
 except:
     pass
 
+# seconds between two checks whether the settings file or a logbook file was
+# changed
+SETTINGS_POLL_INTERVAL = 2
+
 class LaserLogger(LaserLoggerFrame):
     def __init__(self, *args, **kwds):
         """Application initialization"""
         # prepare main window
-        LaserLoggerFrame.__init__(self, *args, **kwds)
+        with startupprofile.Phase("main window"):
+            LaserLoggerFrame.__init__(self, *args, **kwds)
 
         # set up keyboard shortcuts
         accel_tbl = wx.AcceleratorTable([
@@ -31,10 +57,18 @@ class LaserLogger(LaserLoggerFrame):
                 (wx.ACCEL_CTRL, ord('N'), self.frame_main_toolbar.GetToolByPos(3).GetId()), # Ctrl-N -> New entry
                 (wx.ACCEL_CTRL, ord('A'), self.frame_main_toolbar.GetToolByPos(4).GetId()), # Ctrl-A -> Autofill
                 (wx.ACCEL_CTRL, ord('D'), self.frame_main_toolbar.GetToolByPos(5).GetId()), # Ctrl-D -> Duplicate cell
-                (wx.ACCEL_CTRL, ord('P'), self.frame_main_toolbar.GetToolByPos(7).GetId()), # Ctrl-P -> Plot
+                (wx.ACCEL_CTRL, ord('Z'), self.frame_main_toolbar.GetToolByPos(6).GetId()), # Ctrl-Z -> Undo
+                (wx.ACCEL_CTRL, ord('Y'), self.frame_main_toolbar.GetToolByPos(7).GetId()), # Ctrl-Y -> Redo
+                (wx.ACCEL_CTRL, ord('P'), self.frame_main_toolbar.GetToolByPos(9).GetId()), # Ctrl-P -> Plot
+                (wx.ACCEL_CTRL, ord('I'), self.frame_main_toolbar.GetToolByPos(10).GetId()), # Ctrl-I -> Statistics
+                (wx.ACCEL_CTRL, ord('G'), self.frame_main_toolbar.GetToolByPos(11).GetId()), # Ctrl-G -> Go to date
+                (wx.ACCEL_CTRL, ord('F'), self.frame_main_toolbar.GetToolByPos(12).GetId()), # Ctrl-F -> Search
             ])
         self.SetAcceleratorTable(accel_tbl)
 
+        # modeless search dialog (if open)
+        self.searchdialog = None
+
         # initial settings
         self.prefs_file = "laserlogger_settings.json"
         self.prefs = {
@@ -52,29 +86,29 @@ class LaserLogger(LaserLoggerFrame):
                 'broker': '192.168.1.11'
                 }
             }
-        self.SettingsLoad()
+        with startupprofile.Phase("settings load"):
+            self.SettingsLoad()
         #self.SettingsSave()
 
+        # time stamps from NTP, synchronized in the background
+        ntptime.Start(self.prefs)
+
+        if self.prefs.get('metrics', {}).get('enabled', False):
+            metrics.Enable()
+
         # convert settings into our own structure (so that we might save the
         # settings dictionary again easily without having the grid in the way)
         self.logbooks = []
         for book in self.prefs['logbooks']:
-            self.logbooks.append({
-                    'name': book['name'],
-                    'filename': book['filename'],
-                    'grid': None
-                })
-
-        for logbook in self.logbooks:
-            logbook['grid'] = loggertable.LoggerGrid(self.notebook, logbook['filename'], self.prefs['mqtt']['broker'])
-            if logbook['grid'].GetTable().data is not None:
-                self.notebook.AddPage(logbook['grid'], logbook['name'])
-            else:
-                # failed to create table (probably could not load CSV file)
-                logbook['grid'] = None
+            logbook = self.OpenLogbook(book)
+            # keep only successfully created logbooks
+            if logbook is not None:
+                self.logbooks.append(logbook)
 
-        # keep only successfully created logbooks
-        self.logbooks = [logbook for logbook in self.logbooks if logbook['grid'] is not None]
+        # optional HTTP/JSON API on the logbooks (answered in the background)
+        self.ServeLogbooks()
+        self.httpserver = None
+        self.StartHTTPServer()
 
         # prepare list of images that can be used for the notebook tabs
         il = wx.ImageList(16, 16)
@@ -84,16 +118,16 @@ class LaserLogger(LaserLoggerFrame):
 
         # mark any lasers that are currently in use (i.e. have no stop time)
         for pos in range(len(self.logbooks)):
-            nb = self.logbooks[pos]
-            if nb['grid'].GetNumberRows() > 0 and not nb['grid'].GetCellValue(0, 1):
-                # no end time set yet -> laser is currently in use
-                self.notebook.SetPageImage(pos, 1)
-            else:
-                # mark laser as idle
-                self.notebook.SetPageImage(pos, 0)
+            self.UpdatePageImage(pos)
 
         self.Layout()
 
+        # apply changes of the settings file and of the logbook files (e.g. by
+        # the daemon, see loggerd.py) while running
+        self.settingstimer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.OnSettingsTimer, self.settingstimer)
+        self.settingstimer.Start(SETTINGS_POLL_INTERVAL * 1000)
+
     ### Status bar
 
     def SetTimedStatusText(self, text, timeout = None):
@@ -143,7 +177,27 @@ class LaserLogger(LaserLoggerFrame):
 
         # save
         try:
-            if nb['grid'].Save():
+            try:
+                saved = nb['grid'].Save()
+            except FileChangedError:
+                # e.g. an entry started or stopped on the command line
+                self.settingstimer.Stop()
+                dlg = wx.MessageDialog(self,
+                        "The logbook file of '{}' was changed by another program\n"
+                        "(e.g. \"laserlogger.py start\") since it was loaded.\n\n"
+                        "Overwrite it with your version (the other changes are lost)\n"
+                        "or reload it (your unsaved changes are lost)?".format(nb['name']),
+                        "Logbook file changed", wx.YES_NO|wx.CANCEL|wx.CANCEL_DEFAULT|wx.ICON_WARNING)
+                dlg.SetYesNoLabels("&Overwrite", "&Reload")
+                result = dlg.ShowModal()
+                dlg.Destroy()
+                self.settingstimer.Start()
+                if result == wx.ID_NO:
+                    self.ReloadLogbook(nb)
+                if result != wx.ID_YES:
+                    return
+                saved = nb['grid'].Save(overwrite=True)
+            if saved:
                 self.SetTimedStatusText("Logbook '{}' saved".format(nb['name']), 3)
             else:
                 self.SetTimedStatusText("Logbook '{}' could not be saved".format(nb['name']), 5)
@@ -221,7 +275,14 @@ class LaserLogger(LaserLoggerFrame):
         # change the notebook image tab to mark that the laser is not in use any more
         self.notebook.SetPageImage(self.notebook.GetSelection(), 0)
 
-        self.SetTimedStatusText("Auto completed entries of '{}' logbook".format(nb['name']), 3)
+        # report values that are unusual compared to the history
+        table = nb['grid'].GetTable()
+        if table.lastanomalies:
+            self.SetTimedStatusText("Auto completed entries of '{}' logbook, unusual values: {}".format(
+                nb['name'], ", ".join("{} {:g} ({:+.1f} σ)".format(table.column_labels[col].replace('\n', ' '), value, deviation)
+                                      for col, value, deviation in table.lastanomalies)), 20)
+        else:
+            self.SetTimedStatusText("Auto completed entries of '{}' logbook".format(nb['name']), 3)
 
     def OnDuplicateCell(self, e):
         """Duplicate value of cell from row below into current row"""
@@ -248,10 +309,69 @@ class LaserLogger(LaserLoggerFrame):
         value = nb['grid'].GetCellValue(row+1, col)
         nb['grid'].SetCellValue(row, col, value)
 
+    def OnUndo(self, e):
+        """Revert the most recent change of the current logbook"""
+        nb = self.GetNotebook()
+
+        if nb['grid'].GetTable().Undo():
+            self.UpdatePageImage(self.notebook.GetSelection())
+            self.SetTimedStatusText("Undid last change of '{}' logbook".format(nb['name']), 3)
+        else:
+            self.SetTimedStatusText("Nothing to undo in '{}' logbook".format(nb['name']), 3)
+
+    def OnRedo(self, e):
+        """Apply the most recently reverted change of the current logbook again"""
+        nb = self.GetNotebook()
+
+        if nb['grid'].GetTable().Redo():
+            self.UpdatePageImage(self.notebook.GetSelection())
+            self.SetTimedStatusText("Redid last undone change of '{}' logbook".format(nb['name']), 3)
+        else:
+            self.SetTimedStatusText("Nothing to redo in '{}' logbook".format(nb['name']), 3)
+
     def OnPlot(self, e):
         """Open a new window with a plot of the selected columns (and rows)"""
         self.GetNotebook()["grid"].Plot()
 
+    def OnStatistics(self, e):
+        """Show the operating hours statistics of the current logbook"""
+        nb = self.GetNotebook()
+
+        dlg = statsdialog.StatisticsDialog(self, nb['name'], nb['grid'].GetTable())
+        dlg.ShowModal()
+        dlg.Destroy()
+
+    def OnGoToDate(self, e):
+        """Jump to a date or select entries by date in the current logbook"""
+        nb = self.GetNotebook()
+
+        dlg = datedialog.DateDialog(self, nb['name'])
+        action = dlg.ShowModal()
+        start, stop = dlg.GetStart(), dlg.GetStop()
+        dlg.Destroy()
+
+        grid = nb['grid']
+        if action == datedialog.DateDialog.ID_GOTO:
+            if grid.JumpToDate(start) is None:
+                self.SetTimedStatusText("Logbook '{}' is empty".format(nb['name']), 3)
+        elif action == datedialog.DateDialog.ID_RANGE:
+            count = grid.SelectDateRange(start, stop)
+            self.SetTimedStatusText("Selected {} entries started between {} and {}".format(
+                count, start.strftime(datedialog.DATE_FORMAT), stop.strftime(datedialog.DATE_FORMAT)), 5)
+        elif action == datedialog.DateDialog.ID_RUNNING:
+            count = grid.SelectSessionsAt(start)
+            self.SetTimedStatusText("Selected {} sessions running at {}".format(
+                count, start.strftime(datedialog.DATE_FORMAT)), 5)
+        grid.SetFocus()
+
+    def OnSearch(self, e):
+        """Open the search panel (or bring it to front)"""
+        if self.searchdialog is None:
+            self.searchdialog = searchdialog.SearchDialog(self)
+        self.searchdialog.Show()
+        self.searchdialog.Raise()
+        self.searchdialog.query.SetFocus()
+
     def OnNotebookPageChanged(self, e):
         """Handle notebook page change to display some additional information"""
         nb = self.GetNotebook()
@@ -259,27 +379,171 @@ class LaserLogger(LaserLoggerFrame):
         self.SetTimedStatusText("Logbook for \"{}\", total logged operation time: {} h = {} d".format(
             nb['name'], round(hrs, 1), round(hrs/24, 1)))
 
+    def OnSettingsTimer(self, e):
+        """Reload the settings if the file was changed, and logbooks
+        without unsaved changes whose file was changed by another program"""
+        if self.SettingsModified() != self.prefs_mtime:
+            self.SettingsReload()
+
+        # no further reloads while errors are shown
+        self.settingstimer.Stop()
+        for logbook in self.logbooks:
+            table = logbook['grid'].GetTable()
+            # (a missing file is probably just being replaced)
+            if not table.modified and table.ChangedOnDisk() and logstorage.Modified(table.filename) is not None:
+                self.ReloadLogbook(logbook)
+        self.settingstimer.Start()
+
     ### Internal functions
 
+    def OpenLogbook(self, book, pos=None):
+        """Load a logbook of the settings and add its notebook page
+
+        :param pos: position of the page (default last)
+        :return: dictionary of the logbook or None if it could not be loaded
+        """
+        with startupprofile.Phase("{}: total".format(book['filename'])):
+            grid = loggertable.LoggerGrid(self.notebook, book['filename'], self.prefs['mqtt']['broker'])
+        if grid.GetTable().store is None:
+            # failed to create table (probably could not load CSV file)
+            grid.Destroy()
+            return None
+
+        if pos is None:
+            self.notebook.AddPage(grid, book['name'])
+        else:
+            self.notebook.InsertPage(pos, grid, book['name'])
+        return {
+                'name': book['name'],
+                'filename': book['filename'],
+                'grid': grid
+            }
+
+    def CloseLogbook(self, logbook):
+        """Remove a logbook and its notebook page, asking first if there
+        are unsaved changes
+
+        :return: True if the logbook was closed
+        """
+        table = logbook['grid'].GetTable()
+        if table.modified:
+            dlg = wx.MessageDialog(self,
+                    "The logbook '{}' was removed from the preferences,\n"
+                    "but there are unsaved changes!\n\n"
+                    "Do you want to save them before closing it?".format(logbook['name']),
+                    "Unsaved changes", wx.YES_NO|wx.CANCEL|wx.CANCEL_DEFAULT|wx.ICON_WARNING)
+            result = dlg.ShowModal()
+            dlg.Destroy()
+            if result == wx.ID_CANCEL:
+                return False
+            if result == wx.ID_YES:
+                try:
+                    saved = logbook['grid'].Save()
+                except Exception:
+                    saved = False
+                if not saved:
+                    self.SetTimedStatusText("Logbook '{}' could not be saved, it stays open".format(logbook['name']), 5)
+                    return False
+
+        pos = self.logbooks.index(logbook)
+        self.logbooks = self.logbooks[:pos] + self.logbooks[pos+1:]
+        # (before the grid is destroyed)
+        self.ServeLogbooks()
+        table.Close()
+        self.notebook.DeletePage(pos)
+        return True
+
+    def ReloadLogbook(self, logbook):
+        """Load a logbook again from its file (discarding unsaved changes),
+        keeping the MQTT values received so far
+
+        :return: True if the logbook was loaded again
+        """
+        pos = self.logbooks.index(logbook)
+        selected = self.notebook.GetSelection()
+        old = logbook['grid'].GetTable()
+        loaded = self.OpenLogbook(logbook, pos)
+        if loaded is None:
+            # (the error was shown already) keep the old one, not trying
+            # again before the next change
+            old.filetime = logstorage.Modified(old.filename)
+            return False
+
+        self.logbooks = self.logbooks[:pos] + [loaded] + self.logbooks[pos+1:]
+        # (before the old grid is destroyed)
+        self.ServeLogbooks()
+
+        table = loaded['grid'].GetTable()
+        table.mqtt_data = old.mqtt_data
+        table.devices = old.devices
+        old.devices = {}
+        old.Close()
+        self.notebook.DeletePage(pos + 1)
+        self.notebook.ChangeSelection(selected)
+        self.UpdatePageImage(pos)
+        if self.searchdialog is not None:
+            # the results refer to the grids
+            self.searchdialog.Search()
+        self.SetTimedStatusText("Logbook '{}' was changed by another program and loaded again".format(
+            logbook['name']), 5)
+        return True
+
+    def StartHTTPServer(self):
+        """(Re)start the optional HTTP/JSON API according to the settings"""
+        if self.httpserver is not None:
+            self.httpserver.shutdown()
+            self.httpserver.server_close()
+            self.httpserver = None
+
+        try:
+            self.httpserver = httpapi.Start(lambda: self.served, self.prefs)
+        except OSError as e:
+            dlg = wx.MessageDialog(self,
+                                    "Could not start the HTTP API:\n{}\n\n"
+                                    "Please check host and port in the preferences.\n"
+                                    "Continuing without HTTP API.".format(e), "HTTP error",
+                                    wx.OK|wx.ICON_ERROR)
+            dlg.ShowModal()
+            dlg.Destroy()
+
+    def ServeLogbooks(self):
+        """Update the (name, table) list of the logbooks served by the HTTP
+        API, whenever the logbooks changed (the server threads must not call
+        wx methods like GetTable(), and the list is replaced as a whole)"""
+        self.served = [(logbook['name'], logbook['grid'].GetTable()) for logbook in self.logbooks]
+
     def GetNotebook(self):
         """Return dictionary of currently opened notebook tab"""
         pos = self.notebook.GetSelection()
         return self.logbooks[pos]
 
+    def UpdatePageImage(self, pos):
+        """Mark the notebook tab of a laser that is currently in use"""
+        nb = self.logbooks[pos]
+        if nb['grid'].GetNumberRows() > 0 and not nb['grid'].GetCellValue(0, 1):
+            # no end time set yet -> laser is currently in use
+            self.notebook.SetPageImage(pos, 1)
+        else:
+            # mark laser as idle
+            self.notebook.SetPageImage(pos, 0)
+
     def GetTimeStr(self):
         """Obtain the current date/time either from NTP or locally"""
-        try:
-            # try to get the time from an NTP timeserver first
-            timestr = time.strftime("%Y/%m/%d %H:%M:%S", time.localtime(ntptime.RequestTimefromNtp()))
-        except:
-            # if that fails take the local time of the computer
-            timestr = datetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
+        return ntptime.GetTimeStr()
 
-        return timestr
+    def SettingsModified(self):
+        """Return modification time and size of the settings file (None
+        if it does not exist)"""
+        try:
+            stat = os.stat(self.prefs_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
 
     def SettingsLoad(self):
         """Load preferences and settings from file"""
 
+        self.prefs_mtime = self.SettingsModified()
         try:
             with open(self.prefs_file) as json_data_file:
                 loaded_data = json.load(json_data_file)
@@ -300,13 +564,84 @@ class LaserLogger(LaserLoggerFrame):
             dlg.ShowModal()
             dlg.Destroy()
 
+    def SettingsReload(self):
+        """Apply the changes of the settings file while running
+
+        Only what changed is touched: added logbooks are loaded, removed ones
+        closed (logbooks are identified by their file name, so renaming only
+        changes the tab), and the MQTT connections, NTP clock, metrics and
+        HTTP API are only restarted if their settings changed."""
+        # no further reloads while dialogs are shown
+        self.settingstimer.Stop()
+        self.prefs_mtime = self.SettingsModified()
+        try:
+            with open(self.prefs_file) as json_data_file:
+                loaded_data = json.load(json_data_file)
+            old = dict(self.prefs)
+            for key, value in loaded_data.items():
+                self.prefs[key] = value
+            wanted = {book['filename']: book['name'] for book in self.prefs['logbooks']}
+            broker = self.prefs['mqtt']['broker']
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # maybe still being written, the next change is tried again
+            self.SetTimedStatusText("Could not reload preferences: {}".format(e), 5)
+            self.settingstimer.Start()
+            return
+
+        changes = []
+        for logbook in list(self.logbooks):
+            if logbook['filename'] not in wanted:
+                if self.CloseLogbook(logbook):
+                    changes.append("closed '{}'".format(logbook['name']))
+            elif wanted[logbook['filename']] != logbook['name']:
+                logbook['name'] = wanted[logbook['filename']]
+                pos = self.logbooks.index(logbook)
+                mark = " (*)" if self.notebook.GetPageText(pos).endswith(" (*)") else ""
+                self.notebook.SetPageText(pos, logbook['name'] + mark)
+                changes.append("renamed '{}'".format(logbook['name']))
+
+        if broker != old['mqtt']['broker']:
+            for logbook in self.logbooks:
+                logbook['grid'].GetTable().MQTTSetBroker(broker)
+            changes.append("MQTT broker {}".format(broker))
+
+        opened = {logbook['filename'] for logbook in self.logbooks}
+        for book in self.prefs['logbooks']:
+            if book['filename'] not in opened:
+                logbook = self.OpenLogbook(book)
+                if logbook is not None:
+                    self.logbooks = self.logbooks + [logbook]
+                    self.UpdatePageImage(len(self.logbooks) - 1)
+                    changes.append("opened '{}'".format(logbook['name']))
+        self.ServeLogbooks()
+
+        if self.prefs.get('ntp') != old.get('ntp'):
+            ntptime.Start(self.prefs)
+            changes.append("NTP")
+        if self.prefs.get('metrics') != old.get('metrics'):
+            # (metrics requested by --metrics stay on)
+            metrics.Enable(self.prefs.get('metrics', {}).get('enabled', False) or '--metrics' in sys.argv)
+            changes.append("metrics")
+        if self.prefs.get('http') != old.get('http'):
+            self.StartHTTPServer()
+            changes.append("HTTP API")
+
+        if self.searchdialog is not None:
+            # the results refer to the notebook pages
+            self.searchdialog.Search()
+        self.SetTimedStatusText("Preferences reloaded{}".format(
+            ": " + ", ".join(changes) if changes else ""), 5)
+        self.settingstimer.Start()
+
     def SettingsSave(self):
         """Save preferences and settings to file"""
 
         try:
             with open(self.prefs_file, 'w') as json_data_file:
                 json.dump(self.prefs, json_data_file, indent=4)
-                self.SetTimedStatusText("Preferences and settings saved to file", 1)
+            # our own change, nothing to reload
+            self.prefs_mtime = self.SettingsModified()
+            self.SetTimedStatusText("Preferences and settings saved to file", 1)
         except Exception as e:
             dlg = wx.MessageDialog(self,
                                     "Could not save preferences:\n{}\n\n"
@@ -321,6 +656,8 @@ class LaserLoggerApp(wx.App):
         self.frame_main = LaserLogger(None, wx.ID_ANY, "")
         self.SetTopWindow(self.frame_main)
         self.frame_main.Show()
+        # report once the window is actually shown
+        wx.CallAfter(startupprofile.Report)
         return True
 
 
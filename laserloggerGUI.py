@@ -37,9 +37,19 @@ class LaserLoggerFrame(wx.Frame):
         self.Bind(wx.EVT_TOOL, self.OnAutofill, id=tool.GetId())
         tool = self.frame_main_toolbar.AddTool(wx.ID_ANY, "Duplicate", wx.Bitmap("./icons/edit-copy-symbolic.symbolic.png", wx.BITMAP_TYPE_ANY), wx.NullBitmap, wx.ITEM_NORMAL, "Duplicate cell value from row below", "")
         self.Bind(wx.EVT_TOOL, self.OnDuplicateCell, id=tool.GetId())
+        tool = self.frame_main_toolbar.AddTool(wx.ID_ANY, "Undo", wx.ArtProvider.GetBitmap(wx.ART_UNDO, wx.ART_TOOLBAR), wx.NullBitmap, wx.ITEM_NORMAL, "Undo last change", "")
+        self.Bind(wx.EVT_TOOL, self.OnUndo, id=tool.GetId())
+        tool = self.frame_main_toolbar.AddTool(wx.ID_ANY, "Redo", wx.ArtProvider.GetBitmap(wx.ART_REDO, wx.ART_TOOLBAR), wx.NullBitmap, wx.ITEM_NORMAL, "Redo last undone change", "")
+        self.Bind(wx.EVT_TOOL, self.OnRedo, id=tool.GetId())
         self.frame_main_toolbar.AddSeparator()
         tool = self.frame_main_toolbar.AddTool(wx.ID_ANY, "Plot", wx.Bitmap("./icons/preferences-system-details-symbolic.symbolic.png", wx.BITMAP_TYPE_ANY), wx.NullBitmap, wx.ITEM_NORMAL, "Plot selected columns (and selected rows)", "")
         self.Bind(wx.EVT_TOOL, self.OnPlot, id=tool.GetId())
+        tool = self.frame_main_toolbar.AddTool(wx.ID_ANY, "Statistics", wx.ArtProvider.GetBitmap(wx.ART_REPORT_VIEW, wx.ART_TOOLBAR), wx.NullBitmap, wx.ITEM_NORMAL, "Show operating hours and other statistics", "")
+        self.Bind(wx.EVT_TOOL, self.OnStatistics, id=tool.GetId())
+        tool = self.frame_main_toolbar.AddTool(wx.ID_ANY, "Go to date", wx.ArtProvider.GetBitmap(wx.ART_GO_FORWARD, wx.ART_TOOLBAR), wx.NullBitmap, wx.ITEM_NORMAL, "Go to date or select entries by date", "")
+        self.Bind(wx.EVT_TOOL, self.OnGoToDate, id=tool.GetId())
+        tool = self.frame_main_toolbar.AddTool(wx.ID_ANY, "Search", wx.ArtProvider.GetBitmap(wx.ART_FIND, wx.ART_TOOLBAR), wx.NullBitmap, wx.ITEM_NORMAL, "Search comments and values", "")
+        self.Bind(wx.EVT_TOOL, self.OnSearch, id=tool.GetId())
         self.SetToolBar(self.frame_main_toolbar)
         self.frame_main_toolbar.Realize()
         # Tool Bar end
@@ -79,10 +89,30 @@ class LaserLoggerFrame(wx.Frame):
         print("Event handler 'OnDuplicateCell' not implemented!")
         event.Skip()
 
+    def OnUndo(self, event):  # wxGlade: LaserLoggerFrame.<event_handler>
+        print("Event handler 'OnUndo' not implemented!")
+        event.Skip()
+
+    def OnRedo(self, event):  # wxGlade: LaserLoggerFrame.<event_handler>
+        print("Event handler 'OnRedo' not implemented!")
+        event.Skip()
+
     def OnPlot(self, event):  # wxGlade: LaserLoggerFrame.<event_handler>
         print("Event handler 'OnPlot' not implemented!")
         event.Skip()
 
+    def OnStatistics(self, event):  # wxGlade: LaserLoggerFrame.<event_handler>
+        print("Event handler 'OnStatistics' not implemented!")
+        event.Skip()
+
+    def OnGoToDate(self, event):  # wxGlade: LaserLoggerFrame.<event_handler>
+        print("Event handler 'OnGoToDate' not implemented!")
+        event.Skip()
+
+    def OnSearch(self, event):  # wxGlade: LaserLoggerFrame.<event_handler>
+        print("Event handler 'OnSearch' not implemented!")
+        event.Skip()
+
     def OnNotebookPageChanged(self, event):  # wxGlade: LaserLoggerFrame.<event_handler>
         print("Event handler 'OnNotebookPageChanged' not implemented!")
         event.Skip()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Live values of the automatically filled columns of a logbook
+
+Values arrive from MQTT messages (pushed by logbook.Logbook.OnMQTTMessage) or
+are polled from Toptica lasers in a background thread. They are only kept
+for columns somebody subscribed to (e.g. a live plot), in bounded ring
+buffers."""
+
+import threading
+import time
+
+import numpy as np
+
+import toptica
+
+# number of values kept per column
+LIVE_BUFFER_SIZE = 10000
+# interval (in s) between two readings of polled sources
+LIVE_POLL_INTERVAL = 0.5
+
+class RingBuffer(object):
+    """Fixed size buffer of (time, value) pairs, safe to be filled from
+    another thread"""
+
+    def __init__(self, capacity=LIVE_BUFFER_SIZE):
+        self.times = np.zeros(capacity)
+        self.values = np.zeros(capacity)
+        self.capacity = capacity
+        self.count = 0
+        # incremented on every change, so readers can skip unchanged buffers
+        self.version = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def Append(self, t, value):
+        with self.lock:
+            pos = self.count % self.capacity
+            self.times[pos] = t
+            self.values[pos] = value
+            self.count += 1
+            self.version += 1
+
+    def Data(self):
+        """Return copies of times and values in chronological order"""
+        with self.lock:
+            if self.count <= self.capacity:
+                return self.times[:self.count].copy(), self.values[:self.count].copy()
+            pos = self.count % self.capacity
+            return np.roll(self.times, -pos), np.roll(self.values, -pos)
+
+class LiveFeed(object):
+    """Distributes live values to the ring buffers of subscribed columns"""
+
+    def __init__(self, autoinfo):
+        """Initialization
+
+        :param autoinfo: autofill information by column label (see
+                         columnschema.ParseAutoinfo)
+        """
+        self.autoinfo = autoinfo
+        # label -> [ring buffer, number of subscribers]
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+        self.poller = None
+
+    def Subscribe(self, label):
+        """Start collecting values of a column (which needs an automatic
+        source) and return its ring buffer"""
+        with self.lock:
+            entry = self.subscriptions.setdefault(label, [RingBuffer(), 0])
+            entry[1] += 1
+
+            if self.autoinfo[label]['type'] == 'toptica' and self.poller is None:
+                self.poller = threading.Thread(target=self._Poll, daemon=True)
+                self.poller.start()
+
+        return entry[0]
+
+    def Unsubscribe(self, label):
+        """Stop collecting values of a column (once all subscribers are gone)"""
+        with self.lock:
+            entry = self.subscriptions.get(label)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self.subscriptions[label]
+
+    def Publish(self, topic, value):
+        """Distribute a value received via MQTT"""
+        if not self.subscriptions:
+            return
+
+        now = time.time()
+        with self.lock:
+            for label, (buffer, count) in self.subscriptions.items():
+                source = self.autoinfo[label]
+                if source['type'] == 'mqtt' and source['uri'] == topic:
+                    buffer.Append(now, value)
+
+    def _Poll(self):
+        """Read subscribed Toptica values until there are none left"""
+        devices = {}
+        while True:
+            with self.lock:
+                polled = [(label, self.autoinfo[label], buffer)
+                          for label, (buffer, count) in self.subscriptions.items()
+                          if self.autoinfo[label]['type'] == 'toptica']
+                if not polled:
+                    self.poller = None
+                    return
+
+            for label, source, buffer in polled:
+                device = (source['ip'], source['port'])
+                if device not in devices:
+                    devices[device] = toptica.DLCpro(ip=source['ip'], port=source['port'])
+                reply = devices[device].getParam(source['uri'])
+                if not devices[device].connected:
+                    # try to reconnect in the next round
+                    del devices[device]
+                    continue
+                try:
+                    value = float(reply)
+                except ValueError:
+                    continue
+                # photodiode readings are logged in mV (see LoggerTable.Autofill)
+                if "value-act" in source['uri'] and "(mV)" in label:
+                    value *= 1000
+                buffer.Append(time.time(), value)
+
+            time.sleep(LIVE_POLL_INTERVAL)
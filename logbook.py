@@ -0,0 +1,968 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Logbook data and logic without any GUI
+
+Holds the column store of a logbook together with all indexes, the undo
+log, MQTT/Toptica autofill and saving. LoggerTable builds the wx grid table
+on top of it, the command line interface and the daemon (loggerd.py) use
+it directly. Rows are counted like in the grid, newest entry first."""
+
+import functools
+import itertools
+import sys
+import threading
+from time import sleep
+
+import numpy as np
+import pandas as pd
+
+import anomalies
+import archive
+import columnschema
+import columnstats
+import columnstore
+import livefeed
+import logstorage
+import metrics
+import searchindex
+import startupprofile
+import timeindex
+import toptica
+import undolog
+import usagestats
+
+# numbers of the loaded Logbook instances
+_instances = itertools.count(1)
+
+def changes_data(f):
+    """Decorator for methods that change data.
+    Needed to see wheter file has been modified after last save. Changes
+    attribute 'modified'. Changes are done holding the lock of the logbook
+    and counted in its attribute 'version' (see Snapshot()).
+
+    Taken from the "Cam" software."""
+    @functools.wraps(f)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            # storage backends writing through each change are never 'modified'
+            if not self.storage.writethrough:
+                if not self.modified:
+                    self._NotifyModified()
+                self.modified = True
+            try:
+                return f(self, *args, **kwargs)
+            finally:
+                self.version += 1
+                if self.storage.writethrough:
+                    # our own writes are no changes by somebody else
+                    self.filetime = logstorage.Modified(self.filename)
+    return wrapper
+
+class FileChangedError(Exception):
+    """The logbook file was changed by somebody else (e.g. the daemon, see
+    loggerd.py) since it was loaded or saved"""
+
+class Logbook(object):
+    """Logbook backed by a column store of numpy arrays
+
+    Changes are announced through the _Notify...() methods, which do nothing
+    here and are overridden by the grid table to update the view."""
+
+    def __init__(self, filename, mqtt_broker = None):
+        """Load the logbook (CSV file or SQLite table), build the indexes
+        and connect to MQTT
+
+        :raises Exception: if the logbook cannot be read
+        """
+        # held while changing data, so other threads can take consistent
+        # snapshots; the version is incremented with every change
+        self.lock = threading.RLock()
+        self.version = 0
+        # tells apart the versions of a logbook loaded again
+        self.instance = next(_instances)
+
+        # import logbook data (CSV file or SQLite table)
+        self.filename = filename
+        # modification time of the file as loaded (taken before reading, so
+        # a change while reading is noticed later)
+        self.filetime = logstorage.Modified(filename)
+        with startupprofile.Phase("{}: load".format(filename)), \
+             metrics.Timer('logbook_load_seconds', "Reading a logbook from storage"):
+            self.storage = logstorage.OpenStorage(filename)
+            # read special information on automatic data import and main
+            # part of log file
+            self.autoinfoline, data = self.storage.Load()
+
+        # evaluate the column labels and autofill information once
+        self.schema = columnschema.ColumnSchema(self.autoinfoline.columns.to_list(),
+                                                self.autoinfoline.iloc[0].to_list())
+
+        # convert the chronologically ordered data to a column store of
+        # numpy arrays (this is to speed up the table as df.iloc() is very
+        # slow). The store also enforces proper data types for date/time
+        # columns (especially needed when table is still empty, as in this
+        # case the type is just 'object'). Isotope columns are saved as
+        # integers if possible (this way in the saved CSV file we won't have
+        # fractional numbers).
+        with startupprofile.Phase("{}: column store".format(filename)), \
+             metrics.Timer('logbook_store_seconds', "Converting a loaded logbook to the column store"):
+            self.store = columnstore.ColumnStore(data, self.schema)
+
+        # maintain a convenient list of the column labels and kinds
+        self.column_labels = self.schema.labels
+        self.column_kinds = self.schema.kinds
+
+        # reversed views on the column arrays (newest entries top)
+        self._UpdateNumpyArray()
+
+        # running totals of the operating hours
+        self.startcol = self.schema.Column('Time\nStart')
+        self.stopcol = self.schema.Column('Time\nStop')
+        with startupprofile.Phase("{}: statistics and indexes".format(filename)):
+            self.usage = usagestats.UsageStats(self.store.Column(self.startcol), self.store.Column(self.stopcol))
+            # sessions sorted by start time for date lookups
+            self.timeindex = timeindex.TimeIndex(self.store.Column(self.startcol), self.store.Column(self.stopcol),
+                                                 self.store.Keys())
+
+        # entries moved out of the logbook, read on demand
+        self.archive = archive.Archive(archive.ArchivePath(filename))
+        # usage statistics of the archive (read once when needed)
+        self.archiveusage = None
+
+        # words of all comment columns, indexed in the background
+        self.commentcols = [col for col, kind in enumerate(self.column_kinds) if kind == columnschema.KIND_COMMENT]
+        self.search = searchindex.SearchIndex()
+        self.search.Build(self.store.Keys().copy(),
+                          zip(*[self.store.Column(col).copy() for col in self.commentcols]))
+
+        # statistics of numeric columns, calculated on demand
+        self.colstats = columnstats.ColumnStats()
+
+        # drift detectors of the numeric (non-integer) columns and flagged
+        # cells as (key, column)
+        with startupprofile.Phase("{}: drift detectors".format(filename)):
+            # (rounded values must not make the spread 0)
+            self.drift = {col: anomalies.DriftDetector(self.store.Column(col), resolution=0.0
+                                                       if self.schema.precisions[col] is None
+                                                       else 10.0**-self.schema.precisions[col])
+                          for col, kind in enumerate(self.column_kinds)
+                          if kind == columnschema.KIND_FLOAT and self.column_labels[col] not in self.schema.integers}
+        self.anomalies = set()
+        # (column, value, deviation) of unusual values of the last autofill
+        self.lastanomalies = []
+
+        # display strings of time and float columns, built on first use
+        self.display = [None] * len(self.column_labels)
+
+        # table is not (yet) modified
+        self.modified = False
+
+        # log of changes that can be reverted
+        self.undo = undolog.UndoLog()
+
+        # autofill information by column label
+        self.autoinfo = {label: source for label, source in zip(self.column_labels, self.schema.sources)
+                         if source is not None}
+        # live values of these columns (for live plots)
+        self.live = livefeed.LiveFeed(self.autoinfo)
+        # open connections to Toptica lasers by (ip, port), kept between
+        # autofills
+        self.devices = {}
+
+        # set up MQTT
+        self.mqtt_prefs = {
+            "mqtt_broker_ip": mqtt_broker,
+            "mqtt_subscribe_topics": []
+            }
+        self.mqtt_prefs['mqtt_subscribe_topics'] = [value['uri'] for value in self.autoinfo.values() if value['type']=='mqtt']
+        self.mqtt_connected = False
+        # (paho is only imported if a broker is configured)
+        self.mqtt_client = None
+        # set up some storage space for MQTT messages
+        self.mqtt_data = {}
+        with startupprofile.Phase("{}: MQTT connect".format(filename)):
+            self.MQTTconnect()
+
+    ### Notifications of changes (overridden by the grid table)
+
+    def _ReportError(self, title, message):
+        """Tell the user about a problem that does not stop the logbook"""
+        print("{}: {}".format(title, message), file=sys.stderr)
+
+    def _NotifyModified(self):
+        """The logbook got modified since it was last saved"""
+
+    def _NotifySaved(self):
+        """The logbook was saved"""
+
+    def _NotifyRowsInserted(self, pos, numRows):
+        """Rows were inserted at grid row pos"""
+
+    def _NotifyRowsAppended(self, numRows):
+        """Rows were appended to the end (oldest entries)"""
+
+    def _NotifyRowsDeleted(self, pos, numRows):
+        """Rows were deleted starting at grid row pos"""
+
+    def _NotifyValuesChanged(self):
+        """Any number of values changed"""
+
+    ### MQTT
+
+    def OnMQTTConnected(self, client, userdata, flags, rc):
+        """Callback function when connected to broker"""
+
+        for topic in self.mqtt_prefs['mqtt_subscribe_topics']:
+            self.mqtt_client.subscribe(topic)
+
+        self.mqtt_client.on_message=self.OnMQTTMessage
+
+        self.mqtt_connected = True
+
+    def OnMQTTDisconnected(self, client, userdata, rc):
+        """Callback function when disconnected from broker"""
+        self.mqtt_connected = False
+
+    def MQTTconnect(self):
+        """Helper function to connect to MQTT broker"""
+        if not self.mqtt_prefs["mqtt_broker_ip"]:
+            return
+
+        if self.mqtt_client is None:
+            import paho.mqtt.client as mqtt
+            self.mqtt_client = mqtt.Client()
+            self.mqtt_client.on_connect = self.OnMQTTConnected
+            self.mqtt_client.on_disconnect = self.OnMQTTDisconnected
+
+        if self.mqtt_prefs['mqtt_broker_ip']:
+            try:
+                self.mqtt_client.connect(self.mqtt_prefs['mqtt_broker_ip'], keepalive=10)
+                self.mqtt_client.loop_start()
+            except Exception as e:
+                self._ReportError("MQTT error",
+                                  "Could not connect to MQTT broker:\n{}\n\n"
+                                  "Please check broker IP in the preferences.\n"
+                                  "Continuing without MQTT support.".format(e))
+
+    def OnMQTTMessage(self, client, userdata, message):
+        """Callback function for MQTT to handle incoming messages"""
+        if metrics.enabled:
+            metrics.Counter('mqtt_messages_total', "Received MQTT messages", topic=message.topic).Inc()
+
+        if "wavemeter" in message.topic:
+            if not message.topic in self.mqtt_data.keys():
+                self.mqtt_data[message.topic] = np.empty([0, 1])
+
+            try:
+                value = float(message.payload)
+                self.mqtt_data[message.topic] = np.append(self.mqtt_data[message.topic], value)
+                if len(self.mqtt_data[message.topic]) > 30:
+                    self.mqtt_data[message.topic] = self.mqtt_data[message.topic][1:]
+                # converted to THz as in Autofill()
+                self.live.Publish(message.topic, value/1e6)
+            except:
+                pass
+        else:
+            try:
+                self.mqtt_data[message.topic] = float(message.payload)
+                self.live.Publish(message.topic, self.mqtt_data[message.topic])
+            except:
+                pass
+
+        return
+
+    def MQTTResetData(self):
+        """Reset (that is forget) all values received via MQTT"""
+        self.mqtt_data = {}
+
+    def MQTTSetBroker(self, mqtt_broker):
+        """Connect to another MQTT broker (nothing happens if the broker is
+        unchanged)"""
+        if mqtt_broker == self.mqtt_prefs['mqtt_broker_ip']:
+            return
+
+        if self.mqtt_client is not None:
+            self.mqtt_client.loop_stop()
+            self.mqtt_client.disconnect()
+            self.mqtt_client = None
+        self.mqtt_connected = False
+        self.MQTTResetData()
+        self.mqtt_prefs['mqtt_broker_ip'] = mqtt_broker
+        self.MQTTconnect()
+
+    ### Toptica lasers
+
+    def _Device(self, ip, port):
+        """Return a connected DLCpro object, reusing the open connection of
+        previous autofills where possible"""
+        dlc = self.devices.get((ip, port))
+        if dlc is None or not dlc.connected:
+            dlc = toptica.DLCpro(ip=ip, port=port)
+            self.devices[(ip, port)] = dlc
+        return dlc
+
+    def Close(self):
+        """Disconnect from MQTT broker, lasers and storage (without saving)"""
+        if self.mqtt_client is not None:
+            self.mqtt_client.loop_stop()
+            self.mqtt_client.disconnect()
+        self.devices = {}
+        self.storage.Close()
+
+    ### Rows and cells
+
+    def _UpdateNumpyArray(self):
+        """Helper function to rebuild the row reversed views on the column
+        store (cheap, no data is copied)"""
+
+        self.np_columns = [self.store.ReversedColumn(col) for col in range(len(self.column_labels))]
+
+    @property
+    def data(self):
+        """Copy of the logbook as Pandas dataframe (newest entries top) or
+        None if the logbook could not be loaded"""
+        if self.store is None:
+            return None
+        return self.store.ToDataFrame().iloc[::-1]
+
+    def _Position(self, row):
+        """Convert grid row to chronological position in the column store"""
+        return len(self.store) - 1 - row
+
+    def _Session(self, row):
+        """Return start and stop time of a row"""
+        return self.np_columns[self.startcol][row], self.np_columns[self.stopcol][row]
+
+    def GetNumberRows(self):
+        return len(self.store)
+
+    def GetNumberCols(self):
+        return len(self.column_labels)
+
+    def IsEmptyCell(self, row, col):
+        try:
+            #val = self.data.iloc[row, col]
+            val = self.np_columns[col][row]
+            if pd.isnull(val) or val=='':
+                return True
+            else:
+                return False
+
+        except IndexError:
+            return True
+
+    def GetValue(self, row, col):
+        #value = self.data.iloc[row, col]
+        value = self.np_columns[col][row]
+        if pd.isnull(value) or value=='':
+            return None
+
+        if self.column_kinds[col] == columnschema.KIND_TIME:
+            #return value.strftime("%Y/%m/%d %H:%M")
+            return self.GetDisplayString(row, col)
+
+        return value
+
+    def GetDisplayString(self, row, col):
+        """Return the formatted string of a time or float cell"""
+        cache = self.display[col]
+        if cache is None:
+            # format the whole column at once
+            cache = self._FormatValues(col, self.store.Column(col))
+            self.display[col] = cache
+
+        pos = self._Position(row)
+        s = cache[pos]
+        if s is None:
+            # cell was changed since formatting
+            s = self._FormatValues(col, self.store.Column(col)[pos:pos+1])[0]
+            cache[pos] = s
+
+        return s
+
+    @changes_data
+    def SetValue(self, row, col, value):
+        kind = self.column_kinds[col]
+        if kind == columnschema.KIND_TIME:
+            try:
+                value = pd.to_datetime(value)
+            except:
+                value = None
+            if pd.isnull(value):
+                value = None
+        elif kind == columnschema.KIND_FLOAT:
+            try:
+                value = np.float64(value)
+            except:
+                value = None
+
+        old = self._SetCell(row, col, value)
+        self.undo.Record([('set', self._Position(row), col, old, self.np_columns[col][row])])
+
+        self._StoreRows([row])
+
+    def GetColLabelValue(self, col):
+        return self.column_labels[col]
+
+    @changes_data
+    def DeleteRows(self, pos=0, numRows=1):
+        """Delete some rows somewhere in the table"""
+
+        # rows are counted from the newest entry
+        mask = np.zeros(len(self.store), dtype=bool)
+        mask[self._Position(pos+numRows-1):self._Position(pos)+1] = True
+        self._DeleteMask(mask)
+
+        self._NotifyRowsDeleted(pos, numRows)
+
+        return True
+
+    def DeleteRowList(self, rows):
+        """Delete any number of (not necessarily adjacent) rows at once
+        (nothing is marked as modified if the list is empty)"""
+
+        rows = np.unique(np.asarray(rows, dtype=int))
+        if len(rows) == 0:
+            return False
+        return self._DeleteRowList(rows)
+
+    @changes_data
+    def _DeleteRowList(self, rows):
+        mask = np.zeros(len(self.store), dtype=bool)
+        mask[self._Position(rows)] = True
+        self._DeleteMask(mask)
+
+        # As the grid does not keep any per-row information a single
+        # notification on the number of deleted rows is sufficient.
+        self._NotifyRowsDeleted(int(rows[0]), len(rows))
+
+        return True
+
+    @changes_data
+    def AppendRows(self, numRows=1):
+        """Append empty rows to the end of the table"""
+        curRows = self.GetNumberRows()
+        # the end of the table holds the oldest entries
+        self.store.Insert(0, numRows)
+        self.undo.Record([('insert', 0, self.store.Keys()[:numRows].copy())])
+        # rebuild views on numpy representation of data
+        self._UpdateNumpyArray()
+        self._InsertDisplay(0, numRows)
+        self._StoreRows(range(curRows, curRows+numRows))
+
+        self._NotifyRowsAppended(numRows)
+
+        return True
+
+    @changes_data
+    def InsertRows(self, pos=0, numRows=1):
+        """Insert empty rows somewhere in table"""
+        # rows are counted from the newest entry, so inserting at the top of
+        # the table (new entry) is an append to the column store
+        position = self.store.Insert(len(self.store) - pos, numRows)
+        self.undo.Record([('insert', position, self.store.Keys()[position:position+numRows].copy())])
+        # rebuild views on numpy representation of data
+        self._UpdateNumpyArray()
+        self._InsertDisplay(position, numRows)
+        self._StoreRows(range(pos, pos+numRows))
+
+        self._NotifyRowsInserted(pos, numRows)
+
+        return True
+
+    ### Internal functions
+
+    def _DeleteMask(self, mask, record=True):
+        """Delete all rows marked in a (chronological) boolean mask"""
+        keys = self.store.Keys()[mask]
+
+        for key, row in zip(keys, len(self.store) - 1 - np.flatnonzero(mask)):
+            self.search.Remove(key, self.GetCommentText(row))
+
+        if record:
+            self.undo.Record([('delete', np.flatnonzero(mask), keys,
+                               [self.store.Column(col)[mask] for col in range(len(self.column_labels))])])
+
+        self.usage.Remove(self.store.Column(self.startcol)[mask], self.store.Column(self.stopcol)[mask])
+        self.timeindex.RemoveKeys(keys)
+        self.colstats.Invalidate()
+        self.store.Delete(mask)
+        # rebuild views on numpy representation of data
+        self._UpdateNumpyArray()
+        self._DeleteDisplay(mask)
+
+        if self.storage.writethrough:
+            self.storage.DeleteRows(keys)
+
+    def _RestoreRows(self, positions, keys, values=None):
+        """Insert rows with given keys and values at the given (ascending)
+        chronological positions, e.g. to revert a deletion"""
+        self.store.Restore(positions, keys, values)
+        # rebuild views on numpy representation of data
+        self._UpdateNumpyArray()
+        if positions[-1] - positions[0] == len(positions) - 1:
+            self._InsertDisplay(positions[0], len(positions))
+        else:
+            self.display = [None] * len(self.column_labels)
+
+        self.usage.Add(self.store.Column(self.startcol)[positions], self.store.Column(self.stopcol)[positions])
+        self.timeindex.AddMany(keys, self.store.Column(self.startcol)[positions],
+                               self.store.Column(self.stopcol)[positions])
+        self.colstats.Invalidate()
+        for key, row in zip(keys, len(self.store) - 1 - np.asarray(positions)):
+            self.search.Add(key, self.GetCommentText(row))
+        self._StoreRows(len(self.store) - 1 - np.asarray(positions))
+
+    def _SetCell(self, row, col, value):
+        """Change the value of a single cell and update all derived
+        information
+
+        :return: previous value of the cell
+        """
+        old = self.np_columns[col][row]
+
+        # update numpy array (view on the column store)
+        session = col in (self.startcol, self.stopcol)
+        if session:
+            self.usage.Remove(*self._Session(row))
+        comment = col in self.commentcols
+        if comment:
+            oldtext = self.GetCommentText(row)
+        self.np_columns[col][row] = value
+        if comment:
+            self.search.Update(self.store.keys[self._Position(row)], oldtext, self.GetCommentText(row))
+        # start times are used for the trends of all columns
+        self.colstats.Invalidate(None if col == self.startcol else col)
+        self.anomalies.discard((int(self.store.keys[self._Position(row)]), col))
+        if session:
+            self.usage.Add(*self._Session(row))
+
+            key = self.store.keys[self._Position(row)]
+            start, stop = self._Session(row)
+            if col == self.startcol:
+                self.timeindex.Remove(key, old)
+                self.timeindex.Add(key, start, stop)
+            else:
+                self.timeindex.SetStop(key, start, stop)
+        self._InvalidateDisplay(row, col)
+
+        return old
+
+    def _FormatValues(self, col, values):
+        """Convert an array of values into a list of display strings
+        (vectorized, empty time cells become '' and empty floats '-')"""
+        kind = self.column_kinds[col]
+        if kind == columnschema.KIND_TIME:
+            strings = np.datetime_as_string(values, unit='m')
+            strings = np.char.replace(np.char.replace(strings, '-', '/'), 'T', ' ').astype(object)
+            strings[np.isnat(values)] = ''
+        elif kind == columnschema.KIND_COMMENT:
+            strings = values
+        else:
+            strings = np.char.lstrip(np.char.mod(self.schema.Format(col), values)).astype(object)
+            strings[np.isnan(values)] = '-'
+        return strings.tolist()
+
+    def _InvalidateDisplay(self, row, col):
+        """Forget the display string of a single cell"""
+        if self.display[col] is not None:
+            self.display[col][self._Position(row)] = None
+
+    def _InsertDisplay(self, position, numRows):
+        """Make room for new rows (chronological position) in the display
+        string caches"""
+        for cache in self.display:
+            if cache is not None:
+                cache[position:position] = [None] * numRows
+
+    def _DeleteDisplay(self, mask):
+        """Remove deleted rows (chronological mask) from the display string
+        caches"""
+        for col, cache in enumerate(self.display):
+            if cache is not None:
+                self.display[col] = [s for s, deleted in zip(cache, mask) if not deleted]
+
+    def _StoreRows(self, rows):
+        """Write the given rows to storage backends that support it"""
+        if not self.storage.writethrough:
+            return
+
+        for row in rows:
+            self.storage.WriteRow(self.store.keys[self._Position(row)], self.column_labels,
+                                  [column[row] for column in self.np_columns])
+
+    def Undo(self):
+        """Revert the most recent change (nothing is marked as modified if
+        there is nothing to undo)"""
+        with self.lock:
+            if not self.undo.CanUndo():
+                return False
+            self._Undo()
+        return True
+
+    def Redo(self):
+        """Apply the most recently reverted change again"""
+        with self.lock:
+            if not self.undo.CanRedo():
+                return False
+            self._Redo()
+        return True
+
+    @changes_data
+    def _Undo(self):
+        for op in reversed(self.undo.PopUndo()):
+            self._ApplyOperation(op, True)
+
+        self._NotifyValuesChanged()
+
+    @changes_data
+    def _Redo(self):
+        for op in self.undo.PopRedo():
+            self._ApplyOperation(op, False)
+
+        self._NotifyValuesChanged()
+
+    def _ApplyOperation(self, op, undo):
+        """Revert (undo = True) or repeat a recorded operation"""
+        if op[0] == 'drift':
+            col, before, after, key, flagged = op[1:]
+            self.drift[col].SetState(before if undo else after)
+            # (the flag is removed with the value by _SetCell())
+            if flagged and not undo:
+                self.anomalies.add((key, col))
+            return
+
+        if op[0] == 'set':
+            position, col, old, new = op[1:]
+            row = len(self.store) - 1 - position
+            self._SetCell(row, col, old if undo else new)
+            self._StoreRows([row])
+            return
+
+        if op[0] == 'insert':
+            positions = np.arange(op[1], op[1] + len(op[2]))
+            values = None
+        else:
+            positions, values = op[1], op[3]
+
+        if (op[0] == 'insert') == undo:
+            # remove inserted rows again or repeat deletion
+            mask = np.zeros(len(self.store), dtype=bool)
+            mask[positions] = True
+            row = len(self.store) - 1 - int(positions[-1])
+            self._DeleteMask(mask, record=False)
+            self._NotifyRowsDeleted(row, len(positions))
+        else:
+            # restore deleted rows or repeat insertion
+            self._RestoreRows(positions, op[2], values)
+            row = len(self.store) - 1 - int(positions[-1])
+            self._NotifyRowsInserted(row, len(positions))
+
+    def ChangedOnDisk(self):
+        """Return whether the logbook file was changed by somebody else
+        since it was loaded or saved"""
+        return logstorage.Modified(self.filename) != self.filetime
+
+    @metrics.Timed('logbook_save_seconds', "Saving a logbook")
+    def Save(self, overwrite=False):
+        """Save logbook data to CSV file (SQLite logbooks are always up to date)
+
+        :param overwrite: save even if the file was changed by somebody else
+                          (whose changes are lost)
+        :raises FileChangedError: if the file was changed by somebody else
+        """
+        if self.filename is None:
+            return False
+
+        if not self.storage.writethrough:
+            if not overwrite and self.ChangedOnDisk():
+                raise FileChangedError("'{}' was changed by another program since it was loaded".format(self.filename))
+            # file is stored in chronological order
+            self.storage.Save(self.autoinfoline, self.store.ToDataFrame())
+            self.filetime = logstorage.Modified(self.filename)
+
+        if self.modified:
+            self._NotifySaved()
+
+        self.modified = False
+
+        return True
+
+    @metrics.Timed('autofill_seconds', "Autofill of the latest entry")
+    def Autofill(self):
+        """Automatically fill in missing entries where possible
+
+        The values are obtained (e.g. from the Toptica lasers) before the
+        lock is taken, so other threads are not kept waiting meanwhile."""
+        return self._AutofillCells(self._AutofillValues())
+
+    def _AutofillValues(self):
+        """Return list of (column label, value) from the MQTT data and
+        Toptica lasers, value is None if not available"""
+        values = []
+        for header, autoinfo in self.autoinfo.items():
+            value = None
+
+            # autofill of information provided by MQTT
+            if autoinfo['type'] == 'mqtt':
+                topic = autoinfo['uri']
+                # only proceed if requested information is really available
+                if topic in self.mqtt_data.keys():
+                    value = self.mqtt_data[topic]
+
+                    # wavemeter -> take average first and convert to THz
+                    if "wavemeter" in topic:
+                        value = round(np.mean(value)/1e6, 7)
+
+            # autofill of information provided by Toptica lasers -> (param-disp 'XYZ)
+            if autoinfo['type'] == 'toptica':
+                dlc = self._Device(autoinfo['ip'], autoinfo['port'])
+                value = float(dlc.getParam(autoinfo['uri']))
+
+                # special treatment of "value-act" requests
+                # These are readouts from the ADC channels and most probably
+                # used for photodiode readings or such that are inherently
+                # quite noisy. So for these cases we will actually do an
+                # averaging over 10 readings (one reading already done above)
+                # spaced out by a 50 ms to obtain a more representative value.
+                if "value-act" in autoinfo['uri']:
+                    with metrics.Timer('toptica_averaging_seconds', "Averaging ADC readings of a Toptica laser"):
+                        for run in range(9):
+                            sleep(0.05)
+                            value += float(dlc.getParam(autoinfo['uri']))
+                        value /= 10
+
+                # heuristic rounding of values
+                if "voltage" in autoinfo['uri']:
+                    value = round(value, 3)
+                if "current" in autoinfo['uri']:
+                    value = round(value, 2)
+                if "temp" in autoinfo['uri']:
+                    value = round(value, 3)
+                if "power" in autoinfo['uri']:
+                    value = round(value, 2)
+                # conversion to mV and rounding for PD readings
+                if "value-act" in autoinfo['uri'] and "(mV)" in header:
+                    value = round(1000*value)
+
+            values.append((header, value))
+        return values
+
+    @changes_data
+    def _AutofillCells(self, values):
+        """Put the values into the empty cells of the latest entry"""
+        ops = []
+        self.lastanomalies = []
+        for header, value in values:
+            # put value into proper column (only if this cell is empty)
+            column = self.schema.Column(header)
+            cell = self.np_columns[column][0]
+            if (pd.isnull(cell) and not pd.isnull(value)) \
+               or (type(cell) == str and len(cell) == 0):
+                old = self._SetCell(0, column, value)
+                ops.append(('set', self._Position(0), column, old, self.np_columns[column][0]))
+
+                # compare with the history of the column (O(1))
+                detector = self.drift.get(column)
+                if detector is not None:
+                    value = self.np_columns[column][0]
+                    key = int(self.store.keys[self._Position(0)])
+                    deviation = detector.Deviation(value)
+                    flagged = abs(deviation) > detector.threshold
+                    if flagged:
+                        self.anomalies.add((key, column))
+                        self.lastanomalies.append((column, value, deviation))
+                    state = detector.State()
+                    detector.Add(value)
+                    # undone together with the value
+                    ops.append(('drift', column, state, detector.State(), key, flagged))
+
+        # all values of one autofill are undone together
+        self.undo.Record(ops)
+        self._StoreRows([0])
+
+        # update display
+        self._NotifyValuesChanged()
+
+        return True
+
+    ### Date lookups (via the time index, independent of the logbook size),
+    ### times may be anything understood by pd.Timestamp
+
+    def _Rows(self, keys):
+        """Convert row keys into sorted list of grid rows"""
+        if len(keys) == 0:
+            return []
+        return sorted((len(self.store) - 1 - self.store.Positions(keys)).tolist())
+
+    def FindRow(self, time):
+        """Return the grid row of the first entry started at or after the
+        given time (or of the latest entry), None for an empty logbook"""
+        key = self.timeindex.First(pd.Timestamp(time).to_datetime64())
+        if key is None:
+            return None
+        return self._Rows([key])[0]
+
+    def RowsInRange(self, start, stop):
+        """Return the grid rows of all entries started within [start, stop)"""
+        return self._Rows(self.timeindex.Range(pd.Timestamp(start).to_datetime64(),
+                                               pd.Timestamp(stop).to_datetime64()))
+
+    def RowsRunningAt(self, time):
+        """Return the grid rows of all sessions running at the given time"""
+        return self._Rows(self.timeindex.Overlapping(pd.Timestamp(time).to_datetime64()))
+
+    ### Search
+
+    def GetCommentText(self, row):
+        """Return the content of all comment columns of a row"""
+        return ' '.join(self.np_columns[col][row] for col in self.commentcols
+                        if isinstance(self.np_columns[col][row], str))
+
+    def Search(self, query):
+        """Return sorted list of the grid rows matching a query (see
+        searchindex for the syntax)
+
+        :raises ValueError: if a condition does not refer to exactly one
+                            numeric column
+        """
+        words, conditions = searchindex.ParseQuery(query)
+        if not words and not conditions:
+            return []
+
+        # value conditions are evaluated vectorized on the column store
+        mask = np.ones(len(self.store), dtype=bool)
+        for labelwords, op, value in conditions:
+            col = searchindex.MatchColumn(self.column_labels, labelwords)
+            if self.column_kinds[col] != columnschema.KIND_FLOAT:
+                raise ValueError("'{}' is not a numeric column".format(self.column_labels[col].replace('\n', ' ')))
+            values = self.store.Column(col).astype(np.float64)
+            mask &= ~np.isnan(values) & searchindex.OPERATORS[op](values, value)
+        keys = self.store.Keys()[mask]
+
+        found = self.search.Search(words)
+        if found is not None:
+            keys = np.intersect1d(keys, found, assume_unique=True)
+
+        return self._Rows(keys)
+
+    def GetColumnStats(self, col):
+        """Return the statistics of a numeric column (see columnstats)"""
+        return self.colstats.Get(col, self.store.Column(col), self.store.Column(self.startcol))
+
+    def GetHours(self):
+        """Return the total logged hours of operation including the
+        archive (maintained on every change, see also GetUsage() for more
+        statistics)"""
+        return self.usage.Hours() + self.ArchivedUsage().Hours()
+
+    def ArchivedUsage(self):
+        """Return the usagestats.UsageStats of the archived entries (only
+        the time columns are read, once, and again by Archive())"""
+        if self.archiveusage is None:
+            data = self.archive.Read(columns=['Time\nStart', 'Time\nStop'])
+            if len(data):
+                self.archiveusage = usagestats.UsageStats(data['Time\nStart'].to_numpy(), data['Time\nStop'].to_numpy())
+            else:
+                self.archiveusage = usagestats.UsageStats([], [])
+        return self.archiveusage
+
+    def GetUsage(self):
+        """Return usagestats.UsageStats of the archived and current
+        entries together"""
+        usage = usagestats.UsageStats([], [])
+        usage.Merge(self.ArchivedUsage())
+        usage.Merge(self.usage)
+        return usage
+
+    def History(self, labels, since=None, until=None):
+        """Return archived and current entries started within [since,
+        until) as DataFrame in chronological order (only the archived years
+        and columns that are needed are read)
+
+        :param labels: list of column labels
+        """
+        archived = self.archive.Read(since, until, labels)
+        version, columns = self.Snapshot(since, until, cols=[self.schema.Column(label) for label in labels])
+        current = pd.DataFrame(dict(zip(labels, columns)))
+        if len(archived) == 0:
+            return current
+        return pd.concat([archived, current], ignore_index=True)
+
+    @changes_data
+    def Archive(self, before):
+        """Move all complete entries started before the given time to the
+        archive and save the logbook (cannot be undone)
+
+        :param before: anything understood by pd.Timestamp
+        :return: number of archived entries
+        """
+        before = pd.Timestamp(before).to_datetime64()
+        mask = (self.store.Column(self.startcol) < before) & ~np.isnat(self.store.Column(self.stopcol))
+        if not mask.any():
+            return 0
+
+        # written first, so nothing is lost if saving the logbook fails
+        self.archive.Write(self.autoinfoline, self.store.ToDataFrame()[mask])
+        # read again right away, so Status() never has to while holding the lock
+        self.archiveusage = None
+        self.ArchivedUsage()
+
+        rows = len(self.store) - 1 - np.flatnonzero(mask)
+        self._DeleteMask(mask, record=False)
+        # the positions recorded in the undo log are no longer valid
+        self.undo.Clear()
+        self._NotifyRowsDeleted(int(rows.min()), len(rows))
+
+        self.Save()
+        return len(rows)
+
+
+    ### Thread-safe queries (e.g. for the HTTP API)
+
+    def Snapshot(self, since=None, until=None, last=None, cols=None):
+        """Copy entries, so another thread can use them while the logbook
+        keeps changing
+
+        :param since, until: only entries started within [since, until)
+                             (anything understood by pd.Timestamp)
+        :param last: only the given number of newest entries
+        :param cols: only these columns (default all)
+        :return: tuple of version and list of column arrays in
+                 chronological order
+        """
+        if cols is None:
+            cols = range(len(self.column_labels))
+
+        with self.lock:
+            if since is None and until is None:
+                positions = slice(None if last is None else max(len(self.store) - last, 0), None)
+            else:
+                since = pd.Timestamp.min if since is None else pd.Timestamp(since)
+                until = pd.Timestamp.max if until is None else pd.Timestamp(until)
+                positions = np.sort(self.store.Positions(self.timeindex.Range(since.to_datetime64(),
+                                                                              until.to_datetime64())))
+                if last is not None:
+                    positions = positions[max(len(positions) - last, 0):]
+            return self.version, [self.store.Column(col)[positions].copy() for col in cols]
+
+    def Status(self):
+        """Return a dictionary with version, number of entries, logged hours
+        and sessions, whether the newest entry is still running and the
+        newest entry (as chronological column arrays of length 0 or 1)
+
+        Hours and sessions include the archive, the entries do not."""
+        # the archive is read (once) without holding the lock, then only
+        # replaced by Archive() holding it
+        self.ArchivedUsage()
+        with self.lock:
+            version, latest = self.Snapshot(last=1)
+            archived = self.ArchivedUsage()
+            return {
+                'version': version,
+                'entries': len(self.store),
+                'hours': self.usage.Hours() + archived.Hours(),
+                'sessions': self.usage.Sessions() + archived.Sessions(),
+                'running': len(self.store) > 0 and self.IsEmptyCell(0, self.stopcol),
+                'latest': latest,
+            }
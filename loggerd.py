@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Start and complete logbook entries without GUI
+
+    python3 laserlogger.py start "Er 401 nm"       new entry starting now
+    python3 laserlogger.py stop "Er 401 nm"        stop time and autofill
+    python3 laserlogger.py autofill "Er 401 nm"    autofill only
+    python3 laserlogger.py archive "Er 401 nm"     move old entries to the archive
+    python3 laserlogger.py daemon                  keep logbooks and connections open
+
+A command is passed to the daemon if one is running. Otherwise the logbook
+is loaded, MQTT values are collected for a few seconds (--wait), the command
+is executed and the logbook is saved. The daemon keeps all logbooks loaded
+and stays connected to the MQTT broker and the Toptica lasers, so entries are
+completed at once and with all MQTT values received since the start (e.g.
+the averaged wavemeter readings).
+
+The daemon only accepts connections from the local computer, one JSON
+request per line, e.g. {"command": "stop", "logbook": "Er 401 nm"}, answered
+by {"ok": true, "message": "..."}."""
+
+import argparse
+import json
+import socket
+import socketserver
+import sys
+import time
+
+import archive
+import httpapi
+import logbook
+import logstorage
+import metrics
+import ntptime
+import startupprofile
+
+# commands understood by main()
+COMMANDS = ('start', 'stop', 'autofill', 'archive', 'daemon')
+# TCP port of the daemon (on localhost)
+DAEMON_PORT = 5698
+# seconds to wait for a reply of the daemon
+DAEMON_TIMEOUT = 30
+# seconds to collect MQTT values before an autofill without daemon
+MQTT_WAIT = 3.0
+
+def FindLogbook(settings, name):
+    """Return the settings entry of a logbook by its (case insensitive) name
+
+    :raises ValueError: if there is no such logbook
+    """
+    for book in settings['logbooks']:
+        if book['name'].lower() == name.lower():
+            return book
+    raise ValueError("no logbook '{}', known are: {}".format(
+        name, ", ".join("'{}'".format(book['name']) for book in settings['logbooks'])))
+
+def Execute(book, command, force=False, before=None):
+    """Execute a command on a loaded logbook and save it
+
+    :param book: logbook.Logbook
+    :param force: start a new entry even if the latest one was not stopped
+                  or stop an entry again
+    :param before: archive the entries started before this date
+    :return: message for the user
+    :raises ValueError: if the command is refused
+    """
+    if command == 'archive':
+        if before is None:
+            raise ValueError("no date given for the archive")
+        count = book.Archive(before)
+        return "Archived {} entries started before {} to {}".format(count, before, book.archive.directory)
+
+    running = len(book.store) > 0 and book.IsEmptyCell(0, book.stopcol)
+
+    if command == 'start':
+        if running and not force:
+            raise ValueError("the latest entry was not stopped yet (use --force to start another one)")
+        book.InsertRows(0, 1)
+        book.SetValue(0, book.startcol, ntptime.GetTimeStr())
+        # only fresh data shall be used for autofill
+        book.MQTTResetData()
+        message = "Started new entry at {}".format(book.GetValue(0, book.startcol))
+    else:
+        if len(book.store) == 0:
+            raise ValueError("the logbook has no entries")
+        if command == 'stop':
+            if not running and not force:
+                raise ValueError("the latest entry is already complete (use --force to autofill it again)")
+            # only input the stop time if the cell is (still) empty
+            if running:
+                book.SetValue(0, book.stopcol, ntptime.GetTimeStr())
+        book.Autofill()
+        message = "Auto completed latest entry"
+        if book.lastanomalies:
+            message += ", unusual values: " + ", ".join(
+                "{} {:g} ({:+.1f} σ)".format(book.column_labels[col].replace('\n', ' '), value, deviation)
+                for col, value, deviation in book.lastanomalies)
+
+    book.Save()
+    return message
+
+class Daemon(socketserver.TCPServer):
+    """Keeps all logbooks loaded and executes commands sent by main()
+
+    Requests are handled one after the other. If a logbook file was changed
+    by somebody else (e.g. saved by the GUI), it is loaded again before the
+    next command, keeping the MQTT values received so far."""
+
+    def __init__(self, settings, port=DAEMON_PORT):
+        self.settings = settings
+        self.broker = settings.get('mqtt', {}).get('broker')
+        # name -> [logbook.Logbook, modification time of its file]
+        self.books = {}
+        # bind first, so a second daemon fails before loading anything
+        socketserver.TCPServer.__init__(self, ('localhost', port), DaemonHandler)
+        for book in settings['logbooks']:
+            try:
+                self.Open(book)
+            except Exception as e:
+                print("Could not load '{}': {}".format(book['name'], e), file=sys.stderr)
+
+    def Open(self, book):
+        """Load a logbook (again)"""
+        old = self.books.pop(book['name'], None)
+        loaded = logbook.Logbook(book['filename'], self.broker)
+        if old is not None:
+            # keep what was collected for the next autofill
+            loaded.mqtt_data = old[0].mqtt_data
+            loaded.devices = old[0].devices
+            old[0].devices = {}
+            old[0].Close()
+        self.books[book['name']] = [loaded, logstorage.Modified(book['filename'])]
+        return loaded
+
+    def Execute(self, request):
+        """Execute a request, see the module documentation
+
+        :return: message for the user
+        """
+        if request.get('command') not in ('start', 'stop', 'autofill', 'archive'):
+            raise ValueError("unknown command {!r}".format(request.get('command')))
+        book = FindLogbook(self.settings, request.get('logbook', ''))
+
+        entry = self.books.get(book['name'])
+        if entry is None or entry[1] != logstorage.Modified(book['filename']):
+            loaded = self.Open(book)
+        else:
+            loaded = entry[0]
+
+        try:
+            message = Execute(loaded, request['command'], request.get('force', False), request.get('before'))
+        except Exception:
+            # forget unsaved changes by loading the file again next time
+            self.books[book['name']][1] = None
+            raise
+        self.books[book['name']][1] = logstorage.Modified(book['filename'])
+        return "{}: {}".format(book['name'], message)
+
+    def server_close(self):
+        socketserver.TCPServer.server_close(self)
+        for book, modified in self.books.values():
+            book.Close()
+        self.books = {}
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    """Handles one request of a client"""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+            reply = {'ok': True, 'message': self.server.Execute(request)}
+        except Exception as e:
+            reply = {'ok': False, 'message': str(e)}
+        print(reply['message'])
+        self.wfile.write((json.dumps(reply) + '\n').encode('utf-8'))
+
+def SendToDaemon(request, port=DAEMON_PORT):
+    """Pass a request to the daemon
+
+    :return: reply of the daemon or None if no daemon is running
+    """
+    try:
+        connection = socket.create_connection(('localhost', port), timeout=DAEMON_TIMEOUT)
+    except OSError:
+        return None
+
+    with connection:
+        connection.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        return json.loads(connection.makefile(encoding='utf-8').readline())
+
+def main(argv):
+    """Command line interface
+
+    :return: exit code
+    """
+    parser = argparse.ArgumentParser(prog="laserlogger.py", description=__doc__.split('\n')[0])
+    parser.add_argument('command', choices=COMMANDS)
+    parser.add_argument('logbook', nargs='?', help="name of the logbook (as in the settings)")
+    parser.add_argument('--settings', default="laserlogger_settings.json", help="LaserLogger settings file")
+    parser.add_argument('--force', action='store_true',
+                        help="start although the latest entry is running, stop although it is complete")
+    parser.add_argument('--wait', type=float, default=MQTT_WAIT,
+                        help="seconds to collect MQTT values if no daemon is running (default %(default)s)")
+    parser.add_argument('--metrics', action='store_true', help="record metrics (see metrics.py)")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="print how long loading the logbooks took")
+    parser.add_argument('--before',
+                        help="archive the entries started before this date (default: older than keep_days "
+                             "of the 'archive' section in the settings, else {} days)".format(archive.ARCHIVE_KEEP_DAYS))
+    args = parser.parse_args(argv)
+
+    with open(args.settings) as f:
+        settings = json.load(f)
+    port = settings.get('daemon', {}).get('port', DAEMON_PORT)
+    if args.metrics or settings.get('metrics', {}).get('enabled', False):
+        metrics.Enable()
+    if args.profile_startup:
+        startupprofile.Enable()
+
+    if args.command == 'daemon':
+        try:
+            daemon = Daemon(settings, port)
+        except OSError as e:
+            print("Could not listen on port {} (is a daemon running already?): {}".format(port, e), file=sys.stderr)
+            return 1
+        startupprofile.Report()
+        ntptime.Start(settings)
+        print("Serving {} logbooks on localhost:{}".format(len(daemon.books), port))
+        try:
+            server = httpapi.Start(lambda: [(name, entry[0]) for name, entry in list(daemon.books.items())], settings)
+            if server is not None:
+                print("HTTP API on {}:{}".format(*server.server_address[:2]))
+        except OSError as e:
+            print("Continuing without HTTP API: {}".format(e), file=sys.stderr)
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            daemon.server_close()
+        return 0
+
+    if args.logbook is None:
+        parser.error("the {} command needs the name of a logbook".format(args.command))
+
+    before = args.before
+    if args.command == 'archive' and before is None:
+        keep = settings.get('archive', {}).get('keep_days', archive.ARCHIVE_KEEP_DAYS)
+        before = time.strftime("%Y-%m-%d", time.localtime(time.time() - keep * 86400))
+
+    request = {'command': args.command, 'logbook': args.logbook, 'force': args.force, 'before': before}
+    reply = SendToDaemon(request, port)
+    if reply is None:
+        # no daemon -> do it ourselves
+        if args.command in ('start', 'stop'):
+            ntptime.Start(settings, background=False)
+        try:
+            entry = FindLogbook(settings, args.logbook)
+            book = logbook.Logbook(entry['filename'], settings.get('mqtt', {}).get('broker'))
+            startupprofile.Report()
+        except Exception as e:
+            reply = {'ok': False, 'message': str(e)}
+        else:
+            try:
+                if args.command in ('stop', 'autofill') and book.mqtt_prefs['mqtt_subscribe_topics']:
+                    time.sleep(args.wait)
+                reply = {'ok': True, 'message': "{}: {}".format(entry['name'],
+                                                                Execute(book, args.command, args.force, before))}
+            except Exception as e:
+                reply = {'ok': False, 'message': str(e)}
+            finally:
+                book.Close()
+
+    print(reply['message'], file=sys.stdout if reply['ok'] else sys.stderr)
+    return 0 if reply['ok'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
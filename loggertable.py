@@ -4,20 +4,59 @@
 
 import wx
 import wx.grid
-import pandas as pd
 import numpy as np
-import datetime
-import paho.mqtt.client as mqtt
-from os import replace
-from os.path import isfile
-from time import sleep
-import functools
-import toptica
-import plotframe
+import collections
+import time
+import columnschema
+import logbook
+import metrics
+import startupprofile
 
 ODD_ROW_COLOUR = '#FFFFFF'
 EVEN_ROW_COLOUR = '#CCE6FF'
 GRID_LINE_COLOUR = '#ccc'
+HIGHLIGHT_COLOUR = '#FFE680'
+ANOMALY_COLOUR = '#FF9980'
+
+# number of (newest) rows used to determine the initial column widths
+AUTOSIZE_MAX_ROWS = 200
+
+# maximum number of text extents remembered by the renderers
+TEXT_EXTENT_CACHE_SIZE = 4096
+
+class TextExtentCache(object):
+    """Size-bounded cache of text extents, keyed by font and string.
+    The least recently used entries are dropped first."""
+
+    def __init__(self, maxsize = TEXT_EXTENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.extents = collections.OrderedDict()
+
+        # statistics
+        self.hits = 0
+        self.misses = 0
+
+    def GetTextExtent(self, dc, s):
+        """Return (width, height) of string s using the current font of dc"""
+        key = (dc.Font.GetNativeFontInfoDesc(), s)
+        try:
+            extent = self.extents[key]
+            self.extents.move_to_end(key)
+            self.hits += 1
+        except KeyError:
+            # sizes not cached -> calculate and store
+            extent = dc.GetTextExtent(s)
+            self.extents[key] = extent
+            if len(self.extents) > self.maxsize:
+                self.extents.popitem(last=False)
+            self.misses += 1
+        return extent
+
+    def Clear(self):
+        """Forget all extents and reset statistics"""
+        self.extents.clear()
+        self.hits = 0
+        self.misses = 0
 
 class FloatRenderer(wx.grid.GridCellRenderer):
     """FloatRenderer renders a float value into grid table entry.
@@ -26,6 +65,9 @@ class FloatRenderer(wx.grid.GridCellRenderer):
 
     Taken from the "Cam" software."""
 
+    # text dimensions of rendered strings, shared by all renderers
+    extents = TextExtentCache()
+
     def __init__(self, width = -1, precision = -1):
         """
         @param width: total number of digits
@@ -36,9 +78,6 @@ class FloatRenderer(wx.grid.GridCellRenderer):
         self.width = width
         self.precision = precision
 
-        # maintain a list of text dimensions for all rendered strings so far
-        self.extents = {}
-
     def SetParameters(self, format):
         "@param format: format string, e.g., '4,1' for width = 4, precision = 1"
         self.width, self.precision = map(int, format.split(','))
@@ -67,6 +106,9 @@ class FloatRenderer(wx.grid.GridCellRenderer):
         """
         Implements rendering into grid entry.
         """
+        if metrics.enabled:
+            t0 = time.perf_counter()
+
         #paint background
         if isSelected:
             dc.Brush = wx.Brush(grid.SelectionBackground)
@@ -76,23 +118,15 @@ class FloatRenderer(wx.grid.GridCellRenderer):
         dc.Pen = wx.TRANSPARENT_PEN
         dc.DrawRectangle(rect)
 
-        #create string, applying format to value
-        value = grid.Table.GetValue(row, col)
-        empty = grid.Table.IsEmptyCell(row, col)
-        if not empty:
-            s = (self.format%float(value)).lstrip()
-        else:
-            s = '-'
+        #formatted string is cached by the table
+        s = grid.Table.GetDisplayString(row, col)
 
         #draw text
         dc.BackgroundMode = wx.TRANSPARENT
         dc.Font = attr.Font
         dc.TextForeground = attr.TextColour
 
-        if not s in self.extents:
-            # sizes not cached -> calculate and store
-            self.extents[s] = dc.GetTextExtent(s)
-        tw, th = self.extents[s]
+        tw, th = self.extents.GetTextExtent(dc, s)
 
         if (attr.GetAlignment()[0] == wx.ALIGN_LEFT):
             xpos = rect.x + 2 + 5
@@ -104,66 +138,41 @@ class FloatRenderer(wx.grid.GridCellRenderer):
         dc.DrawText(s, xpos, rect.y + 2)
         dc.DestroyClippingRegion()
 
+        if metrics.enabled:
+            metrics.Histogram('grid_cell_draw_seconds', "Drawing a numeric grid cell").Observe(time.perf_counter() - t0)
+
     def GetBestSize(self, grid, attr, dc, row, col):
         """Calculate size of entry"""
 
-        #create string, applying format to value
-        value = grid.Table.GetValue(row, col)
-        empty = grid.Table.IsEmptyCell(row, col)
-        if not empty:
-            s = (self.format%float(value)).lstrip()
-        else:
-            s = '-'
+        #formatted string is cached by the table
+        s = grid.Table.GetDisplayString(row, col)
         dc.Font = attr.Font
 
-        if not s in self.extents:
-            # sizes not cached -> calculate and store
-            self.extents[s] = dc.GetTextExtent(s)
-        tw, th = self.extents[s]
+        tw, th = self.extents.GetTextExtent(dc, s)
 
         return wx.Size(tw+2+10, th+2)
 
     def Clone(self):
         return FloatRenderer(self.width, self.precision)
 
-def changes_data(f):
-    """Decorator for methods that change data.
-    Needed to see wheter file has been modified after last save. Changes
-    attribute 'modified'.
-
-    Taken from the "Cam" software."""
-    @functools.wraps(f)
-    def wrapper(self, *args, **kwargs):
-        if not self.modified and self.parent:
-            nb = self.parent.GetParent().GetParent().notebook
-            page = nb.GetSelection()
-            title = nb.GetPageText(page)
-            nb.SetPageText(page, title + ' (*)')
-        self.modified = True
-        return f(self, *args, **kwargs)
-    return wrapper
-
-class LoggerTable(wx.grid.GridTableBase):
-    """Custom grid table that uses a Pandas dataframe as backend storage
-    to hold and format the logged data.
+class LoggerTable(logbook.Logbook, wx.grid.GridTableBase):
+    """Custom grid table that uses a column store of numpy arrays as backend
+    storage to hold and format the logged data. All data handling is done by
+    logbook.Logbook, this class adds the display in a wx.Grid.
 
     See also https://stackoverflow.com/questions/64743632/how-to-display-pandas-dataframe-within-a-wxpython-tab"""
     def __init__(self, parent, filename, mqtt_broker = None):
         """Initialize table object (load CSV file, prepare wx.Grid, connect to MQTT)"""
         wx.grid.GridTableBase.__init__(self)
 
+        # keep a reference to the calling wx.Grid
+        self.parent = parent
+
         #TODO: Raise an error if file does not exist or is not readable
 
-        # import CSV data
-        self.filename = filename
+        # import logbook data (CSV file or SQLite table)
         try:
-            # read special information on automatic data import
-            self.autoinfoline = pd.read_csv(filename, nrows=1)
-            # import main part of log file
-            self.data = pd.read_csv(filename,
-                                    parse_dates=['Time\nStart', 'Time\nStop'],
-                                    skiprows=[1],
-                                    dtype={'Comment': 'object'})
+            logbook.Logbook.__init__(self, filename, mqtt_broker)
         except Exception as e:
             dlg = wx.MessageDialog(parent,
                                     "Could not open or read '{}' for import:\n{}\n\n"
@@ -173,467 +182,171 @@ class LoggerTable(wx.grid.GridTableBase):
                                     wx.OK|wx.ICON_ERROR)
             dlg.ShowModal()
             dlg.Destroy()
-            self.data = None
+            self.store = None
             return
-        # put newest entries top
-        self.data = self.data.iloc[::-1]
-        self.data.reset_index(drop=True)
-
-        # at least try to convert isotope column into integers
-        # conversion will fail if there are empty columns, in that case float64 will be kept
-        # (this way in the saved CSV file we won't have fractional numbers)
-        if 'Lock\nIsotope' in self.data:
-            self.data['Lock\nIsotope'] = self.data['Lock\nIsotope'].astype('int', errors='ignore')
-
-        # enforce proper data type for date/time columns (especially needed
-        # when table is still empty, as in this case the type is just 'object')
-        if 'Time\nStart' in self.data:
-            self.data = self.data.astype({'Time\nStart': 'datetime64[ns]'})
-        if 'Time\nStop' in self.data:
-            self.data = self.data.astype({'Time\nStop': 'datetime64[ns]'})
-
-        # keep a reference to the calling wx.Grid
-        self.parent = parent
 
         # create a list of all column groups (e.g. Time, LD, TA, SHG)
-        self.colgroups = [label.split('\n')[0] for label in self.data.columns.to_list()]
+        self.colgroups = [label.split('\n')[0] for label in self.column_labels]
         self.colgroups = list(dict.fromkeys(self.colgroups))
 
-        # maintain a convenient list of the column labels
-        self.column_labels = self.data.columns.to_list()
-
-        # convert pandas datafrom columns to individual numpy arrays.
-        # this is to speed to the table as df.iloc() is very slow.
-        self._UpdateNumpyArray()
+        # keys of rows highlighted as search results
+        self.highlight = set()
 
         # prepare necessary renderers and editors for grid display
-        self.renderers = {}
-        self.editors = {}
-        for label in self.column_labels:
-            if "Time" in label:
+        self.renderers = []
+        self.editors = []
+        self.typenames = []
+        for col, kind in enumerate(self.column_kinds):
+            if kind == columnschema.KIND_TIME:
                 renderer = wx.grid.GridCellDateTimeRenderer(outformat="%Y/%m/%d %H:%M", informat="%Y/%m/%d %H:%M")
                 editor = wx.grid.GridCellTextEditor()
-            elif "Comment" in label:
+                typename = wx.grid.GRID_VALUE_STRING
+            elif kind == columnschema.KIND_COMMENT:
                 renderer = wx.grid.GridCellStringRenderer()
                 editor = wx.grid.GridCellTextEditor()
-            elif "(THz)" in label:
-                renderer = FloatRenderer(precision=7)
-                editor = wx.grid.GridCellFloatEditor(precision=7)
-            elif "(MHz)" in label:
-                renderer = FloatRenderer(precision=3)
-                editor = wx.grid.GridCellFloatEditor(precision=3)
-            elif "Temp" in label:
-                renderer = FloatRenderer(precision=3)
-                editor = wx.grid.GridCellFloatEditor(precision=3)
-            elif "(kΩ)" in label:
-                renderer = FloatRenderer(precision=3)
-                editor = wx.grid.GridCellFloatEditor(precision=3)
-            elif "(mA)" in label:
-                renderer = FloatRenderer(precision=2)
-                editor = wx.grid.GridCellFloatEditor(precision=2)
-            elif "(A)" in label:
-                renderer = FloatRenderer(precision=2)
-                editor = wx.grid.GridCellFloatEditor(precision=2)
-            elif "(mV)" in label:
-                renderer = FloatRenderer(precision=0)
-                editor = wx.grid.GridCellFloatEditor(precision=1)
-            elif "(V)" in label:
-                renderer = FloatRenderer(precision=3)
-                editor = wx.grid.GridCellFloatEditor(precision=3)
-            elif "(mW)" in label:
-                renderer = FloatRenderer(precision=1)
-                editor = wx.grid.GridCellFloatEditor(precision=1)
-            elif "(nm)" in label:
-                renderer = FloatRenderer(precision=3)
-                editor = wx.grid.GridCellFloatEditor(precision=3)
-            elif "Isotope" in label:
-                renderer = FloatRenderer(precision=0)
-                editor = wx.grid.GridCellFloatEditor(precision=0)
+                typename = wx.grid.GRID_VALUE_STRING
             else:
-                renderer = FloatRenderer(precision=1)
-                editor = wx.grid.GridCellFloatEditor(precision=3)
-
-            self.renderers[label] = renderer
-            self.editors[label] = editor
-
-        # table is not (yet) modified
-        self.modified = False
-
-        # parse autofill information
-        self.autoinfo = {}
-        for header, autoinfo in self.autoinfoline.iloc[0].to_dict().items():
-            try:
-                parts = autoinfo.split('://')
-                if len(parts) == 2:
-                    typeinfo = parts[0]
-                    if typeinfo == "toptica":
-                        # Toptica laser -> separate ip:port/uri format
-                        ip, rest = parts[1].split(":", 1)
-                        port, uri = rest.split("/", 1)
-                        self.autoinfo[header] = {
-                                    "type": typeinfo,
-                                    "ip": ip,
-                                    "port": int(port),
-                                    "uri": uri
-                                }
-                    else:
-                        self.autoinfo[header] = {
-                                    "type": typeinfo,
-                                    "uri": parts[1]
-                                }
-                else:
-                    # invalid information
-                    print("Error: Cannot parse {} of {}".format(self.autoinfo, header))
-            except:
-                pass
-
-        # set up MQTT
-        self.mqtt_prefs = {
-            "mqtt_broker_ip": mqtt_broker,
-            "mqtt_subscribe_topics": []
-            }
-        self.mqtt_prefs['mqtt_subscribe_topics'] = [value['uri'] for value in self.autoinfo.values() if value['type']=='mqtt']
-        self.mqtt_connected = False
-        self.mqtt_client = mqtt.Client()
-        self.mqtt_client.on_connect = self.OnMQTTConnected
-        self.mqtt_client.on_disconnect = self.OnMQTTDisconnected
-        self.MQTTconnect()
-
-        # set up some storage space for MQTT messages
-        self.mqtt_data = {}
-
-    ### MQTT
-
-    def OnMQTTConnected(self, client, userdata, flags, rc):
-        """Callback function when connected to broker"""
-
-        for topic in self.mqtt_prefs['mqtt_subscribe_topics']:
-            self.mqtt_client.subscribe(topic)
-
-        self.mqtt_client.on_message=self.OnMQTTMessage
-
-        self.mqtt_connected = True
-
-    def OnMQTTDisconnected(self, client, userdata, rc):
-        """Callback function when disconnected from broker"""
-        self.mqtt_connected = False
-
-    def MQTTconnect(self):
-        """Helper function to connect to MQTT broker"""
-        if not self.mqtt_prefs["mqtt_broker_ip"]:
-            return
-
-        if self.mqtt_prefs['mqtt_broker_ip']:
-            try:
-                self.mqtt_client.connect(self.mqtt_prefs['mqtt_broker_ip'], keepalive=10)
-                self.mqtt_client.loop_start()
-            except Exception as e:
-                dlg = wx.MessageDialog(self.parent,
-                                        "Could not connect to MQTT broker:\n{}\n\n"
-                                        "Please check broker IP in the preferences.\n"
-                                        "Continuing without MQTT support.".format(e), "MQTT error",
-                                        wx.OK|wx.ICON_ERROR)
-                dlg.ShowModal()
-                dlg.Destroy()
-
-    def OnMQTTMessage(self, client, userdata, message):
-        """Callback function for MQTT to handle incoming messages"""
-
-        if "wavemeter" in message.topic:
-            if not message.topic in self.mqtt_data.keys():
-                self.mqtt_data[message.topic] = np.empty([0, 1])
-
-            try:
-                value = float(message.payload)
-                self.mqtt_data[message.topic] = np.append(self.mqtt_data[message.topic], value)
-                if len(self.mqtt_data[message.topic]) > 30:
-                    self.mqtt_data[message.topic] = self.mqtt_data[message.topic][1:]
-            except:
-                pass
-        else:
-            try:
-                self.mqtt_data[message.topic] = float(message.payload)
-            except:
-                pass
-
-        return
-
-    def MQTTResetData(self):
-        """Reset (that is forget) all values received via MQTT"""
-        self.mqtt_data = {}
+                renderer = FloatRenderer(precision=self.schema.precisions[col])
+                editor = wx.grid.GridCellFloatEditor(precision=self.schema.editprecisions[col])
+                typename = wx.grid.GRID_VALUE_FLOAT
 
-    ### Grid management
+            self.renderers.append(renderer)
+            self.editors.append(editor)
+            self.typenames.append(typename)
 
-    def _UpdateNumpyArray(self):
-        """Helper function to rebuild our numpy representation of the data"""
+        # cell attributes are the same for all even/odd rows of a column
+        self._UpdateAttrCache()
 
-        self.np_columns = []
-        for label in self.column_labels:
-            self.np_columns.append(self.data[label].to_numpy())
+    ### Notifications from the logbook
 
-    def GetNumberRows(self):
-        return len(self.data)
+    def _ReportError(self, title, message):
+        dlg = wx.MessageDialog(self.parent, message, title, wx.OK|wx.ICON_ERROR)
+        dlg.ShowModal()
+        dlg.Destroy()
 
-    def GetNumberCols(self):
-        return len(self.column_labels)
-
-    def IsEmptyCell(self, row, col):
-        try:
-            #val = self.data.iloc[row, col]
-            val = self.np_columns[col][row]
-            if pd.isnull(val) or val=='':
-                return True
-            else:
-                return False
-
-        except IndexError:
-            return True
-
-    def GetValue(self, row, col):
-        #value = self.data.iloc[row, col]
-        value = self.np_columns[col][row]
-        if pd.isnull(value) or value=='':
-            return None
+    def _NotifyModified(self):
+        """Mark the notebook page as modified"""
+        if self.parent:
+            nb = self.parent.GetParent().GetParent().notebook
+            page = nb.GetSelection()
+            title = nb.GetPageText(page)
+            nb.SetPageText(page, title + ' (*)')
 
-        if "Time" in self.GetColLabelValue(col):
-            #return value.strftime("%Y/%m/%d %H:%M")
-            return value.astype('datetime64[s]').astype(datetime.datetime).strftime("%Y/%m/%d %H:%M")
+    def _NotifySaved(self):
+        """Remove the modified mark from the notebook page"""
+        if self.parent:
+            nb = self.parent.GetParent().GetParent().notebook
+            page = nb.GetSelection()
+            title = nb.GetPageText(page)
+            if title.endswith(" (*)"):
+                # Sometimes the notebook name is unchanged even though the
+                # modified flag is set. This should not be happening...
+                nb.SetPageText(page, title[0:-4])
 
-        return value
+    def _NotifyRowsInserted(self, pos, numRows):
+        msg = wx.grid.GridTableMessage(self,
+                                       wx.grid.GRIDTABLE_NOTIFY_ROWS_INSERTED,
+                                       pos,
+                                       numRows)
+        self.GetView().ProcessTableMessage(msg)
 
-    @changes_data
-    def SetValue(self, row, col, value):
-        label = self.GetColLabelValue(col)
-        if "Time" in label:
-            try:
-                value = pd.to_datetime(value)
-            except:
-                value = None
-        elif not "Comment" in label:
-            try:
-                value = np.float64(value)
-            except:
-                value = None
+    def _NotifyRowsAppended(self, numRows):
+        msg = wx.grid.GridTableMessage(self,
+                                       wx.grid.GRIDTABLE_NOTIFY_ROWS_APPENDED,
+                                       numRows)
+        self.GetView().ProcessTableMessage(msg)
 
-        # update Pandas dataframe
-        # (not necessary as the numpy array is still pointing to the original
-        # dataframe and updating the numpy array below will also update the
-        # original Pandas dataframe data))
-        #self.data.iloc[row, col] = value
+    def _NotifyRowsDeleted(self, pos, numRows):
+        msg = wx.grid.GridTableMessage(self,
+                                       wx.grid.GRIDTABLE_NOTIFY_ROWS_DELETED,
+                                       pos, numRows)
+        self.GetView().ProcessTableMessage(msg)
 
-        # update numpy array (also updates Pandas data)
-        self.np_columns[col][row] = value
+    def _NotifyValuesChanged(self):
+        msg = wx.grid.GridTableMessage(self, wx.grid.GRIDTABLE_REQUEST_VIEW_GET_VALUES)
+        self.GetView().ProcessTableMessage(msg)
 
-    def GetColLabelValue(self, col):
-        return self.column_labels[col]
+    ### Display
 
     def GetTypeName(self, row, col):
-        label = self.GetColLabelValue(col)
-
-        typename = wx.grid.GRID_VALUE_FLOAT
-        if "Time" in label:
-            typename = wx.grid.GRID_VALUE_STRING
-        elif "Comment" in label:
-            typename = wx.grid.GRID_VALUE_STRING
-
-        return typename
-
-    def GetAttr(self, row, col, prop):
-        attr = wx.grid.GridCellAttr()
+        return self.typenames[col]
+
+    def _UpdateAttrCache(self):
+        """Prepare the cell attributes for even and odd rows of each column
+        (and for highlighted rows and flagged cells). Needs to be called again
+        whenever the columns change."""
+
+        self.attrs = ([], [], [], [])
+        for parity in range(4):
+            for col, label in enumerate(self.column_labels):
+                attr = wx.grid.GridCellAttr()
+
+                if parity == 3:
+                    color = wx.Colour(ANOMALY_COLOUR)
+                elif parity == 2:
+                    color = wx.Colour(HIGHLIGHT_COLOUR)
+                elif parity == 1:
+                    color = wx.Colour(EVEN_ROW_COLOUR)
+                else:
+                    color = wx.Colour(ODD_ROW_COLOUR)
 
-        if row % 2 == 1:
-            color = wx.Colour(EVEN_ROW_COLOUR)
-        else:
-            color = wx.Colour(ODD_ROW_COLOUR)
+                grouplabel = label.split('\n')[0]
+                if self.colgroups.index(grouplabel) % 2 == 1:
+                    color = color.ChangeLightness(90)
 
-        label = self.GetColLabelValue(col)
-        grouplabel = label.split('\n')[0]
-        if self.colgroups.index(grouplabel) % 2 == 1:
-            color = color.ChangeLightness(90)
+                attr.SetBackgroundColour(color)
 
-        attr.SetBackgroundColour(color)
+                # everything but comments shall be centered
+                if self.column_kinds[col] == columnschema.KIND_COMMENT:
+                    align = wx.ALIGN_LEFT
+                else:
+                    align = wx.ALIGN_CENTRE
+                attr.SetAlignment(hAlign=align, vAlign=-1)
 
-        # everything but comments shall be centered
-        if "Comment" in label:
-            align = wx.ALIGN_LEFT
-        else:
-            align = wx.ALIGN_CENTRE
-        attr.SetAlignment(hAlign=align, vAlign=-1)
+                # set the appropriate renderer
+                self.renderers[col].IncRef()
+                attr.SetRenderer(self.renderers[col])
+                # set the appropriate editor
+                self.editors[col].IncRef()
+                attr.SetEditor(self.editors[col])
 
-        # set the appropriate renderer
-        self.renderers[label].IncRef()
-        attr.SetRenderer(self.renderers[label])
-        # set the appropriate editor
-        self.editors[label].IncRef()
-        attr.SetEditor(self.editors[label])
+                self.attrs[parity].append(attr)
 
+    def GetAttr(self, row, col, prop):
+        # the grid releases the attribute after use, so keep our reference
+        attr = self.attrs[row % 2][col]
+        if self.highlight or self.anomalies:
+            key = int(self.store.keys[self._Position(row)])
+            if (key, col) in self.anomalies:
+                attr = self.attrs[3][col]
+            elif key in self.highlight:
+                attr = self.attrs[2][col]
+        attr.IncRef()
         return attr
 
+    # Columns are defined by the logbook file and cannot be changed. Should
+    # this ever be implemented, _UpdateAttrCache() has to be called.
+
     def DeleteCols(self, pos=0, numcols=1):
         pass
 
     def AppendCols(self, numcols=1, updateLabels=True):
         pass
 
-    @changes_data
-    def DeleteRows(self, pos=0, numRows=1):
-        """Delete some rows somewhere in the table"""
-
-        indexes = self.data.index[range(pos,pos+numRows)]
-        self.data.drop(index=indexes, inplace=True)
-        # rebuild index (remembering that the internal order is acutally reversed)
-        self.data = self.data.iloc[::-1]
-        self.data.reset_index(inplace=True, drop=True)
-        self.data = self.data.iloc[::-1]
-        # rebuild numpy representation of data
-        self._UpdateNumpyArray()
-
-        msg = wx.grid.GridTableMessage(self,
-                                       wx.grid.GRIDTABLE_NOTIFY_ROWS_DELETED,
-                                       pos, numRows)
-        self.GetView().ProcessTableMessage(msg)
-
-        return True
-
-    @changes_data
-    def AppendRows(self, numRows=1):
-        """Append empty rows to the end of the table"""
-        curRows = self.GetNumberCols()
-        self.data = self.data.reindex(self.data.index.tolist() + list(range(curRows,curRows+numRows)))
-        self.data = self.data.iloc[::-1]
-        # rebuild numpy representation of data
-        self._UpdateNumpyArray()
-
-        msg = wx.grid.GridTableMessage(self,
-                                       wx.grid.GRIDTABLE_NOTIFY_ROWS_APPENDED,
-                                       numRows)
-        self.GetView().ProcessTableMessage(msg)
-
-        return True
-
-    @changes_data
-    def InsertRows(self, pos=0, numRows=1):
-        """Insert empty rows somewhere in table"""
-        # list of current indexex
-        indexlist = self.data.index.tolist()
-        # number of rows currently in the dataframe
-        curRows = self.GetNumberRows()
-        # insert new rows where indicated
-        newlist = indexlist[:pos]+list(range(curRows,curRows+numRows))+indexlist[pos:]
-        # rebuild dataframe
-        self.data = self.data.reindex(newlist)
-        # rebuild numpy representation of data
-        self._UpdateNumpyArray()
-
-        msg = wx.grid.GridTableMessage(self,
-                                       wx.grid.GRIDTABLE_NOTIFY_ROWS_INSERTED,
-                                       pos,
-                                       numRows)
-        self.GetView().ProcessTableMessage(msg)
-
-        return True
-
-    ### Internal functions
-
-    def Save(self):
-        """Save logbook data to CSV file"""
-        if self.filename is None:
-            return False
-
-        # maintain a list of 9 backup copies
-        for idx in range(8, 0, -1):
-            if isfile("{}.{}".format(self.filename, idx)):
-                replace("{}.{}".format(self.filename, idx),
-                        "{}.{}".format(self.filename, (idx+1)))
-        replace(self.filename, "{}.{}".format(self.filename, 1))
-
-        self.autoinfoline.to_csv(self.filename, index=False)
-        self.data.iloc[::-1].to_csv(self.filename, index=False, mode='a', header=False)
-
-        if (self.modified):
-            nb = self.parent.GetParent().GetParent().notebook
-            page = nb.GetSelection()
-            title = nb.GetPageText(page)
-            if title.endswith(" (*)"):
-                # Sometimes the notebook name is unchanged even though the
-                # modified flag is set. This should not be happening...
-                nb.SetPageText(page, title[0:-4])
-
-        self.modified = False
-
-        return True
-
-    def Autofill(self):
-        """Automatically fill in missing entries where possible"""
-        dlc = None
-        for header, autoinfo in self.autoinfo.items():
-            value = None
-
-            # autofill of information provided by MQTT
-            if autoinfo['type'] == 'mqtt':
-                topic = autoinfo['uri']
-                # only proceed if requested information is really available
-                if topic in self.mqtt_data.keys():
-                    value = self.mqtt_data[topic]
-
-                    # wavemeter -> take average first and convert to THz
-                    if "wavemeter" in topic:
-                        value = round(np.mean(value)/1e6, 7)
-
-            # autofill of information provided by Toptica lasers -> (param-disp 'XYZ)
-            if autoinfo['type'] == 'toptica':
-                if dlc == None or dlc.ip != autoinfo['ip'] or dlc.port != autoinfo['port']:
-                    # only create new DLCpro object if old one is not suited
-                    dlc = toptica.DLCpro(ip=autoinfo['ip'], port=autoinfo['port'])
-                value = float(dlc.getParam(autoinfo['uri']))
-
-                # special treatment of "value-act" requests
-                # These are readouts from the ADC channels and most probably
-                # used for photodiode readings or such that are inherently
-                # quite noisy. So for these cases we will actually do an
-                # averaging over 10 readings (one reading already done above)
-                # spaced out by a 50 ms to obtain a more representative value.
-                if "value-act" in autoinfo['uri']:
-                    for run in range(9):
-                        sleep(0.05)
-                        value += float(dlc.getParam(autoinfo['uri']))
-                    value /= 10
-
-                # heuristic rounding of values
-                if "voltage" in autoinfo['uri']:
-                    value = round(value, 3)
-                if "current" in autoinfo['uri']:
-                    value = round(value, 2)
-                if "temp" in autoinfo['uri']:
-                    value = round(value, 3)
-                if "power" in autoinfo['uri']:
-                    value = round(value, 2)
-                # conversion to mV and rounding for PD readings
-                if "value-act" in autoinfo['uri'] and "(mV)" in header:
-                    value = round(1000*value)
-
-            # put value into proper column (only if this cell is empty)
-            column = self.data.columns.get_loc(header)
-            cell = self.data.iloc[0, column]
-            if (pd.isnull(cell) and not pd.isnull(value)) \
-               or (type(cell) == str and len(cell) == 0):
-                self.data.iloc[0, column] = value
-
-        # update display
-        msg = wx.grid.GridTableMessage(self, wx.grid.GRIDTABLE_REQUEST_VIEW_GET_VALUES)
-        self.GetView().ProcessTableMessage(msg)
-
-        return True
-
-    def GetHours(self):
-        """Calculate and return the total logged hours of operation"""
-        td = self.data['Time\nStop'].astype('datetime64') - self.data['Time\nStart'].astype('datetime64')
-        return td.sum().total_seconds() / 3600
+    def SetHighlight(self, rows):
+        """Highlight the given grid rows (e.g. search results), the
+        highlight follows the entries when rows are inserted or deleted"""
+        if len(rows) == 0:
+            self.highlight = set()
+        else:
+            self.highlight = set(self.store.keys[self._Position(np.asarray(rows))].tolist())
 
 class LoggerGrid(wx.grid.Grid):
     """Custom WX grid to display the logged data"""
 
     ID_popup_menu = wx.NewIdRef(count=1)
+    ID_popup_menu_selection = wx.NewIdRef(count=1)
+    ID_popup_menu_liveplot = wx.NewIdRef(count=1)
 
     def __init__(self, parent, filename, mqtt_broker = None):
         """Initialize grid by loading data and setting up row/column sizes"""
@@ -642,29 +355,108 @@ class LoggerGrid(wx.grid.Grid):
         # associate Pandas dataframe to the data of this table
         table = LoggerTable(parent, filename, mqtt_broker)
         self.SetTable(table, takeOwnership=True)
-        if table.data is None:
+        if table.store is None:
             return
 
+        with startupprofile.Phase("{}: grid setup".format(filename)):
+            self._SetupColumns()
+
+        self.Bind(wx.grid.EVT_GRID_LABEL_RIGHT_CLICK, self.OnLabelRightClick, self)
+        self.GetGridColLabelWindow().Bind(wx.EVT_MOTION, self.OnMouseOverColLabel)
+
+    def _SetupColumns(self):
+        """Set the initial row label and column sizes"""
         lastcol = self.GetNumberCols()-1
-        self.AutoSizeColumns()
+        self.AutoSizeColumnsFast()
         self.SetColLabelSize(int(1.8*self.GetColLabelSize()))
         self.SetRowLabelSize(int(0.7*self.GetRowLabelSize()))
         self.SetColSize(0, int(1.1*self.GetColSize(0)))
         self.SetColSize(1, int(1.1*self.GetColSize(1)))
         self.SetColSize(lastcol, int(1.1*self.GetColSize(lastcol)))
 
-        self.Bind(wx.grid.EVT_GRID_LABEL_RIGHT_CLICK, self.OnLabelRightClick, self)
-        self.GetGridColLabelWindow().Bind(wx.EVT_MOTION, self.OnMouseOverColLabel)
+    def AutoSizeColumnsFast(self, maxrows=AUTOSIZE_MAX_ROWS):
+        """Like AutoSizeColumns() but only looks at the labels and the
+        newest rows instead of measuring every cell of the logbook"""
+        table = self.GetTable()
+        dc = wx.ClientDC(self)
+        for col in range(self.GetNumberCols()):
+            dc.SetFont(self.GetLabelFont())
+            width = dc.GetMultiLineTextExtent(self.GetColLabelValue(col))[0] + 10
+
+            dc.SetFont(self.GetDefaultCellFont())
+            for row in range(min(self.GetNumberRows(), maxrows)):
+                if table.column_kinds[col] == columnschema.KIND_COMMENT:
+                    s = table.GetValue(row, col) or ""
+                else:
+                    s = table.GetDisplayString(row, col)
+                # (same margin as FloatRenderer.GetBestSize)
+                width = max(width, dc.GetTextExtent(s)[0] + 12)
+
+            self.SetColSize(col, width)
+
+    def Save(self, overwrite=False):
+        """Save the content of the table (see logbook.Logbook.Save)"""
+        return self.GetTable().Save(overwrite)
 
-    def Save(self):
-        """Save the content of the table"""
-        return self.GetTable().Save()
+    def GetSelectedRowList(self):
+        """Return sorted list of all completely selected rows, including
+        rows within selected blocks"""
+        rows = set(self.GetSelectedRows())
+
+        lastcol = self.GetNumberCols()-1
+        for topleft, bottomright in zip(self.GetSelectionBlockTopLeft(), self.GetSelectionBlockBottomRight()):
+            if topleft.Col == 0 and bottomright.Col == lastcol:
+                rows.update(range(topleft.Row, bottomright.Row+1))
+
+        return sorted(rows)
+
+    def DeleteRowList(self, rows):
+        """Delete the given rows in one go"""
+        result = self.GetTable().DeleteRowList(rows)
+        self.ClearSelection()
+        return result
+
+    def SelectRowList(self, rows):
+        """Select the given rows (sorted), consecutive rows are selected as
+        one block to keep the selection small"""
+        self.ClearSelection()
+        if len(rows) == 0:
+            return
+
+        rows = np.asarray(rows)
+        breaks = np.flatnonzero(np.diff(rows) != 1)
+        firsts = np.concatenate([[0], breaks + 1])
+        lasts = np.concatenate([breaks, [len(rows) - 1]])
+        lastcol = self.GetNumberCols()-1
+        for first, last in zip(firsts, lasts):
+            self.SelectBlock(int(rows[first]), 0, int(rows[last]), lastcol, True)
+
+        self.MakeCellVisible(int(rows[0]), 0)
+
+    def JumpToDate(self, time):
+        """Move the cursor to the first entry started at or after time"""
+        row = self.GetTable().FindRow(time)
+        if row is not None:
+            self.GoToCell(row, 0)
+        return row
+
+    def SelectDateRange(self, start, stop):
+        """Select all entries started within [start, stop)"""
+        rows = self.GetTable().RowsInRange(start, stop)
+        self.SelectRowList(rows)
+        return len(rows)
+
+    def SelectSessionsAt(self, time):
+        """Select all sessions running at the given time"""
+        rows = self.GetTable().RowsRunningAt(time)
+        self.SelectRowList(rows)
+        return len(rows)
 
     def Plot(self):
         """Open a new window with a plot of the selected columns (and rows)"""
         # obtain selections and create a new dataframe containing only the data to be plotted
         cols = self.GetSelectedCols()
-        rows = self.GetSelectedRows()
+        rows = self.GetSelectedRowList()
 
         # ignore selected start/stop time columns
         cols = [col for col in cols if col > 1]
@@ -680,14 +472,25 @@ class LoggerGrid(wx.grid.Grid):
         # always include the second column, the stop times, which will be our index
         cols.insert(0, 1)
 
-        df = self.GetTable().data
-        colnames = df.columns[cols]
-        dfselection = df[colnames]
+        table = self.GetTable()
+        colnames = [table.column_labels[col] for col in cols]
 
         # If some rows are selected only include those, otherwise
-        # all the data will be included in the plot.
+        # all the data will be included in the plot (also the archived
+        # entries).
         if len(rows):
-            dfselection = dfselection.iloc[rows]
+            dfselection = table.data[colnames].iloc[rows]
+        else:
+            try:
+                dfselection = table.History(colnames)
+            except Exception as e:
+                dlg = wx.MessageDialog(self,
+                        "Could not read the archive:\n{}\n\n"
+                        "Plotting only the entries of the logbook.".format(e),
+                        "Archive error", wx.OK|wx.ICON_ERROR)
+                dlg.ShowModal()
+                dlg.Destroy()
+                dfselection = table.data[colnames].iloc[::-1]
 
         # use column with stop times as index
         # (this will also create a copy of the dataframe)
@@ -703,6 +506,10 @@ class LoggerGrid(wx.grid.Grid):
         page = nb.GetSelection()
         title = nb.GetPageText(page)
 
+        plotframe = self._ImportPlotFrame()
+        if plotframe is None:
+            return
+
         # create and show plot frame
         try:
             plotframe.PlotFrame(df=dfselection, title=title+" plot", parent=wx.GetTopLevelParent(self))
@@ -713,6 +520,32 @@ class LoggerGrid(wx.grid.Grid):
             dlg.ShowModal()
             dlg.Destroy()
 
+    def _ImportPlotFrame(self):
+        """Import the plot windows (and matplotlib) on first use
+
+        :return: module plotframe or None if matplotlib is not available
+        """
+        try:
+            import plotframe
+        except ImportError as e:
+            dlg = wx.MessageDialog(self,
+                    "Plotting needs matplotlib:\n{}".format(e),
+                    "Unable to plot", wx.OK|wx.ICON_ERROR)
+            dlg.ShowModal()
+            dlg.Destroy()
+            return None
+        return plotframe
+
+    def LivePlot(self, cols):
+        """Open a new window with a live plot of columns with automatic source"""
+        nb = self.GetParent()
+        title = nb.GetPageText(nb.GetSelection())
+        labels = [self.GetColLabelValue(col) for col in cols]
+        plotframe = self._ImportPlotFrame()
+        if plotframe is None:
+            return
+        plotframe.LivePlotFrame(self.GetTable().live, labels, title=title+" live", parent=wx.GetTopLevelParent(self))
+
     def OnLabelRightClick(self, evt):
         """Right click on row or column header. Create popup menu."""
 
@@ -726,11 +559,35 @@ class LoggerGrid(wx.grid.Grid):
             menu.Append(self.ID_popup_menu, 'Delete row {}'.format(evt.Row+1))
             self.Bind(wx.EVT_MENU, self.OnRowMenuClicked, id = self.ID_popup_menu)
 
+            # offer to delete the whole selection if the row is part of it
+            self.actRows = self.GetSelectedRowList()
+            if len(self.actRows) > 1 and evt.Row in self.actRows:
+                menu.Append(self.ID_popup_menu_selection, 'Delete {} selected rows'.format(len(self.actRows)))
+                self.Bind(wx.EVT_MENU, self.OnRowMenuClicked, id = self.ID_popup_menu_selection)
+
             self.PopupMenu(menu)
             menu.Destroy()
 
+        if evt.Row<0 and evt.Col>=0: #right click on column label
+            # live plot of this and all other selected columns with automatic source
+            autoinfo = self.GetTable().autoinfo
+            cols = sorted(set(self.GetSelectedCols()) | {evt.Col})
+            self.actCols = [col for col in cols if self.GetColLabelValue(col) in autoinfo]
+            if evt.Col in self.actCols:
+                menu = wx.Menu()
+                menu.Append(self.ID_popup_menu_liveplot, 'Live plot' if len(self.actCols) == 1
+                            else 'Live plot of {} columns'.format(len(self.actCols)))
+                self.Bind(wx.EVT_MENU, self.OnColMenuClicked, id = self.ID_popup_menu_liveplot)
+                self.PopupMenu(menu)
+                menu.Destroy()
+
         evt.Skip()
 
+    def OnColMenuClicked(self, event):
+        """Callback function for clicking the column popup menu"""
+        if event.GetId() == self.ID_popup_menu_liveplot:
+            self.LivePlot(self.actCols)
+
     def OnRowMenuClicked(self, event):
         """Callback function for clicking the row popup menu"""
         id = event.GetId()
@@ -744,6 +601,15 @@ class LoggerGrid(wx.grid.Grid):
             if result == wx.ID_YES:
                 self.DeleteRows(pos=self.actRow, numRows=1)
 
+        if id == self.ID_popup_menu_selection:
+            dlg = wx.MessageDialog(self,
+                    "Do you really want to delete the {}\nselected rows from the logbook?".format(len(self.actRows)),
+                    "Delete rows confirmation", wx.YES_NO|wx.NO_DEFAULT|wx.ICON_WARNING)
+            result = dlg.ShowModal()
+            dlg.Destroy()
+            if result == wx.ID_YES:
+                self.DeleteRowList(self.actRows)
+
     def OnMouseOverColLabel(self, event):
         """Callback function to display column header tooltips
         (from https://www.blog.pythonlibrary.org/2010/04/04/wxpython-grid-tips-and-tricks/
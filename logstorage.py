@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Storage backends for LaserLogger logbooks
+
+A logbook consists of the 'autoinfo' line (one string per column describing
+how the value can be obtained automatically) and the logged data itself,
+one row per session in chronological order. The classic storage format is a
+CSV file, optionally logbooks can also be kept in an SQLite database where
+each edit is written as a single-row transaction."""
+
+import sqlite3
+from os import replace, stat
+from os.path import isfile
+
+import pandas as pd
+import numpy as np
+
+import columnschema
+import columnstore
+
+# file extensions that select the SQLite backend
+SQLITE_EXTENSIONS = ('.sqlite', '.sqlite3', '.db')
+
+# name of the per-logbook metadata table inside an SQLite file
+SQLITE_META_TABLE = 'logbook_columns'
+
+def WriteCSV(filename, autoinfoline, data):
+    """Write autoinfo line and (chronologically ordered) data to a CSV file"""
+    autoinfoline.to_csv(filename, index=False)
+    data.to_csv(filename, index=False, mode='a', header=False)
+
+def Modified(filename):
+    """Return the modification time (in ns) of the file behind a logbook
+    (None if it does not exist)"""
+    try:
+        return stat(filename.partition('#')[0]).st_mtime_ns
+    except OSError:
+        return None
+
+def OpenStorage(filename):
+    """Return the appropriate storage backend for the given filename
+
+    SQLite files may carry the name of the logbook table after a '#',
+    e.g. 'logfiles/lasers.sqlite#er583'."""
+    path, sep, table = filename.partition('#')
+    if path.lower().endswith(SQLITE_EXTENSIONS):
+        return SQLiteStorage(path, table if sep else None)
+    return CSVStorage(filename)
+
+class CSVStorage(object):
+    """Classic CSV logbook file with the autoinfo line as second header row"""
+
+    # edits are only written to disk on Save()
+    writethrough = False
+
+    def __init__(self, filename):
+        """Initialization"""
+        self.filename = filename
+
+    def Load(self):
+        """Read the logbook
+
+        :return: tuple of autoinfo line and data (both as DataFrames)
+        """
+        # read special information on automatic data import
+        autoinfoline = pd.read_csv(self.filename, nrows=1)
+        # import main part of log file
+        data = pd.read_csv(self.filename,
+                           parse_dates=['Time\nStart', 'Time\nStop'],
+                           skiprows=[1],
+                           dtype={'Comment': 'object'})
+        return autoinfoline, data
+
+    def LoadRange(self, start=None, stop=None):
+        """Read the entries with start times within [start, stop) (the
+        whole file has to be parsed anyway)
+
+        :return: tuple of autoinfo line and data (both as DataFrames)
+        """
+        autoinfoline, data = self.Load()
+        starts = data['Time\nStart']
+        selected = starts.notna() if start is not None or stop is not None else np.ones(len(data), dtype=bool)
+        if start is not None:
+            selected &= starts >= pd.Timestamp(start)
+        if stop is not None:
+            selected &= starts < pd.Timestamp(stop)
+        return autoinfoline, data[selected]
+
+    def Save(self, autoinfoline, data):
+        """Write the complete logbook, keeping 9 backup copies"""
+        # written completely before it replaces the logbook, so other
+        # programs never read a partial file
+        WriteCSV(self.filename + '.tmp', autoinfoline, data)
+
+        for idx in range(8, 0, -1):
+            if isfile("{}.{}".format(self.filename, idx)):
+                replace("{}.{}".format(self.filename, idx),
+                        "{}.{}".format(self.filename, (idx+1)))
+        replace(self.filename, "{}.{}".format(self.filename, 1))
+        replace(self.filename + '.tmp', self.filename)
+
+        return True
+
+    def WriteRow(self, key, labels, values):
+        """Single row writes are not supported by CSV files"""
+        return False
+
+    def DeleteRows(self, keys):
+        """Single row writes are not supported by CSV files"""
+        return False
+
+    def Close(self):
+        """Nothing to clean up"""
+        pass
+
+class SQLiteStorage(object):
+    """Logbook stored as a table in an SQLite database
+
+    Each logbook is kept in its own table with an integer key column '_id'
+    that preserves the chronological order of the entries and an index on
+    the start time. The autoinfo line is stored in a separate metadata table
+    together with the column order. Edits are written immediately, one
+    transaction per row.
+
+    A logbook is still loaded completely when it is opened, as the grid,
+    the statistics and the indexes work on all entries in memory; only date
+    range queries (see LoadRange(), e.g. by report.py) read just the rows
+    they need."""
+
+    # every edit is written immediately
+    writethrough = True
+
+    def __init__(self, filename, table=None):
+        """Initialization"""
+        self.filename = filename
+        self.table = table or 'logbook'
+        self.labels = []
+
+        self.connection = sqlite3.connect(filename)
+
+    def __del__(self):
+        """Close database connection on object deletion"""
+        self.Close()
+
+    def Close(self):
+        """Close database connection"""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    ### SQL helpers
+
+    @staticmethod
+    def _Quote(name):
+        """Quote an identifier (column labels contain line breaks etc.)"""
+        return '"{}"'.format(name.replace('"', '""'))
+
+    @staticmethod
+    def _ToSQL(label, value):
+        """Convert a single cell value to something SQLite can store"""
+        if value is None or (not isinstance(value, str) and pd.isnull(value)):
+            return None
+        kind = columnschema.ColumnKind(label)
+        if kind == columnschema.KIND_TIME:
+            return pd.Timestamp(value).strftime("%Y-%m-%d %H:%M:%S")
+        if kind == columnschema.KIND_COMMENT:
+            return str(value)
+        return float(value)
+
+    def _TableExists(self, name):
+        cur = self.connection.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name=?", (name,))
+        return cur.fetchone() is not None
+
+    def _ReadLabels(self):
+        """Read column order and autoinfo strings from the metadata table"""
+        cur = self.connection.execute(
+            "SELECT label, autoinfo FROM {} WHERE logbook=? ORDER BY position".format(SQLITE_META_TABLE),
+            (self.table,))
+        return cur.fetchall()
+
+    def _ToDataFrame(self, rows):
+        """Convert rows (including the leading key) to a typed DataFrame"""
+        data = pd.DataFrame.from_records(rows, columns=['_id'] + self.labels, index='_id')
+        for label in self.labels:
+            kind = columnschema.ColumnKind(label)
+            if kind == columnschema.KIND_TIME:
+                data[label] = pd.to_datetime(data[label])
+            elif kind == columnschema.KIND_COMMENT:
+                data[label] = data[label].astype('object')
+            else:
+                data[label] = pd.to_numeric(data[label], errors='coerce')
+        return data
+
+    ### Storage interface
+
+    def Load(self):
+        """Read the logbook
+
+        :return: tuple of autoinfo line and data (both as DataFrames), the
+                 index of the data holds the row keys
+        """
+        return self.LoadRange()
+
+    def LoadRange(self, start=None, stop=None):
+        """Read only the entries with start times within [start, stop) in
+        chronological order (uses the index on the start time)
+
+        :return: tuple of autoinfo line and data (both as DataFrames), the
+                 index of the data holds the row keys
+        """
+        if not self._TableExists(SQLITE_META_TABLE) or not self._TableExists(self.table):
+            raise FileNotFoundError("No logbook table '{}' in '{}'".format(self.table, self.filename))
+
+        meta = self._ReadLabels()
+        self.labels = [label for label, autoinfo in meta]
+        autoinfoline = pd.DataFrame([[np.nan if autoinfo is None else autoinfo for label, autoinfo in meta]],
+                                    columns=self.labels)
+
+        conditions = []
+        params = []
+        if start is not None:
+            conditions.append("{} >= ?".format(self._Quote('Time\nStart')))
+            params.append(self._ToSQL('Time\nStart', start))
+        if stop is not None:
+            conditions.append("{} < ?".format(self._Quote('Time\nStart')))
+            params.append(self._ToSQL('Time\nStart', stop))
+
+        cur = self.connection.execute("SELECT _id, {} FROM {} {} ORDER BY _id".format(
+            ", ".join(self._Quote(label) for label in self.labels), self._Quote(self.table),
+            "WHERE " + " AND ".join(conditions) if conditions else ""), params)
+        data = self._ToDataFrame(cur.fetchall())
+
+        return autoinfoline, data
+
+    def Save(self, autoinfoline, data):
+        """Replace the complete logbook within a single transaction
+
+        The index of data is used as row key."""
+        labels = autoinfoline.columns.to_list()
+        columns = []
+        for label in labels:
+            if columnschema.ColumnKind(label) != columnschema.KIND_FLOAT:
+                columns.append("{} TEXT".format(self._Quote(label)))
+            else:
+                columns.append("{} REAL".format(self._Quote(label)))
+
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS {} (logbook TEXT, position INTEGER, label TEXT, autoinfo TEXT)".format(
+                    SQLITE_META_TABLE))
+            self.connection.execute("DELETE FROM {} WHERE logbook=?".format(SQLITE_META_TABLE), (self.table,))
+            self.connection.executemany(
+                "INSERT INTO {} VALUES (?, ?, ?, ?)".format(SQLITE_META_TABLE),
+                [(self.table, pos, label, None if pd.isnull(autoinfo) else str(autoinfo))
+                 for pos, (label, autoinfo) in enumerate(autoinfoline.iloc[0].items())])
+
+            self.connection.execute("DROP TABLE IF EXISTS {}".format(self._Quote(self.table)))
+            self.connection.execute("CREATE TABLE {} (_id INTEGER PRIMARY KEY, {})".format(
+                self._Quote(self.table), ", ".join(columns)))
+            if 'Time\nStart' in labels:
+                self.connection.execute("CREATE INDEX {} ON {} ({})".format(
+                    self._Quote(self.table + "_start"), self._Quote(self.table), self._Quote('Time\nStart')))
+
+            self.labels = labels
+            self.connection.executemany(self._InsertStatement(),
+                [[int(key)] + [self._ToSQL(label, value) for label, value in zip(labels, row)]
+                 for key, row in zip(data.index, data.itertuples(index=False))])
+
+        return True
+
+    def _InsertStatement(self):
+        return "INSERT OR REPLACE INTO {} (_id, {}) VALUES ({})".format(
+            self._Quote(self.table),
+            ", ".join(self._Quote(label) for label in self.labels),
+            ", ".join("?" * (len(self.labels) + 1)))
+
+    def WriteRow(self, key, labels, values):
+        """Insert or replace a single row in its own transaction"""
+        with self.connection:
+            self.connection.execute(self._InsertStatement(),
+                [int(key)] + [self._ToSQL(label, value) for label, value in zip(labels, values)])
+        return True
+
+    def DeleteRows(self, keys):
+        """Delete rows by key within a single transaction"""
+        with self.connection:
+            self.connection.executemany("DELETE FROM {} WHERE _id=?".format(self._Quote(self.table)),
+                                        [(int(key),) for key in keys])
+        return True
+
+    ### CSV import/export
+
+    def ImportCSV(self, csvfilename):
+        """Replace the logbook table by the content of a CSV logbook file"""
+        autoinfoline, data = CSVStorage(csvfilename).Load()
+        return self.Save(autoinfoline, data)
+
+    def ExportCSV(self, csvfilename):
+        """Write the logbook table to a CSV logbook file (formatted like
+        the CSV files saved by the logbook, e.g. integral isotopes without
+        decimals)"""
+        autoinfoline, data = self.Load()
+        schema = columnschema.ColumnSchema(autoinfoline.columns.to_list(), autoinfoline.iloc[0].to_list())
+        WriteCSV(csvfilename, autoinfoline, columnstore.ColumnStore(data, schema).ToDataFrame())
+        return True
+
+if __name__ == '__main__':
+    """Convert between CSV and SQLite logbooks"""
+    import sys
+
+    if len(sys.argv) != 4 or sys.argv[1] not in ('import', 'export'):
+        print("Usage: {} import|export <file.csv> <file.sqlite[#table]>".format(sys.argv[0]))
+        sys.exit(1)
+
+    storage = OpenStorage(sys.argv[3])
+    if sys.argv[1] == 'import':
+        storage.ImportCSV(sys.argv[2])
+    else:
+        storage.ExportCSV(sys.argv[2])
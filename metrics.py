@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Counters and histograms of the hot paths (Toptica queries, autofill, MQTT
+messages, loading/saving logbooks, drawing the grid)
+
+Recording is switched on by --metrics, the 'metrics' section of the settings
+("metrics": {"enabled": true}) or in the diagnostics page of the statistics
+dialog. While disabled, instrumented code only checks the flag 'enabled'.
+The values can be exported as JSON or in the Prometheus text format (also
+served by the HTTP API at /metrics)."""
+
+import bisect
+import functools
+import json
+import threading
+import time
+
+# upper bounds (in s) of the histogram buckets, from 100 µs to 10 s
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# whether metrics are recorded
+enabled = False
+# (name, labels) -> metric, labels as sorted tuple of (key, value)
+registry = {}
+# help texts by metric name
+descriptions = {}
+registry_lock = threading.Lock()
+# time.time() of the last reset, for rates
+started = time.time()
+
+class CounterMetric(object):
+    """Monotonically increasing count"""
+
+    kind = 'counter'
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def Inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def ToDict(self):
+        return {'value': self.value}
+
+class HistogramMetric(object):
+    """Distribution of values (usually durations in s) in fixed buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # the last bucket counts the values above all bounds
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def Observe(self, value):
+        pos = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[pos] += 1
+            self.count += 1
+            self.sum += value
+
+    def Quantile(self, q):
+        """Estimate a quantile (upper bound of the bucket containing it,
+        None if there are no values)"""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            if total >= rank:
+                return bound
+        return float('inf')
+
+    def ToDict(self):
+        return {'count': self.count, 'sum': self.sum,
+                'buckets': dict(zip([str(bound) for bound in self.buckets] + ['+Inf'], self.counts))}
+
+def _Get(cls, name, description, labels, *args):
+    key = (name, tuple(sorted(labels.items())))
+    metric = registry.get(key)
+    if metric is None:
+        with registry_lock:
+            metric = registry.get(key)
+            if metric is None:
+                metric = cls(*args)
+                registry[key] = metric
+                if description:
+                    descriptions[name] = description
+    return metric
+
+def Counter(name, description="", **labels):
+    """Return the counter with the given name and labels (created on first
+    use)"""
+    return _Get(CounterMetric, name, description, labels)
+
+def Histogram(name, description="", buckets=DEFAULT_BUCKETS, **labels):
+    """Return the histogram with the given name and labels (created on
+    first use)"""
+    return _Get(HistogramMetric, name, description, labels, buckets)
+
+class Timer(object):
+    """Context manager observing the duration of a block in a histogram
+    (if enabled)
+
+        with metrics.Timer('logbook_save_seconds', "Saving a logbook"):
+            ...
+    """
+
+    __slots__ = ('name', 'description', 'labels', 't0')
+
+    def __init__(self, name, description="", **labels):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.t0 = None
+
+    def __enter__(self):
+        if enabled:
+            self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.t0 is not None:
+            Histogram(self.name, self.description, **self.labels).Observe(time.perf_counter() - self.t0)
+        return False
+
+def Timed(name, description=""):
+    """Decorator observing the duration of each call in a histogram (if
+    enabled)"""
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return f(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                Histogram(name, description).Observe(time.perf_counter() - t0)
+        return wrapper
+    return decorator
+
+def Enable(on=True):
+    """Start (or stop) recording"""
+    global enabled
+    enabled = on
+
+def Reset():
+    """Forget all recorded values"""
+    global started
+    with registry_lock:
+        registry.clear()
+        started = time.time()
+
+def Metrics():
+    """Return sorted list of (name, labels dictionary, metric)"""
+    with registry_lock:
+        items = list(registry.items())
+    return [(name, dict(labels), metric) for (name, labels), metric in sorted(items, key=lambda item: item[0])]
+
+def ToJSON():
+    """Return all metrics as JSON text"""
+    return json.dumps({
+        'started': started,
+        'seconds': time.time() - started,
+        'metrics': [dict(name=name, type=metric.kind, labels=labels, **metric.ToDict())
+                    for name, labels, metric in Metrics()],
+    }, indent=2)
+
+def _Labels(labels, extra=None):
+    items = list(labels.items()) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                          for key, value in items) + "}"
+
+def ToPrometheus():
+    """Return all metrics in the Prometheus text exposition format"""
+    lines = []
+    lastname = None
+    for name, labels, metric in Metrics():
+        if name != lastname:
+            if name in descriptions:
+                lines.append("# HELP {} {}".format(name, descriptions[name]))
+            lines.append("# TYPE {} {}".format(name, metric.kind))
+            lastname = name
+
+        if metric.kind == 'counter':
+            lines.append("{}{} {}".format(name, _Labels(labels), metric.value))
+            continue
+
+        total = 0
+        for bound, count in zip(metric.buckets, metric.counts):
+            total += count
+            lines.append("{}_bucket{} {}".format(name, _Labels(labels, ('le', bound)), total))
+        lines.append("{}_bucket{} {}".format(name, _Labels(labels, ('le', '+Inf')), metric.count))
+        lines.append("{}_sum{} {}".format(name, _Labels(labels), metric.sum))
+        lines.append("{}_count{} {}".format(name, _Labels(labels), metric.count))
+    return "\n".join(lines) + "\n"
@@ -1,22 +1,185 @@
-# from https://stackoverflow.com/questions/36500197/how-to-get-time-from-an-ntp-server
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Date/time for the logbooks from NTP servers
+
+A Clock queries the configured NTP servers in a background thread from time
+to time and keeps the result as reference against time.monotonic(), so the
+current time is available at once without any network access. Until the
+first successful query (or without NTP) the local time of the computer is
+used. Configured by an optional 'ntp' section of the settings:
+
+    "ntp": {"servers": ["pool.ntp.org"], "interval": 600, "timeout": 1.0}
+
+Based on https://stackoverflow.com/questions/36500197/how-to-get-time-from-an-ntp-server"""
 
 import socket
 import struct
+import threading
 import time
 
-def RequestTimefromNtp(addr='pool.ntp.org'):
-    # returns the time in seconds
-    REF_TIME_1970 = 2208988800  # Reference time
-    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    data = b'\x1b' + 47 * b'\0'
-    client.sendto(data, (addr, 123))
-    data, address = client.recvfrom(1024)
-    if data:
-        t = struct.unpack('!12I', data)[10]
-        t -= REF_TIME_1970
-    return t
+# servers queried by default
+NTP_SERVERS = ['pool.ntp.org']
+# seconds between two synchronizations
+NTP_INTERVAL = 600
+# seconds to wait for the reply of a server
+NTP_TIMEOUT = 1.0
+
+# seconds between 1900 (NTP era) and 1970 (Unix epoch)
+REF_TIME_1970 = 2208988800
+
+def _ToNtp(t):
+    """Convert Unix time to NTP timestamp (seconds, fraction)"""
+    t += REF_TIME_1970
+    seconds = int(t)
+    return seconds, int((t - seconds) * 2**32) & 0xFFFFFFFF
+
+def _FromNtp(seconds, fraction):
+    """Convert NTP timestamp to Unix time"""
+    return seconds - REF_TIME_1970 + fraction / 2**32
+
+def Query(server, timeout=NTP_TIMEOUT):
+    """Ask an NTP server for the offset of the local clock
+
+    :return: tuple of offset (to be added to time.time()), round trip delay
+             (both in s) and reference (time.monotonic() and corrected time
+             at the reception of the reply)
+    :raises OSError: on network errors or timeout
+    :raises ValueError: on invalid replies
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as client:
+        client.settimeout(timeout)
+        # client mode (3), version 3, our transmit time is echoed as
+        # originate time by the server
+        t1 = time.time()
+        transmit = _ToNtp(t1)
+        client.sendto(struct.pack('!B39x2I', 0x1b, *transmit), (server, 123))
+        while True:
+            data, address = client.recvfrom(1024)
+            t4 = time.time()
+            received = time.monotonic()
+            if len(data) >= 48 and struct.unpack('!2I', data[24:32]) == transmit:
+                break
+            # late reply to an earlier request, keep waiting
+
+    words = struct.unpack('!12I', data[:48])
+    stratum = data[1]
+    if data[0] & 0x07 not in (4, 5) or stratum == 0 or words[10] == 0:
+        raise ValueError("invalid reply from {} (stratum {})".format(server, stratum))
+
+    t2 = _FromNtp(words[8], words[9])
+    t3 = _FromNtp(words[10], words[11])
+    # the time spent by the server does not count as delay
+    offset = ((t2 - t1) + (t3 - t4)) / 2
+    delay = (t4 - t1) - (t3 - t2)
+    return offset, delay, (received, t4 + offset)
+
+class Clock(object):
+    """Current time from NTP servers without blocking"""
+
+    def __init__(self, servers=NTP_SERVERS, interval=NTP_INTERVAL, timeout=NTP_TIMEOUT):
+        self.servers = list(servers)
+        self.interval = interval
+        self.timeout = timeout
+
+        # (time.monotonic(), NTP time) of the last synchronization, replaced
+        # as a whole, so reading it needs no lock
+        self.reference = None
+        # offset and round trip delay of the last synchronization (in s)
+        self.offset = None
+        self.delay = None
+        self.server = None
+        self.error = None
+
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def Now(self):
+        """Return the current time (Unix time in s)"""
+        reference = self.reference
+        if reference is None:
+            return time.time()
+        return reference[1] + (time.monotonic() - reference[0])
+
+    def Synchronized(self):
+        """Whether the time is (at least once) obtained from NTP"""
+        return self.reference is not None
+
+    def Update(self):
+        """Query all servers and use the reply with the shortest round trip
+        (blocks up to the timeout per server)
+
+        :return: True on success
+        """
+        best = None
+        for server in self.servers:
+            try:
+                offset, delay, reference = Query(server, self.timeout)
+            except (OSError, ValueError) as e:
+                self.error = "{}: {}".format(server, e)
+                continue
+            if best is None or delay < best[1]:
+                best = (offset, delay, reference, server)
+
+        if best is None:
+            return False
+
+        self.offset, self.delay, self.reference, self.server = best
+        self.error = None
+        return True
+
+    def Start(self):
+        """Synchronize now and every interval in a background thread"""
+        if self.thread is None:
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self._Run, daemon=True)
+            self.thread.start()
+
+    def Stop(self):
+        self.stopped.set()
+        self.thread = None
+
+    def _Run(self):
+        while not self.stopped.is_set():
+            # retry soon while we never succeeded
+            interval = self.interval if self.Update() or self.Synchronized() else min(self.interval, 30)
+            self.stopped.wait(interval)
+
+# clock used by Now() and GetTimeStr() (see Start())
+clock = None
+
+def Start(settings, background=True):
+    """Set up the clock according to the 'ntp' section of the settings
+
+    :param background: synchronize periodically in a background thread,
+                       otherwise once right now (e.g. for the command line)
+    :return: the Clock
+    """
+    global clock
+    prefs = settings.get('ntp', {})
+    if clock is not None:
+        clock.Stop()
+    clock = Clock(prefs.get('servers', NTP_SERVERS), prefs.get('interval', NTP_INTERVAL),
+                  prefs.get('timeout', NTP_TIMEOUT))
+    if background:
+        clock.Start()
+    else:
+        clock.Update()
+    return clock
+
+def Now():
+    """Return the current time (Unix time in s), local time if no clock
+    was started"""
+    if clock is None:
+        return time.time()
+    return clock.Now()
+
+def GetTimeStr():
+    """Obtain the current date/time (from NTP if synchronized, else locally)"""
+    return time.strftime("%Y/%m/%d %H:%M:%S", time.localtime(Now()))
 
 if __name__ == "__main__":
-    t = RequestTimefromNtp()
-    local_time = time.localtime(t)
-    print(time.strftime("%Y/%m/%d %H:%M:%S", local_time))
+    for server in NTP_SERVERS:
+        offset, delay, reference = Query(server)
+        print("{}: offset {:+.6f} s, delay {:.6f} s".format(server, offset, delay))
+    Start({}, background=False)
+    print(GetTimeStr())
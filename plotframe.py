@@ -3,31 +3,72 @@
 from matplotlib.backends.backend_wxagg import (
     FigureCanvasWxAgg as FigureCanvas,
     NavigationToolbar2WxAgg as NavigationToolbar)
+from matplotlib.figure import Figure
 from matplotlib.ticker import AutoMinorLocator
+import matplotlib.dates as mdates
+
+import time
 
 import wx
+import numpy as np
 import pandas as pd
 
+import decimate
+
+# markers are only drawn if a series has at most this many visible points
+PLOT_MAX_MARKERS = 300
+
 class PlotFrame(wx.Frame):
-    def __init__(self, df, title, parent=None):
+    """Plot of the columns of a dataframe over its (time) index
+
+    Only about two points per pixel of each series are drawn. Whenever the
+    visible range or the window size changes, the series are decimated
+    again from the full data, so plots of long logbooks stay responsive."""
+
+    def __init__(self, df, title, parent=None, decimation='minmax'):
+        """Initialization
+
+        :param decimation: 'minmax' (keeps all spikes) or 'lttb' (visually
+                           closest to the full line)
+        """
         wx.Frame.__init__(self, parent=parent, title=title, size=(800, 600))
 
         # make sure to display all columns
         pd.set_option("display.max.columns", None)
 
-        self.axes = df.plot(
-                style='-o',
-                subplots = True,
-                grid = True
-                )
-        self.figure = self.axes[0].get_figure()
-        self.figure.tight_layout()
-        self.canvas = FigureCanvas(self, -1, self.figure)
+        self.decimate = decimate.METHODS[decimation]
+
+        # full data of each column (sorted by time, without empty cells)
+        df = df[df.index.notnull()].sort_index()
+        x = mdates.date2num(df.index.values)
+        self.series = []
+        for col in df.columns:
+            y = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            valid = ~np.isnan(y)
+            self.series.append((x[valid], y[valid]))
 
-        for ax in self.axes:
+        self.figure = Figure()
+        self.axes = self.figure.subplots(len(df.columns), 1, sharex=True, squeeze=False)[:, 0]
+        self.lines = []
+        for ax, col, (x, y) in zip(self.axes, df.columns, self.series):
+            line, = ax.plot(x, y, '-o', label=col)
+            self.lines.append(line)
+            ax.legend()
+            ax.grid(True)
+            ax.xaxis_date()
             ax.ticklabel_format(style='plain', useOffset=False, axis='y')
             ax.yaxis.set_minor_locator(AutoMinorLocator(2))
             ax.tick_params(which='both', direction='in')
+        self.axes[-1].set_xlabel(df.index.name)
+        self.figure.autofmt_xdate()
+
+        self.canvas = FigureCanvas(self, -1, self.figure)
+        self.Decimate()
+        self.figure.tight_layout()
+
+        # all axes share the x axis, so one callback covers zoom and pan
+        self.axes[0].callbacks.connect('xlim_changed', self.OnXlimChanged)
+        self.canvas.mpl_connect('resize_event', self.OnResize)
 
         self.sizer = wx.BoxSizer(wx.VERTICAL)
         self.sizer.Add(self.canvas, 1, wx.LEFT | wx.TOP | wx.EXPAND)
@@ -38,6 +79,27 @@ class PlotFrame(wx.Frame):
 
         self.Bind(wx.EVT_CLOSE, self.OnWindowDestroy, self)
 
+    def Decimate(self):
+        """Reduce the visible part of every series to about two points
+        per pixel of the axes width"""
+        xmin, xmax = self.axes[0].get_xlim()
+        npoints = max(int(2 * self.axes[0].bbox.width), 10)
+
+        for line, (x, y) in zip(self.lines, self.series):
+            # include one point beyond each side so lines leave the axes
+            first = max(np.searchsorted(x, xmin, side='left') - 1, 0)
+            last = min(np.searchsorted(x, xmax, side='right') + 1, len(x))
+            xs, ys = self.decimate(x[first:last], y[first:last], npoints)
+            line.set_data(xs, ys)
+            line.set_marker('o' if last - first <= PLOT_MAX_MARKERS else '')
+
+    def OnXlimChanged(self, ax):
+        self.Decimate()
+        self.canvas.draw_idle()
+
+    def OnResize(self, event):
+        self.Decimate()
+
     def add_toolbar(self):
         self.toolbar = NavigationToolbar(self.canvas)
         self.toolbar.Realize()
@@ -49,3 +111,137 @@ class PlotFrame(wx.Frame):
 
     def OnWindowDestroy(self, e):
         self.Destroy()
+
+# maximum number of redraws per second of live plots
+LIVE_MAX_FPS = 20
+# time span (in s) visible in live plots
+LIVE_WINDOW = 600
+# headroom (fraction of the value range) added when the value range of a live
+# plot has to be extended, so not every new extreme needs a full redraw
+LIVE_HEADROOM = 0.25
+
+class LivePlotFrame(wx.Frame):
+    """Plot of live values of columns with automatic sources
+
+    The lines are animated artists: as long as new values fit into the
+    current limits only the lines of changed axes are redrawn onto a cached
+    background (blitting). The limits jump ahead by a quarter of the window
+    when needed, which is the only time the whole figure is drawn."""
+
+    def __init__(self, feed, labels, title, parent=None):
+        """Initialization
+
+        :param feed: livefeed.LiveFeed of the logbook
+        :param labels: column labels to plot (all need automatic sources)
+        """
+        wx.Frame.__init__(self, parent=parent, title=title, size=(800, 600))
+
+        self.feed = feed
+        self.labels = labels
+        self.buffers = [feed.Subscribe(label) for label in labels]
+        self.versions = [-1] * len(labels)
+        # whether the value range of an axes was set from data already
+        self.scaled = [False] * len(labels)
+        self.t0 = time.time()
+
+        self.figure = Figure()
+        self.axes = self.figure.subplots(len(labels), 1, sharex=True, squeeze=False)[:, 0]
+        self.lines = []
+        for ax, label in zip(self.axes, labels):
+            line, = ax.plot([], [], '-', label=label.replace('\n', ' '), animated=True)
+            self.lines.append(line)
+            ax.legend(loc='upper left')
+            ax.grid(True)
+            ax.ticklabel_format(style='plain', useOffset=False, axis='y')
+            ax.yaxis.set_minor_locator(AutoMinorLocator(2))
+            ax.tick_params(which='both', direction='in')
+        self.axes[0].set_xlim(0, LIVE_WINDOW)
+        self.axes[-1].set_xlabel("Time (s)")
+        self.figure.tight_layout()
+
+        self.canvas = FigureCanvas(self, -1, self.figure)
+        # axes backgrounds without the lines, taken after each full draw
+        self.backgrounds = None
+        self.canvas.mpl_connect('draw_event', self.OnDraw)
+
+        self.sizer = wx.BoxSizer(wx.VERTICAL)
+        self.sizer.Add(self.canvas, 1, wx.LEFT | wx.TOP | wx.EXPAND)
+        self.SetSizer(self.sizer)
+        self.toolbar = NavigationToolbar(self.canvas)
+        self.toolbar.Realize()
+        self.sizer.Add(self.toolbar, 0, wx.LEFT | wx.EXPAND)
+        self.toolbar.update()
+        self.Show()
+
+        self.timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.OnTimer, self.timer)
+        self.timer.Start(1000 // LIVE_MAX_FPS)
+
+        self.Bind(wx.EVT_CLOSE, self.OnWindowDestroy, self)
+
+    def OnDraw(self, event):
+        """Cache the backgrounds after a full redraw, which leaves out the
+        (animated) lines, and draw the lines on top before the figure is
+        shown"""
+        self.backgrounds = [self.canvas.copy_from_bbox(ax.bbox) for ax in self.axes]
+        for ax, line in zip(self.axes, self.lines):
+            ax.draw_artist(line)
+
+    def Blit(self, indices):
+        """Show the current lines of some axes: only these lines are drawn
+        onto the cached backgrounds and copied to the screen"""
+        for i in indices:
+            ax = self.axes[i]
+            self.canvas.restore_region(self.backgrounds[i])
+            ax.draw_artist(self.lines[i])
+            self.canvas.blit(ax.bbox)
+
+    def OnTimer(self, event):
+        """Show new values (at most LIVE_MAX_FPS times per second)"""
+        changed = [i for i, buffer in enumerate(self.buffers) if buffer.version != self.versions[i]]
+        if not changed or self.backgrounds is None:
+            return
+
+        fullredraw = False
+        xmin, xmax = self.axes[0].get_xlim()
+        npoints = max(int(2 * self.axes[0].bbox.width), 10)
+        for i in changed:
+            self.versions[i] = self.buffers[i].version
+            t, y = self.buffers[i].Data()
+            t -= self.t0
+
+            # jump ahead if the newest value is beyond the visible range
+            if len(t) and t[-1] > xmax:
+                xmax = t[-1] + LIVE_WINDOW / 4
+                xmin = xmax - LIVE_WINDOW
+                self.axes[0].set_xlim(xmin, xmax)
+                fullredraw = True
+
+            first = np.searchsorted(t, xmin)
+            t, y = decimate.MinMax(t[first:], y[first:], npoints)
+            self.lines[i].set_data(t, y)
+
+            # extend the value range if needed
+            ax = self.axes[i]
+            ymin, ymax = ax.get_ylim()
+            if len(y) and (not self.scaled[i] or y.min() < ymin or y.max() > ymax):
+                margin = max(y.max() - y.min(), abs(y.max()) * 1e-6, 1e-9)
+                if not self.scaled[i]:
+                    ymin, ymax = np.inf, -np.inf
+                    margin *= 0.1
+                else:
+                    margin *= LIVE_HEADROOM
+                ax.set_ylim(min(ymin, y.min() - margin), max(ymax, y.max() + margin))
+                self.scaled[i] = True
+                fullredraw = True
+
+        if fullredraw:
+            self.canvas.draw()
+        else:
+            self.Blit(changed)
+
+    def OnWindowDestroy(self, e):
+        self.timer.Stop()
+        for label in self.labels:
+            self.feed.Unsubscribe(label)
+        self.Destroy()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Export plots of all logbooks as PNG/PDF files without GUI
+
+Reads the logbooks from the LaserLogger settings file and renders one
+figure per logbook with the configured columns over the stop time, using
+the Agg backend of matplotlib (no wx needed). Logbooks are rendered in
+parallel by a pool of processes. For example
+
+    python3 report.py --month 2024-05 --format png pdf
+
+The plotted columns are taken from --columns, else from the 'report'
+section of the settings (per logbook 'report_columns' take precedence),
+else all numeric columns are plotted:
+
+    "report": {"columns": ["TA Current", "LD PD power"], "outdir": "reports"}
+
+Each column is given by words its label words start with, as in the search
+(e.g. "Temp" plots all temperatures)."""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+import archive
+import columnschema
+import columnstore
+import decimate
+import logstorage
+import searchindex
+import usagestats
+
+# size of one subplot (in inches) and resolution
+REPORT_PLOT_SIZE = (11.0, 2.2)
+REPORT_DPI = 100
+
+def LoadLogbook(filename, since=None, until=None):
+    """Load a logbook including its archive without GUI
+
+    :param since, until: only entries started within [since, until)
+                         (SQLite logbooks and the archive only read these)
+    :return: (schema, column store) with the archived entries first
+    """
+    storage = logstorage.OpenStorage(filename)
+    try:
+        autoinfoline, data = storage.LoadRange(since, until)
+    finally:
+        storage.Close()
+    schema = columnschema.ColumnSchema(autoinfoline.columns.to_list(), autoinfoline.iloc[0].to_list())
+
+    # entries moved to the archive (see logbook.Logbook.Archive) count as well
+    archived = archive.Archive(archive.ArchivePath(filename)).Read(since, until, schema.labels)
+    if len(archived):
+        # keys before the ones of the logbook
+        archived.index = np.arange(-len(archived), 0)
+        data = pd.concat([archived, data[schema.labels]])
+    return schema, columnstore.ColumnStore(data, schema)
+
+def SelectColumns(schema, patterns):
+    """Return the numeric columns matching any of the patterns (all
+    numeric columns if there are no patterns)"""
+    numeric = [col for col, kind in enumerate(schema.kinds) if kind == columnschema.KIND_FLOAT]
+    if not patterns:
+        return numeric
+
+    cols = set()
+    for pattern in patterns:
+        cols.update(searchindex.MatchingColumns(schema.labels, pattern.lower().replace('.', ' ').split()))
+    return [col for col in numeric if col in cols]
+
+def RenderLogbook(job):
+    """Render the plots of one logbook (runs in a worker process)
+
+    :param job: dictionary with name, filename, columns, since, until,
+                outdir and formats
+    :return: dictionary with name, files, entries, hours, sessions, seconds
+             and error (None on success)
+    """
+    # imported here, so only the worker processes pay for it
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import matplotlib.dates as mdates
+
+    t0 = time.perf_counter()
+    result = {'name': job['name'], 'files': [], 'entries': 0, 'hours': 0.0, 'sessions': 0, 'error': None}
+    try:
+        schema, store = LoadLogbook(job['filename'], job['since'], job['until'])
+        starts = store.Column(schema.Column('Time\nStart'))
+        stops = store.Column(schema.Column('Time\nStop'))
+
+        # entries started within the reported period
+        selected = np.ones(len(store), dtype=bool)
+        if job['since'] is not None:
+            selected &= starts >= np.datetime64(job['since'], 'ns')
+        if job['until'] is not None:
+            selected &= starts < np.datetime64(job['until'], 'ns')
+        result['entries'] = int(selected.sum())
+
+        usage = usagestats.UsageStats(starts[selected], stops[selected])
+        result['hours'] = usage.Hours()
+        result['sessions'] = usage.Sessions()
+
+        cols = SelectColumns(schema, job['columns'])
+        if not cols:
+            raise ValueError("no matching numeric columns")
+
+        x = stops[selected]
+        valid = ~np.isnat(x)
+        x = mdates.date2num(x[valid])
+
+        figure = Figure(figsize=(REPORT_PLOT_SIZE[0], REPORT_PLOT_SIZE[1] * len(cols) + 0.8), dpi=REPORT_DPI)
+        FigureCanvasAgg(figure)
+        axes = figure.subplots(len(cols), 1, sharex=True, squeeze=False)[:, 0]
+        # about two points per pixel of the plot width are enough
+        npoints = 2 * REPORT_PLOT_SIZE[0] * REPORT_DPI
+        for ax, col in zip(axes, cols):
+            y = store.Column(col)[selected][valid].astype(np.float64)
+            known = ~np.isnan(y)
+            xs, ys = decimate.MinMax(x[known], y[known], npoints)
+            ax.plot(xs, ys, '-o' if len(xs) <= 300 else '-', label=schema.labels[col].replace('\n', ' '))
+            ax.legend(loc='upper left')
+            ax.grid(True)
+            ax.xaxis_date()
+            ax.ticklabel_format(style='plain', useOffset=False, axis='y')
+            ax.tick_params(which='both', direction='in')
+        axes[0].set_title("{}: {} entries, {:.1f} h in {} sessions".format(
+            job['name'], result['entries'], result['hours'], result['sessions']))
+        axes[-1].set_xlabel("Date")
+        figure.autofmt_xdate()
+        figure.tight_layout()
+
+        basename = os.path.join(job['outdir'], re.sub(r'[^\w.-]+', '_', job['name']).strip('_'))
+        for fmt in job['formats']:
+            filename = "{}.{}".format(basename, fmt)
+            figure.savefig(filename)
+            result['files'].append(filename)
+    except Exception as e:
+        result['error'] = "{}: {}".format(type(e).__name__, e)
+
+    result['seconds'] = time.perf_counter() - t0
+    return result
+
+def Jobs(settings, args):
+    """Create the rendering jobs of all logbooks"""
+    report = settings.get('report', {})
+    since, until = args.since, args.until
+    if args.month is not None:
+        since = pd.Timestamp(args.month + "-01")
+        until = since + pd.DateOffset(months=1)
+
+    jobs = []
+    for logbook in settings['logbooks']:
+        jobs.append({
+            'name': logbook['name'],
+            'filename': logbook['filename'],
+            'columns': args.columns or logbook.get('report_columns') or report.get('columns'),
+            'since': None if since is None else pd.Timestamp(since).to_datetime64(),
+            'until': None if until is None else pd.Timestamp(until).to_datetime64(),
+            'outdir': args.outdir or report.get('outdir', 'reports'),
+            'formats': args.format or report.get('formats', ['png']),
+        })
+    return jobs
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--settings', default="laserlogger_settings.json", help="LaserLogger settings file")
+    parser.add_argument('--outdir', help="output directory (default from settings or 'reports')")
+    parser.add_argument('--format', nargs='+', choices=['png', 'pdf', 'svg'], help="output formats (default png)")
+    parser.add_argument('--columns', nargs='+', help="columns to plot, e.g. \"TA Current\" Temp")
+    parser.add_argument('--since', help="only entries started at or after this date")
+    parser.add_argument('--until', help="only entries started before this date")
+    parser.add_argument('--month', help="only entries of this month (YYYY-MM)")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="number of worker processes")
+    args = parser.parse_args()
+
+    with open(args.settings) as f:
+        settings = json.load(f)
+    jobs = Jobs(settings, args)
+    for outdir in set(job['outdir'] for job in jobs):
+        os.makedirs(outdir, exist_ok=True)
+
+    t0 = time.perf_counter()
+    if args.jobs > 1 and len(jobs) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(args.jobs, len(jobs))) as pool:
+            results = list(pool.map(RenderLogbook, jobs))
+    else:
+        results = [RenderLogbook(job) for job in jobs]
+
+    failed = 0
+    for result in results:
+        if result['error'] is not None:
+            failed += 1
+            print("{:<25} FAILED ({})".format(result['name'], result['error']))
+        else:
+            print("{:<25} {:6} entries {:9.1f} h {:5} sessions  {:.2f} s  {}".format(
+                result['name'], result['entries'], result['hours'], result['sessions'],
+                result['seconds'], ", ".join(result['files'])))
+    print("{} logbooks in {:.2f} s".format(len(results), time.perf_counter() - t0))
+
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Search panel for the logbooks"""
+
+import time
+
+import wx
+
+import searchindex
+
+# maximum number of results listed (all matches are highlighted)
+SEARCH_MAX_RESULTS = 1000
+
+class SearchDialog(wx.Dialog):
+    """Modeless dialog to search the current or all logbooks
+
+    Matching entries are highlighted in the grids and listed, activating a
+    listed entry moves the cursor there."""
+
+    def __init__(self, parent):
+        """Initialization
+
+        :param parent: LaserLogger main window (providing logbooks and notebook)
+        """
+        wx.Dialog.__init__(self, parent, wx.ID_ANY, "Search logbooks", size=(700, 450),
+                           style=wx.DEFAULT_DIALOG_STYLE|wx.RESIZE_BORDER)
+
+        self.frame = parent
+        # (logbook position, grid row) of the listed results
+        self.results = []
+
+        self.query = wx.SearchCtrl(self, wx.ID_ANY, style=wx.TE_PROCESS_ENTER)
+        self.query.SetDescriptiveText("e.g.  seed lock  \"TA Current\">1500")
+        self.query.SetToolTip(searchindex.__doc__)
+        self.allbooks = wx.CheckBox(self, wx.ID_ANY, "All logbooks")
+        self.info = wx.StaticText(self, wx.ID_ANY, "")
+
+        self.listctrl = wx.ListCtrl(self, wx.ID_ANY, style=wx.LC_REPORT|wx.LC_SINGLE_SEL)
+        self.listctrl.InsertColumn(0, "Logbook", width=150)
+        self.listctrl.InsertColumn(1, "Start", width=140)
+        self.listctrl.InsertColumn(2, "Comment", width=380)
+
+        top = wx.BoxSizer(wx.HORIZONTAL)
+        top.Add(self.query, 1, wx.EXPAND|wx.RIGHT, 10)
+        top.Add(self.allbooks, 0, wx.ALIGN_CENTER_VERTICAL)
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(top, 0, wx.EXPAND|wx.ALL, 10)
+        sizer.Add(self.info, 0, wx.LEFT|wx.RIGHT, 10)
+        sizer.Add(self.listctrl, 1, wx.EXPAND|wx.ALL, 10)
+        self.SetSizer(sizer)
+        self.Layout()
+
+        self.query.Bind(wx.EVT_TEXT_ENTER, self.OnSearch)
+        self.query.Bind(wx.EVT_SEARCHCTRL_SEARCH_BTN, self.OnSearch)
+        self.allbooks.Bind(wx.EVT_CHECKBOX, self.OnSearch)
+        self.listctrl.Bind(wx.EVT_LIST_ITEM_ACTIVATED, self.OnResultActivated)
+        self.Bind(wx.EVT_CLOSE, self.OnClose)
+
+    def Search(self):
+        """Run the query on the selected logbooks"""
+        query = self.query.GetValue()
+        current = self.frame.notebook.GetSelection()
+
+        self.listctrl.DeleteAllItems()
+        self.results = []
+        t0 = time.perf_counter()
+        total = 0
+        for pos, logbook in enumerate(self.frame.logbooks):
+            table = logbook['grid'].GetTable()
+            if self.allbooks.GetValue() or pos == current:
+                try:
+                    rows = table.Search(query)
+                except ValueError as e:
+                    self.info.SetLabel("Invalid query: {}".format(e))
+                    self.ClearHighlights()
+                    return
+            else:
+                rows = []
+
+            table.SetHighlight(rows)
+            logbook['grid'].ForceRefresh()
+            total += len(rows)
+
+            for row in rows[:SEARCH_MAX_RESULTS - len(self.results)]:
+                self.results.append((pos, row))
+                self.listctrl.Append([logbook['name'],
+                                      table.GetValue(row, table.startcol) or "",
+                                      table.GetCommentText(row)])
+
+        self.info.SetLabel("{} matching entries ({:.0f} ms){}".format(
+            total, 1000 * (time.perf_counter() - t0),
+            ", showing the first {}".format(SEARCH_MAX_RESULTS) if total > SEARCH_MAX_RESULTS else ""))
+
+    def ClearHighlights(self):
+        """Remove the search highlights from all logbooks"""
+        for logbook in self.frame.logbooks:
+            logbook['grid'].GetTable().SetHighlight([])
+            logbook['grid'].ForceRefresh()
+
+    def OnSearch(self, event):
+        self.Search()
+
+    def OnResultActivated(self, event):
+        """Move the cursor to the activated entry"""
+        pos, row = self.results[event.GetIndex()]
+        self.frame.notebook.SetSelection(pos)
+        grid = self.frame.logbooks[pos]['grid']
+        grid.GoToCell(row, 0)
+        grid.SetFocus()
+
+    def OnClose(self, event):
+        self.ClearHighlights()
+        self.frame.searchdialog = None
+        self.Destroy()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Search in logbooks
+
+Queries consist of words and value conditions, e.g.
+
+    seed lock "TA Current">1500 Isotope=168
+
+Words are looked up in an inverted index of the comment columns (every
+word matches all words it is the beginning of, case insensitive). Value
+conditions compare a numeric column with a number, the column is given by
+words of its label (quoted, or joined by dots as in TA.Current>1500). All
+words and conditions have to match."""
+
+import bisect
+import re
+import threading
+
+import numpy as np
+
+# words in comments and queries
+TOKEN_RE = re.compile(r'\w+')
+# value conditions in queries
+CONDITION_RE = re.compile(r'(?:"([^"]+)"|([^\s<>=!"]+))\s*(<=|>=|!=|<|>|=)\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)')
+
+OPERATORS = {
+    '<': np.less,
+    '<=': np.less_equal,
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '=': np.equal,
+    '!=': np.not_equal,
+}
+
+def Tokens(text):
+    """Set of lower case words of a text (None or NaN give no words)"""
+    if not isinstance(text, str):
+        return set()
+    return set(TOKEN_RE.findall(text.lower()))
+
+def ParseQuery(query):
+    """Split a query into words and value conditions
+
+    :return: (list of words, list of (label words, operator, value))
+    """
+    conditions = []
+    for quoted, dotted, op, value in CONDITION_RE.findall(query):
+        label = quoted if quoted else dotted.replace('.', ' ')
+        conditions.append((label.lower().split(), op, float(value)))
+    words = TOKEN_RE.findall(CONDITION_RE.sub(' ', query).lower())
+    return words, conditions
+
+def MatchingColumns(labels, labelwords):
+    """Return all columns whose labels contain words starting with all
+    given words"""
+    return [col for col, label in enumerate(labels)
+            if all(any(labelword.startswith(word) for labelword in label.lower().split())
+                   for word in labelwords)]
+
+def MatchColumn(labels, labelwords):
+    """Return the column whose label contains words starting with all
+    given words
+
+    :raises ValueError: if no or more than one column matches
+    """
+    matches = MatchingColumns(labels, labelwords)
+    if len(matches) != 1:
+        raise ValueError("'{}' matches {} columns{}".format(
+            ' '.join(labelwords), len(matches),
+            "" if not matches else ": " + ", ".join(labels[col].replace('\n', ' ') for col in matches)))
+    return matches[0]
+
+class SearchIndex(object):
+    """Inverted index of words to row keys
+
+    The index is built in a background thread. Changes arriving during the
+    build are queued and applied afterwards, searches wait for the build to
+    finish."""
+
+    def __init__(self):
+        """Initialization of an empty index"""
+        # word -> set of row keys
+        self.index = {}
+        # sorted list of all words for prefix lookups (None if outdated)
+        self.words = None
+
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.ready.set()
+        self.pending = []
+
+    def _Add(self, key, tokens):
+        for token in tokens:
+            if token not in self.index:
+                self.index[token] = set()
+                self.words = None
+            self.index[token].add(int(key))
+
+    def _Remove(self, key, tokens):
+        for token in tokens:
+            keys = self.index.get(token)
+            if keys is None:
+                continue
+            keys.discard(int(key))
+            if not keys:
+                del self.index[token]
+                self.words = None
+
+    def _Apply(self, op, key, old, new):
+        if op == 'remove':
+            self._Remove(key, Tokens(old))
+        elif op == 'add':
+            self._Add(key, Tokens(new))
+        else:
+            oldtokens, newtokens = Tokens(old), Tokens(new)
+            self._Remove(key, oldtokens - newtokens)
+            self._Add(key, newtokens - oldtokens)
+
+    def _Change(self, op, key, old, new):
+        """Apply a change now or queue it while the index is being built"""
+        with self.lock:
+            if self.ready.is_set():
+                self._Apply(op, key, old, new)
+            else:
+                self.pending.append((op, key, old, new))
+
+    def Build(self, keys, texts, background=True):
+        """(Re)build the index
+
+        :param keys: row keys
+        :param texts: iterable of texts (or tuples of texts) of the rows,
+                      must not change while the index is being built
+        """
+        self.ready.clear()
+
+        def build():
+            index = {}
+            for key, text in zip(keys, texts):
+                if not isinstance(text, str):
+                    text = ' '.join(t for t in text if isinstance(t, str))
+                for token in Tokens(text):
+                    index.setdefault(token, set()).add(int(key))
+
+            with self.lock:
+                self.index = index
+                self.words = None
+                for change in self.pending:
+                    self._Apply(*change)
+                self.pending = []
+                self.ready.set()
+
+        if background:
+            threading.Thread(target=build, daemon=True).start()
+        else:
+            build()
+
+    def Add(self, key, text):
+        """Index a new row"""
+        self._Change('add', key, None, text)
+
+    def Remove(self, key, text):
+        """Forget a deleted row (text is its last content)"""
+        self._Change('remove', key, text, None)
+
+    def Update(self, key, old, new):
+        """Reindex a changed row"""
+        self._Change('update', key, old, new)
+
+    def Search(self, words):
+        """Return sorted array of the keys of all rows containing words
+        starting with each of the given words"""
+        self.ready.wait()
+        with self.lock:
+            if self.words is None:
+                self.words = sorted(self.index)
+
+            result = None
+            for word in words:
+                keys = set()
+                pos = bisect.bisect_left(self.words, word)
+                while pos < len(self.words) and self.words[pos].startswith(word):
+                    keys |= self.index[self.words[pos]]
+                    pos += 1
+                result = keys if result is None else result & keys
+                if not result:
+                    break
+
+        if result is None:
+            return None
+        return np.array(sorted(result), dtype=np.int64)
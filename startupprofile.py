@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Timing of the program startup (laserlogger.py --profile-startup)
+
+Measures the import time of every module and the duration of named phases
+of the initialization and prints a report once the main window is shown.
+When not enabled, Phase() does nothing and costs (almost) nothing."""
+
+import contextlib
+import importlib.abc
+import sys
+import time
+
+# active profile (None if profiling is disabled)
+profile = None
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+    """Meta path hook measuring how long executing each module takes
+    (including the modules it imports itself)"""
+
+    def __init__(self, times):
+        self.times = times
+
+    def find_spec(self, name, path, target=None):
+        # let the regular finders do the work and wrap the loader
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+
+        loader = spec.loader
+        if loader is None or not hasattr(loader, 'exec_module'):
+            return spec
+
+        times = self.times
+        class TimedLoader(importlib.abc.Loader):
+            def create_module(self, spec):
+                return loader.create_module(spec)
+
+            def exec_module(self, module):
+                t0 = time.perf_counter()
+                try:
+                    loader.exec_module(module)
+                finally:
+                    times[name] = time.perf_counter() - t0
+
+            def __getattr__(self, attr):
+                # e.g. resource readers
+                return getattr(loader, attr)
+
+        spec.loader = TimedLoader()
+        return spec
+
+class StartupProfile(object):
+    """Collected import times and phase durations"""
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        # module name -> import time (in s)
+        self.imports = {}
+        # list of (phase name, start, duration) in order of completion
+        self.phases = []
+        self.reported = False
+        sys.meta_path.insert(0, ImportTimer(self.imports))
+
+    def Report(self, file=sys.stderr, minimum=0.005):
+        """Print the report (only once)"""
+        if self.reported:
+            return
+        self.reported = True
+
+        total = time.perf_counter() - self.t0
+        print("Startup profile (time to window {:.3f} s)".format(total), file=file)
+
+        print("  Imports taking more than {:.0f} ms (including their own imports):".format(1000 * minimum), file=file)
+        toplevel = {name: t for name, t in self.imports.items()
+                    if t >= minimum and '.' not in name}
+        for name, t in sorted(toplevel.items(), key=lambda item: -item[1]):
+            print("    {:<30} {:8.1f} ms".format(name, 1000 * t), file=file)
+
+        print("  Phases:", file=file)
+        for name, start, duration in self.phases:
+            print("    {:<50} {:8.1f} ms (at {:.3f} s)".format(name, 1000 * duration, start), file=file)
+
+def Enable():
+    """Start profiling (call before importing anything else)"""
+    global profile
+    if profile is None:
+        profile = StartupProfile()
+    return profile
+
+@contextlib.contextmanager
+def Phase(name):
+    """Measure the duration of a phase of the initialization"""
+    if profile is None:
+        yield
+        return
+
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.phases.append((name, t0 - profile.t0, time.perf_counter() - t0))
+
+def Report():
+    """Print the report if profiling is enabled"""
+    if profile is not None:
+        profile.Report()
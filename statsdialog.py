@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Dialog to display statistics of a logbook"""
+
+import time
+
+import wx
+
+import columnschema
+import columnstats
+import metrics
+
+class StatisticsDialog(wx.Dialog):
+    """Statistics of a logbook, all values are taken from the running
+    statistics of the table, so no rescan of the logbook is needed (column
+    statistics are calculated once and cached until the column changes)"""
+
+    def __init__(self, parent, name, table):
+        """Initialization
+
+        :param name: name of the logbook
+        :param table: loggertable.LoggerTable of the logbook
+        """
+        wx.Dialog.__init__(self, parent, wx.ID_ANY, "Statistics of \"{}\"".format(name),
+                           size=(500, 600), style=wx.DEFAULT_DIALOG_STYLE|wx.RESIZE_BORDER)
+
+        self.table = table
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        self.notebook = wx.Notebook(self, wx.ID_ANY)
+        self.notebook.AddPage(self._CreateUsagePage(), "Operating hours")
+        self.notebook.AddPage(self._CreateColumnsPage(), "Columns")
+        self.notebook.AddPage(self._CreateDiagnosticsPage(), "Diagnostics")
+        sizer.Add(self.notebook, 1, wx.EXPAND|wx.ALL, 5)
+        sizer.Add(self.CreateStdDialogButtonSizer(wx.OK), 0, wx.EXPAND|wx.ALL, 5)
+        self.SetSizer(sizer)
+        self.Layout()
+
+    def _CreateUsagePage(self):
+        """Page with operating hours per year and month (including the
+        archive)"""
+        usage = self.table.GetUsage()
+        panel = wx.Panel(self.notebook, wx.ID_ANY)
+
+        summary = wx.StaticText(panel, wx.ID_ANY,
+                "Total logged operation time: {:.1f} h = {:.1f} d\n"
+                "Number of sessions: {}\n"
+                "Mean session length: {:.1f} h".format(
+                    usage.Hours(), usage.Hours()/24, usage.Sessions(), usage.MeanSessionHours()))
+
+        listctrl = wx.ListCtrl(panel, wx.ID_ANY, style=wx.LC_REPORT|wx.LC_SINGLE_SEL)
+        listctrl.InsertColumn(0, "Period", width=150)
+        listctrl.InsertColumn(1, "Hours", wx.LIST_FORMAT_RIGHT, width=120)
+        listctrl.InsertColumn(2, "Sessions", wx.LIST_FORMAT_RIGHT, width=120)
+
+        # list each year followed by its months
+        years = {year: (hours, count) for year, hours, count in usage.ByYear()}
+        lastyear = None
+        for year, month, hours, count in usage.ByMonth():
+            if year != lastyear:
+                yearhours, yearcount = years[year]
+                listctrl.Append(["{}".format(year), "{:.1f}".format(yearhours), "{}".format(yearcount)])
+                lastyear = year
+            listctrl.Append(["    {}/{:02d}".format(year, month), "{:.1f}".format(hours), "{}".format(count)])
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(summary, 0, wx.ALL, 10)
+        sizer.Add(listctrl, 1, wx.EXPAND|wx.LEFT|wx.RIGHT|wx.BOTTOM, 10)
+        panel.SetSizer(sizer)
+
+        return panel
+
+    def _CreateColumnsPage(self):
+        """Page with summary statistics of all numeric columns"""
+        table = self.table
+        panel = wx.Panel(self.notebook, wx.ID_ANY)
+
+        headers = ["Column", "Count", "Mean", "Std", "Min"] \
+                  + ["P{}".format(p) for p in columnstats.PERCENTILES] \
+                  + ["Max", "Trend (/d)"]
+        listctrl = wx.ListCtrl(panel, wx.ID_ANY, style=wx.LC_REPORT|wx.LC_SINGLE_SEL)
+        for pos, header in enumerate(headers):
+            listctrl.InsertColumn(pos, header, wx.LIST_FORMAT_LEFT if pos == 0 else wx.LIST_FORMAT_RIGHT,
+                                  width=160 if pos == 0 else 80)
+
+        for col, kind in enumerate(table.column_kinds):
+            if kind != columnschema.KIND_FLOAT:
+                continue
+
+            stats = table.GetColumnStats(col)
+            # one more digit than in the grid for derived values
+            fmt = "{{:.{}f}}".format(table.schema.precisions[col] + 1)
+            values = [stats['mean'], stats['std'], stats['min']] + stats['percentiles'] \
+                     + [stats['max'], stats['trend']]
+            listctrl.Append([table.column_labels[col].replace('\n', ' '), "{}".format(stats['count'])]
+                            + ["" if value != value else fmt.format(value) for value in values])
+
+        note = wx.StaticText(panel, wx.ID_ANY,
+                "Trend: change per day of the last {} values (linear fit over the start times)".format(
+                    columnstats.TREND_ENTRIES))
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(listctrl, 1, wx.EXPAND|wx.ALL, 10)
+        sizer.Add(note, 0, wx.LEFT|wx.RIGHT|wx.BOTTOM, 10)
+        panel.SetSizer(sizer)
+
+        return panel
+
+    def _CreateDiagnosticsPage(self):
+        """Page with the recorded metrics of the program (all logbooks)"""
+        panel = wx.Panel(self.notebook, wx.ID_ANY)
+
+        self.metricsrecord = wx.CheckBox(panel, wx.ID_ANY, "Record metrics")
+        self.metricsrecord.SetValue(metrics.enabled)
+        self.metricsrecord.Bind(wx.EVT_CHECKBOX, lambda e: metrics.Enable(self.metricsrecord.GetValue()))
+
+        headers = ["Metric", "Labels", "Count", "Rate (/s)", "Mean (ms)", "P50 (ms)", "P95 (ms)"]
+        self.metricslist = wx.ListCtrl(panel, wx.ID_ANY, style=wx.LC_REPORT|wx.LC_SINGLE_SEL)
+        for pos, header in enumerate(headers):
+            self.metricslist.InsertColumn(pos, header, wx.LIST_FORMAT_LEFT if pos < 2 else wx.LIST_FORMAT_RIGHT,
+                                          width=180 if pos < 2 else 75)
+        self._UpdateMetrics()
+
+        buttons = wx.BoxSizer(wx.HORIZONTAL)
+        for label, handler in (("Refresh", lambda e: self._UpdateMetrics()),
+                               ("Reset", self.OnResetMetrics),
+                               ("Save as JSON...", lambda e: self._SaveMetrics("JSON files (*.json)|*.json", metrics.ToJSON)),
+                               ("Save as Prometheus...", lambda e: self._SaveMetrics("Text files (*.txt)|*.txt", metrics.ToPrometheus))):
+            button = wx.Button(panel, wx.ID_ANY, label)
+            button.Bind(wx.EVT_BUTTON, handler)
+            buttons.Add(button, 0, wx.RIGHT, 5)
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(self.metricsrecord, 0, wx.ALL, 10)
+        sizer.Add(self.metricslist, 1, wx.EXPAND|wx.LEFT|wx.RIGHT, 10)
+        sizer.Add(buttons, 0, wx.ALL, 10)
+        panel.SetSizer(sizer)
+
+        return panel
+
+    def _UpdateMetrics(self):
+        """Fill the list with the current values of all metrics"""
+        self.metricslist.DeleteAllItems()
+        seconds = max(time.time() - metrics.started, 1e-9)
+        for name, labels, metric in metrics.Metrics():
+            labels = ", ".join("{}={}".format(key, value) for key, value in labels.items())
+            if metric.kind == 'counter':
+                self.metricslist.Append([name, labels, "{}".format(metric.value),
+                                         "{:.2f}".format(metric.value / seconds), "", "", ""])
+                continue
+
+            quantiles = [metric.Quantile(q) for q in (0.5, 0.95)]
+            self.metricslist.Append([name, labels, "{}".format(metric.count),
+                                     "{:.2f}".format(metric.count / seconds),
+                                     "" if metric.count == 0 else "{:.3f}".format(1000 * metric.sum / metric.count)]
+                                    + ["" if q is None else "≤ {:g}".format(1000 * q) for q in quantiles])
+
+    def OnResetMetrics(self, e):
+        metrics.Reset()
+        self._UpdateMetrics()
+
+    def _SaveMetrics(self, wildcard, export):
+        """Write the metrics to a file chosen by the user"""
+        dlg = wx.FileDialog(self, "Save metrics", wildcard=wildcard,
+                            style=wx.FD_SAVE|wx.FD_OVERWRITE_PROMPT)
+        if dlg.ShowModal() == wx.ID_OK:
+            try:
+                with open(dlg.GetPath(), 'w') as f:
+                    f.write(export())
+            except OSError as e:
+                wx.MessageBox("Could not save metrics:\n{}".format(e), "Save error", wx.OK|wx.ICON_ERROR, self)
+        dlg.Destroy()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Tests of archiving logbook entries and reading them back
+
+Run with
+
+    python3 -m pytest test_archive.py
+
+Needs pyarrow (skipped without it)."""
+
+import json
+import threading
+import urllib.request
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+import analytics
+import httpapi
+import logbook
+import logstorage
+import report
+
+# number of entries of the test logbook and how many are archived
+ENTRIES = 50
+ARCHIVED = 36
+
+@pytest.fixture
+def filename(tmp_path):
+    """CSV logbook with one session per week of 1 to 10 h"""
+    labels = ['Time\nStart', 'Time\nStop', 'Wavelength\n(nm)', 'Comment']
+    starts = pd.date_range('2022-11-01 09:00', periods=ENTRIES, freq='7D')
+    data = pd.DataFrame({
+        'Time\nStart': starts,
+        'Time\nStop': starts + pd.to_timedelta(np.arange(ENTRIES) % 10 + 1, unit='h'),
+        'Wavelength\n(nm)': np.linspace(401.0, 402.0, ENTRIES),
+        'Comment': ["session {}".format(entry) for entry in range(ENTRIES)],
+    })
+    autoinfoline = pd.DataFrame([[np.nan] * len(labels)], columns=labels)
+    filename = str(tmp_path / "logfile.csv")
+    logstorage.WriteCSV(filename, autoinfoline, data)
+    return filename
+
+@pytest.fixture
+def archived(filename):
+    """Archive the oldest entries, return total hours and the logbook file"""
+    book = logbook.Logbook(filename)
+    hours = book.GetHours()
+    before = book.store.Column(book.startcol)[ARCHIVED]
+    assert book.Archive(before) == ARCHIVED
+    assert len(book.store) == ENTRIES - ARCHIVED
+    assert book.GetHours() == pytest.approx(hours)
+    book.Close()
+    return hours, filename
+
+def test_archive_keeps_hours(archived):
+    hours, filename = archived
+    book = logbook.Logbook(filename)
+    assert book.GetHours() == pytest.approx(hours)
+    assert book.Status()['hours'] == pytest.approx(hours)
+    assert book.Status()['sessions'] == ENTRIES
+    assert len(book.History(['Time\nStart'])) == ENTRIES
+    book.Close()
+
+def test_archive_twice(archived):
+    hours, filename = archived
+    book = logbook.Logbook(filename)
+    # the archived entries are written again, they must not be counted twice
+    book.archive.Write(book.autoinfoline, book.archive.Read())
+    book.archiveusage = None
+    assert book.GetHours() == pytest.approx(hours)
+    book.Close()
+
+def test_report_includes_archive(archived):
+    hours, filename = archived
+    schema, store = report.LoadLogbook(filename)
+    assert len(store) == ENTRIES
+    starts = store.Column(schema.Column('Time\nStart'))
+    assert np.all(np.diff(starts) > np.timedelta64(0))
+
+    # a range reaching into the archive
+    since, until = pd.Timestamp('2023-01-01'), pd.Timestamp('2023-03-01')
+    schema, store = report.LoadLogbook(filename, since, until)
+    starts = store.Column(schema.Column('Time\nStart'))
+    assert len(store) == 9
+    assert starts.min() >= since.to_datetime64() and starts.max() < until.to_datetime64()
+
+def test_analytics_includes_archive(archived):
+    hours, filename = archived
+    name, starts, stops, error = analytics.LoadSessions(("Laser", filename))
+    assert error is None
+    assert len(starts) == ENTRIES
+
+    since, until = starts.min(), pd.Timestamp('2024-01-01').to_datetime64()
+    sessions = {name: analytics.Clip(starts, stops, since, until)}
+    table = analytics.HoursByPeriod(sessions, since, until, 'year')
+    assert table['Total'].sum() == pytest.approx(hours)
+
+def test_http_includes_archive(archived):
+    hours, filename = archived
+    book = logbook.Logbook(filename)
+    server = httpapi.ApiServer(lambda: [("Laser", book)], port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = "http://localhost:{}/logbooks/Laser".format(server.server_address[1])
+        with urllib.request.urlopen(url) as reply:
+            status = json.load(reply)
+        with urllib.request.urlopen(url + "/hours") as reply:
+            total = json.load(reply)
+    finally:
+        server.shutdown()
+        server.server_close()
+        book.Close()
+    assert status['entries'] == ENTRIES - ARCHIVED
+    assert status['hours'] == pytest.approx(hours)
+    assert total['hours'] == pytest.approx(hours)
+    assert total['sessions'] == status['sessions'] == ENTRIES
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Sorted index over the session start times of a logbook"""
+
+import numpy as np
+
+# capacity of an empty index
+MIN_CAPACITY = 16
+
+class TimeIndex(object):
+    """Start times, stop times and row keys of all sessions sorted by start
+    time (entries without start time are not indexed)
+
+    Lookups are binary searches, so they are O(log n) independent of the
+    logbook size. Adding a session with the latest start time (new entry)
+    is amortized O(1), other changes only move the later part of the
+    index."""
+
+    def __init__(self, starts, stops, keys):
+        """Initialization (vectorized over the complete logbook)
+
+        :param starts: numpy datetime64 array of start times
+        :param stops: numpy datetime64 array of stop times
+        :param keys: row keys of the entries
+        """
+        starts = np.asarray(starts, dtype='datetime64[ns]')
+        stops = np.asarray(stops, dtype='datetime64[ns]')
+        valid = ~np.isnat(starts)
+        order = np.argsort(starts[valid], kind='stable')
+
+        self.size = len(order)
+        self.capacity = max(MIN_CAPACITY, 2*self.size)
+        self.starts = np.full(self.capacity, np.datetime64('NaT'), dtype='datetime64[ns]')
+        self.stops = np.full(self.capacity, np.datetime64('NaT'), dtype='datetime64[ns]')
+        self.keys = np.full(self.capacity, -1, dtype=np.int64)
+        self.starts[:self.size] = starts[valid][order]
+        self.stops[:self.size] = stops[valid][order]
+        self.keys[:self.size] = np.asarray(keys)[valid][order]
+
+        self._UpdateDuration()
+        self._UpdateOpen()
+
+    def __len__(self):
+        return self.size
+
+    def _UpdateDuration(self):
+        """Recalculate the longest session (bounds overlap queries)"""
+        durations = self.stops[:self.size] - self.starts[:self.size]
+        durations = durations[~np.isnat(durations)]
+        self.maxduration = durations.max() if len(durations) else np.timedelta64(0, 'ns')
+
+    def _UpdateOpen(self):
+        """Recollect sessions without stop time (key -> start time)"""
+        running = np.isnat(self.stops[:self.size])
+        self.open = dict(zip(self.keys[:self.size][running].tolist(), self.starts[:self.size][running]))
+
+    def _Find(self, key, start):
+        """Return index of the session with the given key and start time"""
+        first = np.searchsorted(self.starts[:self.size], start, side='left')
+        last = np.searchsorted(self.starts[:self.size], start, side='right')
+        match = np.flatnonzero(self.keys[first:last] == key)
+        if len(match) == 0:
+            raise KeyError(key)
+        return first + match[0]
+
+    ### Maintenance
+
+    def Add(self, key, start, stop):
+        """Add a single session"""
+        start = np.datetime64(start, 'ns')
+        if np.isnat(start):
+            return
+
+        if self.size == self.capacity:
+            self.capacity *= 2
+            for name, empty in (('starts', np.datetime64('NaT')), ('stops', np.datetime64('NaT')), ('keys', -1)):
+                array = np.full(self.capacity, empty, dtype=getattr(self, name).dtype)
+                array[:self.size] = getattr(self, name)[:self.size]
+                setattr(self, name, array)
+
+        idx = np.searchsorted(self.starts[:self.size], start, side='right')
+        for array in (self.starts, self.stops, self.keys):
+            array[idx+1:self.size+1] = array[idx:self.size]
+        self.starts[idx] = start
+        self.stops[idx] = stop
+        self.keys[idx] = key
+        self.size += 1
+
+        duration = self.stops[idx] - start
+        if np.isnat(duration):
+            self.open[int(key)] = start
+        elif duration > self.maxduration:
+            self.maxduration = duration
+
+    def Remove(self, key, start):
+        """Remove a single session"""
+        start = np.datetime64(start, 'ns')
+        if np.isnat(start):
+            return
+
+        idx = self._Find(key, start)
+        for array in (self.starts, self.stops, self.keys):
+            array[idx:self.size-1] = array[idx+1:self.size]
+        self.size -= 1
+        self.open.pop(int(key), None)
+        # (maxduration stays an upper bound, which is all that is needed)
+
+    def SetStop(self, key, start, stop):
+        """Change the stop time of a session"""
+        start = np.datetime64(start, 'ns')
+        if np.isnat(start):
+            return
+
+        idx = self._Find(key, start)
+        self.stops[idx] = stop
+        duration = self.stops[idx] - start
+        if np.isnat(duration):
+            self.open[int(key)] = start
+        else:
+            self.open.pop(int(key), None)
+            if duration > self.maxduration:
+                self.maxduration = duration
+
+    def RemoveKeys(self, keys):
+        """Remove many sessions at once (vectorized)"""
+        keep = ~np.isin(self.keys[:self.size], keys)
+        size = int(keep.sum())
+        for array in (self.starts, self.stops, self.keys):
+            array[:size] = array[:self.size][keep]
+        self.size = size
+        for key in np.asarray(keys).tolist():
+            self.open.pop(key, None)
+
+    def AddMany(self, keys, starts, stops):
+        """Add many sessions at once"""
+        if len(keys) < 16:
+            for key, start, stop in zip(keys, starts, stops):
+                self.Add(key, start, stop)
+            return
+
+        TimeIndex.__init__(self,
+            np.concatenate([self.starts[:self.size], np.asarray(starts, dtype='datetime64[ns]')]),
+            np.concatenate([self.stops[:self.size], np.asarray(stops, dtype='datetime64[ns]')]),
+            np.concatenate([self.keys[:self.size], np.asarray(keys)]))
+
+    ### Queries
+
+    def First(self, time):
+        """Key of the first session starting at or after time (or of the
+        last session if there is none)"""
+        if self.size == 0:
+            return None
+        idx = np.searchsorted(self.starts[:self.size], np.datetime64(time, 'ns'), side='left')
+        return self.keys[min(idx, self.size-1)]
+
+    def Range(self, start, stop):
+        """Keys of all sessions starting within [start, stop)"""
+        first = np.searchsorted(self.starts[:self.size], np.datetime64(start, 'ns'), side='left')
+        last = np.searchsorted(self.starts[:self.size], np.datetime64(stop, 'ns'), side='left')
+        return self.keys[first:last].copy()
+
+    def Overlapping(self, time):
+        """Keys of all sessions running at the given time, including
+        sessions that have not been stopped yet"""
+        time = np.datetime64(time, 'ns')
+        last = np.searchsorted(self.starts[:self.size], time, side='right')
+
+        # only sessions started within the longest session duration can
+        # still be running
+        first = np.searchsorted(self.starts[:self.size], time - self.maxduration, side='left')
+        stops = self.stops[first:last]
+        running = self.keys[first:last][stops >= time]
+
+        # sessions without stop time started any time before
+        started = [key for key, start in self.open.items() if start <= time]
+
+        return np.union1d(running, np.array(started, dtype=np.int64))
@@ -4,6 +4,8 @@
 
 import socket
 
+import metrics
+
 class DLCpro(object):
     """Abstraction class for Toptica DLCpro systems"""
 
@@ -23,7 +25,8 @@ class DLCpro(object):
 
         if self.ip and self.port:
             try:
-                self.socket.connect((self.ip, self.port))
+                with metrics.Timer('toptica_connect_seconds', "Connecting to a Toptica laser", device=self.ip):
+                    self.socket.connect((self.ip, self.port))
                 self.connected = True
             except:
                 pass
@@ -56,6 +59,10 @@ class DLCpro(object):
             self.socket.sendall(cmd.encode())
         except socket.timeout:
             return False
+        except OSError:
+            # connection lost (e.g. device restarted)
+            self.connected = False
+            return False
 
         return True
 
@@ -71,11 +78,19 @@ class DLCpro(object):
         reply = ""
         try:
             while (len(reply) < 2) or (reply[-2] != '>' or reply[-1] != ' '):
-                reply += self.socket.recv(1024).decode("utf-8", "ignore")
+                chunk = self.socket.recv(1024)
+                if not chunk:
+                    # connection closed by the device
+                    self.connected = False
+                    return ""
+                reply += chunk.decode("utf-8", "ignore")
         except socket.timeout:
             reply = ""
             if self.DEBUG:
                 print("DPL32G._readReply() timeout")
+        except OSError:
+            self.connected = False
+            return ""
         if self.DEBUG:
             print("<<< {}".format(reply))
 
@@ -88,15 +103,19 @@ class DLCpro(object):
         :return: parameter value as string or empty string
         """
 
-        self.sendCmd("(param-disp '{})".format(query))
-        reply = ""
+        with metrics.Timer('toptica_query_seconds', "Querying a Toptica parameter", device=self.ip):
+            self.sendCmd("(param-disp '{})".format(query))
+            reply = ""
 
-        try:
-            reply = self.readReply()
-            reply = reply.split("\n", 1)[0]
-            reply = reply.split(" = ")[1]
-        except:
-            pass
+            try:
+                reply = self.readReply()
+                reply = reply.split("\n", 1)[0]
+                reply = reply.split(" = ")[1]
+            except:
+                pass
+
+        if metrics.enabled and not reply:
+            metrics.Counter('toptica_failed_queries_total', "Toptica queries without valid reply", device=self.ip).Inc()
 
         return reply
 
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Undo/redo log of logbook changes
+
+Instead of copies of the logbook only the minimal information to revert
+each change is recorded. Every undo step is a list of operations:
+
+    ('set', position, col, old, new)  -- value of a single cell changed
+    ('insert', position, keys)        -- empty entries inserted
+    ('delete', positions, keys, values) -- entries deleted, values holds one
+                                          array per column
+    ('drift', col, before, after, key, flagged) -- state of the drift detector
+                                          of a column (see anomalies) before
+                                          and after an autofilled value
+
+Positions are chronological positions in the column store at the time of
+the change. As steps are always undone in reverse order, the store is in
+exactly the same state when a step is reverted, so no lookups are needed."""
+
+import collections
+import time
+
+# maximum number of undo steps
+UNDO_MAX_STEPS = 200
+# maximum number of cell values kept in all undo steps together
+UNDO_MAX_CELLS = 1000000
+# changes of the same cell within this time (in s) are merged
+UNDO_COALESCE_TIME = 2.0
+
+def StepSize(ops):
+    """Number of cell values stored in an undo step"""
+    size = 0
+    for op in ops:
+        if op[0] in ('set', 'drift'):
+            size += 1
+        elif op[0] == 'insert':
+            size += len(op[2])
+        else:
+            size += len(op[2]) * max(len(op[3]), 1)
+    return size
+
+class UndoLog(object):
+    """Bounded undo and redo stacks"""
+
+    def __init__(self, maxsteps=UNDO_MAX_STEPS, maxcells=UNDO_MAX_CELLS, coalesce=UNDO_COALESCE_TIME):
+        """Initialization"""
+        self.maxsteps = maxsteps
+        self.maxcells = maxcells
+        self.coalesce = coalesce
+
+        # stacks of (time, size, ops)
+        self.undo = collections.deque()
+        self.redo = []
+        self.cells = 0
+
+    def Record(self, ops):
+        """Record a new undo step (invalidates the redo stack)"""
+        if not ops:
+            return
+
+        now = time.monotonic()
+        self.redo = []
+
+        # merge repeated edits of the same cell (e.g. fixing a typo)
+        if len(ops) == 1 and ops[0][0] == 'set' and self.undo:
+            lasttime, lastsize, lastops = self.undo[-1]
+            if len(lastops) == 1 and lastops[0][0] == 'set' \
+               and lastops[0][1:3] == ops[0][1:3] and now - lasttime < self.coalesce:
+                self.undo[-1] = (now, lastsize, [lastops[0][:4] + (ops[0][4],)])
+                return
+
+        size = StepSize(ops)
+        self.undo.append((now, size, list(ops)))
+        self.cells += size
+
+        # drop the oldest steps if over budget (but always keep the newest)
+        while len(self.undo) > 1 and (len(self.undo) > self.maxsteps or self.cells > self.maxcells):
+            self.cells -= self.undo.popleft()[1]
+
+    def CanUndo(self):
+        return len(self.undo) > 0
+
+    def CanRedo(self):
+        return len(self.redo) > 0
+
+    def PopUndo(self):
+        """Return the operations of the most recent step (to be reverted in
+        reverse order) and move the step to the redo stack"""
+        step = self.undo.pop()
+        self.cells -= step[1]
+        self.redo.append(step)
+        return step[2]
+
+    def PopRedo(self):
+        """Return the operations of the most recently undone step (to be
+        applied again in order) and move the step back to the undo stack"""
+        step = self.redo.pop()
+        self.undo.append((0, step[1], step[2]))
+        self.cells += step[1]
+        return step[2]
+
+    def Clear(self):
+        """Forget all steps"""
+        self.undo.clear()
+        self.redo = []
+        self.cells = 0
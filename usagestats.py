@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""Running statistics on the logged operating time of a laser"""
+
+import numpy as np
+
+NS_PER_HOUR = 3600 * 10**9
+
+class UsageStats(object):
+    """Operating hours of a logbook, maintained incrementally
+
+    Every entry with both start and stop time counts as one session. Totals
+    are kept overall and per calendar month (by start time of the session),
+    so that adding or removing a session is O(1) and all queries are
+    independent of the logbook size."""
+
+    def __init__(self, starts, stops):
+        """Initialization (vectorized over the complete logbook)
+
+        :param starts: numpy datetime64 array of start times
+        :param stops: numpy datetime64 array of stop times
+        """
+        self.total = 0
+        self.sessions = 0
+        # month number (since 1970) -> [duration in ns, number of sessions]
+        self.months = {}
+
+        self.Add(starts, stops)
+
+    def _Update(self, starts, stops, sign):
+        """Add (sign = 1) or remove (sign = -1) sessions"""
+        starts = np.atleast_1d(np.asarray(starts, dtype='datetime64[ns]'))
+        stops = np.atleast_1d(np.asarray(stops, dtype='datetime64[ns]'))
+
+        valid = ~(np.isnat(starts) | np.isnat(stops))
+        if not valid.any():
+            return
+        durations = (stops[valid] - starts[valid]).astype(np.int64)
+        months = starts[valid].astype('datetime64[M]').astype(np.int64)
+
+        self.total += sign * int(durations.sum())
+        self.sessions += sign * len(durations)
+
+        monthlist, inverse = np.unique(months, return_inverse=True)
+        # (integer sums, so removing a session exactly undoes adding it)
+        sums = np.zeros(len(monthlist), dtype=np.int64)
+        np.add.at(sums, inverse, durations)
+        counts = np.bincount(inverse)
+        for month, duration, count in zip(monthlist.tolist(), sums.tolist(), counts.tolist()):
+            entry = self.months.setdefault(month, [0, 0])
+            entry[0] += sign * int(duration)
+            entry[1] += sign * count
+            if entry[1] == 0:
+                del self.months[month]
+
+    def Add(self, starts, stops):
+        """Account for new (or changed) sessions"""
+        self._Update(starts, stops, 1)
+
+    def Remove(self, starts, stops):
+        """Forget about deleted (or changed) sessions"""
+        self._Update(starts, stops, -1)
+
+    def Merge(self, other):
+        """Add the sessions of another UsageStats (e.g. of the archive)"""
+        self.total += other.total
+        self.sessions += other.sessions
+        for month, (duration, count) in other.months.items():
+            entry = self.months.setdefault(month, [0, 0])
+            entry[0] += duration
+            entry[1] += count
+
+    ### Queries
+
+    def Hours(self):
+        """Total operating time in hours"""
+        return self.total / NS_PER_HOUR
+
+    def Sessions(self):
+        """Number of complete sessions"""
+        return self.sessions
+
+    def MeanSessionHours(self):
+        """Mean length of a session in hours"""
+        if self.sessions == 0:
+            return 0.0
+        return self.Hours() / self.sessions
+
+    def ByMonth(self):
+        """List of (year, month, hours, sessions) in chronological order"""
+        return [(1970 + month // 12, 1 + month % 12, duration / NS_PER_HOUR, count)
+                for month, (duration, count) in sorted(self.months.items())]
+
+    def ByYear(self):
+        """List of (year, hours, sessions) in chronological order"""
+        years = {}
+        for year, month, hours, count in self.ByMonth():
+            entry = years.setdefault(year, [0.0, 0])
+            entry[0] += hours
+            entry[1] += count
+        return [(year, hours, count) for year, (hours, count) in sorted(years.items())]